@@ -42,6 +42,18 @@ from settings import pyplot_settings
 from interface import save_screenshot, terminate, get_color, get_curve_color, get_item_type
 from interface import enemy_anms, world_width, world_height, color16, np, uses_pivot_angle
 from interface import zItemState_autocollect, zItemState_attracted
+from snapshot import freeze, FrozenState #compact copies of states to keep (best frames...)
+from timeseries import TimeSeriesStore #constant-memory metrics over time
+from spatial import SpatialIndex, spatial_index #radius/box/nearest queries over bullets
+from circle_coverage import grid_coverage, best_grid_position, best_continuous_position #where a circle covers the most bullets
+from heatmap import HeatmapAccumulator #counts of pixels covered by bullets over time
+from collision import CollisionShapes, Collisions, collision_shapes, player_hits, player_grazes #what touches the player
+from prediction import BulletForecast #where bullets moving in a straight line will be
+from safe_region import SafeRegionForecast #cells clear of bullets over the next frames, and reachable ones
+from clustering import BulletCluster, cluster_points, bullet_clusters, ClusterTracker #dense groups of bullets
+from streaming_stats import RollingStats, EWMA, StreamingQuantile, RateCounter #O(1)-per-frame windowed stats
+from mallet import MalletSearch, MalletCandidate #best circle over a whole sequence, with pruning
+from ascii_render import AsciiRenderer #playfield as text, for printing or live terminal output
 from scipy.ndimage import uniform_filter
 import matplotlib
 import matplotlib.pyplot as plt
@@ -14,14 +14,17 @@ from analysis import *
 # Ex1: "Track the number of bullets across time and plot that as a graph" [only requires bullets]
 class AnalysisBulletsOverTime(Analysis):
     def __init__(self):
-        self.bullet_counts = []
+        self.bullet_counts = TimeSeriesStore(['bullets']) #keeps memory use constant over long runs
 
     def step(self, state: GameState):
         if state.bullets:
-            self.bullet_counts.append(len(state.bullets))
+            self.bullet_counts.add(state)
 
     def done(self):
-        plt.plot(self.bullet_counts)
+        counts = self.bullet_counts.query('bullets', max_points = 20000) #per-second/minute min, max & mean beyond that
+        plt.plot(counts['frame'], counts['mean'])
+        if np.any(counts['min'] != counts['max']):
+            plt.fill_between(counts['frame'], counts['min'], counts['max'], alpha = 0.3)
         plt.xlabel('Time (frames)')
         plt.ylabel('Bullets')
         plt.title('Bullet Count Over Time')
@@ -32,19 +35,33 @@ class AnalysisCloseBulletsOverTime(Analysis):
     radius = 100
 
     def __init__(self):
-        self.bullet_counts = []
+        self.bullet_counts = TimeSeriesStore({'nearby': None}) #filled with record()
+        self.last_second = RollingStats(60) #nearby bullets over the last 60 frames
+        self.peak_mean = 0
+        self.peak_frame = None
 
     def step(self, state: GameState):
         if state.bullets:
             nearby_bullets = 0
-            for bullet in state.bullets:
-                if math.dist(state.player_position, bullet.position) < self.radius and bullet.is_active and (not hasattr(bullet, 'show_delay') or bullet.show_delay == 0):
+            for index in spatial_index(state).radius(state.player_position, self.radius):
+                bullet = state.bullets[index]
+                if bullet.is_active and (not hasattr(bullet, 'show_delay') or bullet.show_delay == 0) and math.dist(state.player_position, bullet.position) < self.radius: #(radius queries include the edge)
                     nearby_bullets = nearby_bullets + 1
 
-            self.bullet_counts.append(nearby_bullets)
+            self.bullet_counts.record(state.seq_frame_id, [nearby_bullets])
+            self.last_second.add(state.seq_frame_id, nearby_bullets)
+            if self.last_second.mean > self.peak_mean:
+                self.peak_mean = self.last_second.mean
+                self.peak_frame = state.seq_frame_id
 
     def done(self):
-        plt.plot(self.bullet_counts)
+        if self.peak_frame is not None:
+            print(f"Most crowded second ended on frame #{self.peak_frame}, with {self.peak_mean:.1f} bullets near the player on average.")
+
+        counts = self.bullet_counts.query('nearby', max_points = 20000)
+        plt.plot(counts['frame'], counts['mean'])
+        if np.any(counts['min'] != counts['max']):
+            plt.fill_between(counts['frame'], counts['min'], counts['max'], alpha = 0.3)
         plt.xlabel('Time (frames)')
         plt.ylabel(f'Bullets in a {self.radius} unit radius around player')
         plt.title('Bullet Count Over Time')
@@ -59,7 +76,7 @@ class AnalysisMostBulletsFrame(Analysis):
     def step(self, state: GameState):
         if state.bullets and len(state.bullets) > self.max_bullets:
             self.max_bullets = len(state.bullets)
-            self.frame_with_most_bullets = state
+            self.frame_with_most_bullets = freeze(state, screen_scale = 1)
 
     def done(self):
         if self.frame_with_most_bullets:
@@ -75,38 +92,27 @@ class AnalysisMostBulletsFrame(Analysis):
 class AnalysisMostBulletsCircleFrame():
     circle_radius = 50
     step_size = 10
+    coverage_method = 'exact' #'exact', 'raster' (approximate) or 'continuous' (any position, not just every step_size; slower)
 
     best_frame = None
     best_bullet_count = 0
     best_position = (-1, -1)
 
-    def __count_circle_points(self, center_x, center_y, points):
-        count = 0
-        for x, y in points:
-            if (x - center_x) ** 2 + (y - center_y) ** 2 <= self.circle_radius ** 2:
-                count += 1
-        return count
-
     def step(self, state: GameState):
         bullet_positions = [bullet.position for bullet in state.bullets if -world_width/2 <= bullet.position[0] <= world_width/2 and 0 <= bullet.position[1] <= world_height]
 
-        frame_best_count = 0
-
-        for x in range(int(-world_width/2), int(world_width/2), self.step_size):
-            for y in range(0, world_height, self.step_size):
-                count = self.__count_circle_points(x, y, bullet_positions)
-
-                if count > frame_best_count:
-                    frame_best_count = count
-                    frame_best_position = (x, y)
+        if self.coverage_method == 'continuous':
+            frame_best_count, frame_best_position = best_continuous_position(bullet_positions, self.circle_radius)
+        else:
+            frame_best_count, frame_best_position = best_grid_position(bullet_positions, range(int(-world_width/2), int(world_width/2), self.step_size), range(0, world_height, self.step_size), self.circle_radius, self.coverage_method)
 
         if frame_best_count > self.best_bullet_count:
             self.best_position = frame_best_position
             self.best_bullet_count = frame_best_count
-            self.best_frame = state
+            self.best_frame = freeze(state)
 
         elif not self.best_frame:
-            self.best_frame = state
+            self.best_frame = freeze(state)
 
     def done(self):
         if self.best_bullet_count == 0:
@@ -117,6 +123,58 @@ class AnalysisMostBulletsCircleFrame():
         print(f"Circle encompasses {self.best_bullet_count} bullets at ({self.best_position[0]}, {self.best_position[1]})")
         print("\nNote: The first optimal solution found was displayed - it may be\nunnecessarily biased towards the left/top but remains optimal.")
 
+# Ex5: "Count the frames the player got hit or grazed something, and by what" [requires bullets, lasers & enemies]
+class AnalysisPlayerCollisions(Analysis):
+    def __init__(self):
+        self.hit_frames = 0
+        self.graze_frames = 0
+        self.hits = {'bullets': 0, 'lasers': 0, 'enemies': 0}
+        self.grazes = {'bullets': 0, 'lasers': 0, 'enemies': 0}
+
+    def step(self, state: GameState):
+        hits = player_hits(state)
+        grazes = player_grazes(state)
+
+        if hits:
+            self.hit_frames += 1
+        if grazes:
+            self.graze_frames += 1
+
+        for kind in self.hits:
+            self.hits[kind] += len(getattr(hits, kind))
+            self.grazes[kind] += len(getattr(grazes, kind))
+
+    def done(self):
+        print(f"Player hitbox touched something on {self.hit_frames} frames: {', '.join(f'{count} {kind}' for kind, count in self.hits.items())} (summed over frames).")
+        print(f"Player grazed something on {self.graze_frames} frames: {', '.join(f'{count} {kind}' for kind, count in self.grazes.items())} (summed over frames).")
+        print("\nNote: Hits ignore invincibility frames, and grazes use an approximate margin (see collision.py).")
+
+# Ex6: "Forecast how many bullets would hit the player soon if they stayed still, and how reliable that is" [only requires bullets]
+class AnalysisDangerForecast(Analysis):
+    horizon = 60 #frames ahead
+
+    def __init__(self):
+        self.danger_counts = []
+        self.deviating_fractions = []
+        self.forecast = None
+
+    def step(self, state: GameState):
+        if self.forecast and len(self.forecast.ids):
+            self.deviating_fractions.append(len(self.forecast.deviating(state)) / len(self.forecast.ids))
+
+        self.forecast = BulletForecast(state, self.horizon)
+        self.danger_counts.append(len(self.forecast.impacts()))
+
+    def done(self):
+        if self.deviating_fractions:
+            print(f"On average, {np.mean(self.deviating_fractions):.1%} of bullets didn't move in a straight line from one frame to the next.")
+
+        plt.plot(self.danger_counts)
+        plt.xlabel('Time (frames)')
+        plt.ylabel(f'Bullets on course to hit the player\nwithin {self.horizon} frames')
+        plt.title('Bullet Danger Forecast Over Time')
+        plt.show()
+
 # =======================================================================
 # Dynamic (updating real time) graph examples ===========================
 # =======================================================================
@@ -204,6 +262,7 @@ class AnalysisItemCollectionDynamic(AnalysisDynamic):
         super().__init__()
         self.collected_counts = [0]
         self.greyed_counts = [0]
+        self.collect_rate = RateCounter(60) #items collected per second, over the last 60 frames
         self.prev_frame_items = None
 
     def setup_graph(self):
@@ -222,8 +281,9 @@ class AnalysisItemCollectionDynamic(AnalysisDynamic):
                 items_collected_this_frame = 0
                 items_greyed_this_frame = 0
 
+                cur_frame_ids = {cur_frame_item.id for cur_frame_item in self.state.items}
                 for prev_frame_item in self.prev_frame_items:
-                    if not any(prev_frame_item.id == cur_frame_item.id for cur_frame_item in self.state.items):
+                    if prev_frame_item.id not in cur_frame_ids:
                         if prev_frame_item.state == zItemState_autocollect:
                             items_collected_this_frame += 1
 
@@ -233,6 +293,8 @@ class AnalysisItemCollectionDynamic(AnalysisDynamic):
 
                 self.collected_counts.append(self.collected_counts[-1] + items_collected_this_frame)
                 self.greyed_counts.append(self.greyed_counts[-1] + items_greyed_this_frame)
+                self.collect_rate.add(self.state.seq_frame_id, items_collected_this_frame)
+                self.graph.setTitle(f"{self.win_title} ({self.collect_rate.rate:.1f} collected/s)")
 
             self.prev_frame_items = self.state.items
 
@@ -255,7 +317,7 @@ class AnalysisPlot(Analysis, ABC):
         self.lastframe = state
 
     def step(self, state: GameState):
-        self.lastframe = state #if sequence, use last frame
+        self.lastframe = state #if sequence, use last frame (a single state; frozen states work too, see snapshot.py)
         if self.photo_mode and state.seq_frame_id % self.photo_mode_frequency == 0:
             self.done()
 
@@ -731,8 +793,9 @@ class AnalysisPlotAll(AnalysisPlot):
 
 # Plot9: "Plot a heatmap of positions hit by bullets over time" [only requires bullets]
 class AnalysisPlotBulletHeatmap(AnalysisPlot):
-    circles = True #otherwise square (faster)
+    circles = True #otherwise square
     max_count = 100 #prevents bullet spawn overshadowing everything, should be bigger for longer analyses
+    resolution = 1 #pixels per unit (2 for half-unit pixels...)
 
     @property
     def plot_title(self):
@@ -740,22 +803,13 @@ class AnalysisPlotBulletHeatmap(AnalysisPlot):
 
     def __init__(self, state: GameState = None):
         super().__init__(state)
-        self.heatmap = np.zeros((world_height + 1, world_width + 1))
+        self.accumulator = HeatmapAccumulator(world_width, world_height, (-world_width/2, 0), self.resolution, self.circles, self.max_count)
+        self.heatmap = self.accumulator.heatmap
 
     def step(self, state: GameState):
         super().step(state)
-        for bullet in state.bullets:
-
-            min_x = int(bullet.position[0] - bullet.hitbox_radius * bullet.scale + world_width/2)
-            max_x = int(bullet.position[0] + bullet.hitbox_radius * bullet.scale + world_width/2)
-            min_y = int(bullet.position[1] - bullet.hitbox_radius * bullet.scale)
-            max_y = int(bullet.position[1] + bullet.hitbox_radius * bullet.scale)
-
-            if min_x >= 0 and min_x <= world_width and max_x >= 0 and max_x <= world_width and min_y >= 0 and min_y <= world_height and max_y >= 0 and max_y <= world_height:
-                for x in range(min_x, max_x):
-                    for y in range(min_y, max_y):
-                        if not self.circles or (self.circles and (x - bullet.position[0] - world_width/2) ** 2 + (y - bullet.position[1]) ** 2 <= (bullet.hitbox_radius * bullet.scale) ** 2) and self.heatmap[y, x] < self.max_count:
-                            self.heatmap[y, x] += 1
+        if state.bullets:
+            self.accumulator.add([bullet.position for bullet in state.bullets], [bullet.hitbox_radius * bullet.scale for bullet in state.bullets])
 
     def plot(self, ax, side2):
         if side2:
@@ -854,47 +908,38 @@ class AnalysisPlotDynamicAll(AnalysisPlotDynamic):
 # Bonus / Miscellaneous =================================================
 # =======================================================================
 
-# Bonus: "Render the bullet positions as ASCII art in the terminal" [only requires bullets] [useless]
+# Bonus: "Render the playfield as ASCII art in the terminal" [only requires bullets; shows enemies & items if extracted] [useless]
 class AnalysisPrintBulletsASCII(Analysis):
+    columns = 90 #at this size, can be pasted into discord nicely (.txt feature makes it not take space without cutting it off much)
+    colors = False #ANSI colors (for terminals; leave off to paste the output)
+    live = False #redraw in the terminal every frame, sized to fit it
+
     def __init__(self):
         self.lastframe = None
-        self.size_x = 90 #at this size, can be pasted into discord nicely (.txt feature makes it not take space without cutting it off much)
-        self.size_y = int((self.size_x*world_height)/world_width)
-        self.radius = 3 #how far to look for bullets around each where each character maps (yes it should be the other way around whatever)
+        if self.live:
+            self.renderer = AsciiRenderer(colors = self.colors)
+        else:
+            self.renderer = AsciiRenderer(self.columns, int((self.columns*world_height)/world_width), colors = self.colors)
+
+        if self.live or self.colors:
+            os.system('') #enables ANSI escape codes in the Windows console
 
     def step(self, state: GameState):
         self.lastframe = state
+        if self.live:
+            print('\033[H' + self.renderer.render(state) + '\033[J', end='', flush=True) #(overwrites the last frame from the top left)
 
     def done(self):
         if not self.lastframe.bullets:
             print("No bullets to print.")
             return
 
-        print("```")
-        for y in range(0, self.size_y):
-            line = ""
-
-            for x in range(0, self.size_x):
-                ingame_x = (x / self.size_x) * world_width - world_width/2
-                ingame_y = (y / self.size_y) * world_height
-
-                found = False
-                for bullet in self.lastframe.bullets:
-                    if math.dist((ingame_x, ingame_y), bullet.position) < self.radius:
-
-                        if bullet.type == 20:
-                            line += "☺"
-                        elif bullet.type >= 38 and bullet.type <= 41:
-                            line += "♪"
-                        else:
-                            line += "•"
-
-                        found = True
-
-                if not found:
-                    line += " "
+        if self.live:
+            print()
+            return
 
-            print(line)
+        print("```")
+        print(self.renderer.render(self.lastframe))
         print("```")
 
 
@@ -938,6 +983,62 @@ class AnalysisPlotGrazeableBullets(AnalysisPlot):
             print(("(Player 2) " if side2 else "") + "No bullets to plot.")
             return DONT_PLOT
 
+# Plot11: "Plot the cells that stay bullet-free over the next frames, and those the player can get to" [requires bullets, optionally lasers & enemies]
+class AnalysisPlotSafeRegion(AnalysisPlot):
+    horizon = 30 #frames ahead
+    cell_size = 4
+    speed = None #player speed in units per frame (default: see safe_region.py)
+
+    @property
+    def plot_title(self):
+        return f"Safe Region over the next {self.horizon} frames"
+
+    def plot(self, ax, side2):
+        state = self.lastframe.side2 if side2 else self.lastframe
+        region = SafeRegionForecast(state, self.horizon, self.cell_size, (-world_width/2, 0, world_width/2, world_height))
+        region.plot(ax, self.speed)
+        AnalysisPlotBullets(self.lastframe).plot(ax, side2)
+
+        reachable = region.reachable(self.speed)[-1]
+        print(("(Player 2) " if side2 else "") + f"{region.always_safe.mean():.1%} of the playfield stays clear for {self.horizon} frames; the player can still be in {np.count_nonzero(reachable)} cells by then (dark green).")
+
+# Plot12: "Find and plot the biggest bullet cluster over the extraction" [only requires bullets]
+class AnalysisPlotLargestBulletCluster(AnalysisPlot):
+    eps = 16 #bullets within this distance are neighbors
+    min_points = 8 #neighbors (bullet included) to be in the thick of a cluster
+
+    @property
+    def plot_title(self):
+        return f"Largest Bullet Cluster (eps {self.eps}, min. {self.min_points} bullets)"
+
+    def __init__(self, state: GameState = None):
+        super().__init__(state)
+        self.tracker = ClusterTracker(self.eps, self.min_points)
+        self.best_frame = None
+
+    def step(self, state: GameState):
+        super().step(state)
+        clusters = self.tracker.add(state)
+        if clusters and self.tracker.largest is clusters[0]:
+            self.best_frame = freeze(state)
+
+    def plot(self, ax, side2):
+        if side2:
+            return HIDE_P2
+
+        largest = self.tracker.largest
+        if not largest:
+            print("No bullet cluster found.")
+            return DONT_PLOT
+
+        AnalysisPlotBullets(self.best_frame).plot(ax, False)
+        ax.add_patch(Circle(largest.centroid, largest.radius, color='red', fill=False))
+        ax.add_patch(Rectangle(largest.bounds[:2], largest.bounds[2] - largest.bounds[0], largest.bounds[3] - largest.bounds[1], color='red', fill=False, linestyle='--'))
+
+        track = self.tracker.largest_track
+        print(f"Largest cluster @ stage frame {self.best_frame.frame_stage}: {largest.size} bullets around ({largest.centroid[0]:.1f}, {largest.centroid[1]:.1f}), within {largest.radius:.1f} units")
+        print(f"That cluster was tracked for {track['frames']} frames")
+
 # =======================================================================
 # Useful analyzers & templates for specific games =======================
 # =======================================================================
@@ -1170,32 +1271,45 @@ class AnalysisPlotWBaWC(AnalysisPlot):
             return DONT_PLOT
 
 # UM: "Find and plot the biggest mallet spot" [only requires bullets]
-class AnalysisBestMallet(AnalysisPlot, AnalysisMostBulletsCircleFrame):
+class AnalysisBestMallet(AnalysisPlot):
     plot_title = 'Scatter Plot of Bullets w/ Best Mallet'
     mallet_player_distance = 100
     circle_radius = 66
+    step_size = 10
+    top_k = 5 #best frames to list
+    min_frame_gap = 60 #between listed frames
+
+    def __init__(self):
+        self.search = MalletSearch(self.circle_radius, self.mallet_player_distance, self.step_size, self.top_k, self.min_frame_gap, keep_state = freeze)
 
     def step(self, state: GameState):
-        AnalysisMostBulletsCircleFrame.step(self, state)
-        self.lastframe = self.best_frame
+        self.search.add(state)
+        self.lastframe = self.search.best.state if self.search.best else state
 
     def plot(self, ax, side2):
         if side2:
             return HIDE_P2
 
-        if self.best_bullet_count == 0:
+        best = self.search.best
+        if best is None:
             print("No frame had bullets on screen.")
             return DONT_PLOT
 
-        AnalysisPlotBullets(self.best_frame).plot(ax, False)
-        AnalysisPlotEnemies(self.best_frame).plot(ax, False)
-        #AnalysisPlotLineLasers(self.lastframe).plot(ax, False)
+        AnalysisPlotBullets(best.state).plot(ax, False)
+        AnalysisPlotEnemies(best.state).plot(ax, False)
+        #AnalysisPlotLineLasers(best.state).plot(ax, False)
+
+        ax.add_patch(Circle(best.position, self.circle_radius, color='red', fill=False))
 
-        ax.add_patch(Circle((self.best_position[0], self.best_position[1]), self.circle_radius, color='red', fill=False))
+        print(f"Best mallet @ stage frame {best.state.frame_stage} {'('+str(best.state.boss_timer)+' on boss timer)' if best.state.boss_timer != -1 else ''}")
+        print(f"Best mallet encompases {best.count} bullets at ({best.position[0]}, {best.position[1]}); required player position ({best.player_position[0]}, {best.player_position[1]})")
+        print(f"Vanilla expected gold gain ~= {int(best.count*0.365692)}") #thanks to Dai for ZUN-rng distribution analysis
+        print(f"Static mallet gold gain = {int(best.count*(11/30))}")
 
-        print(f"Best mallet @ stage frame {self.best_frame.frame_stage} {'('+str(self.best_frame.boss_timer)+' on boss timer)' if self.best_frame.boss_timer != -1 else ''}")
-        print(f"Best mallet encompases {self.best_bullet_count} bullets at ({self.best_position[0]}, {self.best_position[1]}); required player position ({self.best_position[0]}, {self.best_position[1] - self.mallet_player_distance})")
-        print(f"Vanilla expected gold gain ~= {int(self.best_bullet_count*0.365692)}") #thanks to Dai for ZUN-rng distribution analysis
-        print(f"Static mallet gold gain = {int(self.best_bullet_count*(11/30))}")
+        if len(self.search.candidates) > 1:
+            print(f"\nRunner-ups (at least {self.min_frame_gap} frames apart):")
+            for candidate in self.search.candidates[1:]:
+                print(f"- {candidate.count} bullets @ stage frame {candidate.state.frame_stage}; required player position ({candidate.player_position[0]}, {candidate.player_position[1]})")
+        print(f"({self.search.frames_pruned}/{self.search.frames_searched} frames skipped as unable to beat the top {self.top_k})")
 
         print("\nNote: The first optimal solution found was displayed - it may be\nunnecessarily biased towards the left/top but remains optimal.")
\ No newline at end of file
@@ -0,0 +1,106 @@
+from game_entities import *
+from interface import get_color
+import shutil
+import numpy as np
+
+#Text rendering of a state's playfield: one character per cell of a columns x rows grid, for printing or for
+#redrawing in a terminal every frame. All entities are binned into the cell holding their position at once, and
+#each cell shows the glyph of its highest priority entity, so every line is exactly columns wide:
+#  player > bosses > enemies > special bullets (bullet_glyphs) > bullets > items
+#With colors on, glyphs are colored with ANSI 24-bit color codes (bullets in their get_color color), emitted only
+#where the color changes along a line.
+
+player_glyph = '@'
+boss_glyph = 'B'
+enemy_glyph = 'E'
+bullet_glyph = '•'
+special_bullet_glyphs = {20: '☺', 38: '♪', 39: '♪', 40: '♪', 41: '♪'} #by bullet type
+item_glyph = '*'
+
+player_color = (255, 255, 255)
+enemy_color = (255, 105, 180)
+item_color = (255, 215, 0)
+
+_item, _bullet, _special_bullet, _enemy, _boss, _player = range(6)
+_priorities = 8 #(more than the above)
+
+_reset = '\033[0m'
+
+class AsciiRenderer:
+    #columns, rows: grid size; columns fits the terminal by default, and rows follow the playfield's aspect ratio
+    #scaled by row_scale (characters are about twice as high as they are wide), within the terminal's height.
+    #bounds: (min x, min y, max x, max y) of the area drawn (the playfield by default)
+    def __init__(self, columns = None, rows = None, colors = False, row_scale = 0.5, bounds = None, bullet_glyphs = special_bullet_glyphs):
+        self.columns = columns
+        self.rows = rows
+        self.colors = colors
+        self.row_scale = row_scale
+        self.bounds = bounds
+        self.bullet_glyphs = bullet_glyphs
+        self._bullet_colors = {} #(type, color): RGB, as get_color is called per bullet otherwise
+
+    def _size(self, bounds):
+        terminal = shutil.get_terminal_size()
+        columns = self.columns if self.columns is not None else terminal.columns
+        if self.rows is not None:
+            return columns, self.rows
+        rows = int(round(columns * (bounds[3] - bounds[1]) / (bounds[2] - bounds[0]) * self.row_scale))
+        return columns, max(1, rows if self.columns is not None else min(rows, terminal.lines - 1))
+
+    def _bullet_color(self, bullet):
+        key = (bullet.type, bullet.color)
+        if key not in self._bullet_colors:
+            color = get_color(bullet.type, bullet.color)
+            self._bullet_colors[key] = color[1] if color else None
+        return self._bullet_colors[key]
+
+    #(rows, columns) array of glyphs and array of indices into the list of RGB colors also returned (-1 for none)
+    def cells(self, state: GameState):
+        bounds = self.bounds
+        if bounds is None:
+            width, height = state.constants.world_width, state.constants.world_height
+            bounds = (-width / 2, 0, width / 2, height)
+        columns, rows = self._size(bounds)
+
+        entities = [(*item.position, _item, item_glyph, item_color) for item in state.items or []]
+        for bullet in state.bullets or []:
+            glyph = self.bullet_glyphs.get(bullet.type)
+            entities.append((*bullet.position, _special_bullet if glyph else _bullet, glyph or bullet_glyph, self._bullet_color(bullet)))
+        entities += [(*enemy.position, _boss if enemy.is_boss else _enemy, boss_glyph if enemy.is_boss else enemy_glyph, enemy_color) for enemy in state.enemies or []]
+        entities.append((*state.player_position, _player, player_glyph, player_color))
+
+        xs, ys, priorities, glyphs, colors = zip(*entities)
+        palette = list(dict.fromkeys(color for color in colors if color is not None))
+        color_indices = {color: index for index, color in enumerate(palette)}
+        glyph_table = np.array(list(dict.fromkeys(glyphs)))
+        glyph_indices = {glyph: index for index, glyph in enumerate(glyph_table)}
+
+        column = np.floor((np.array(xs) - bounds[0]) * columns / (bounds[2] - bounds[0])).astype(np.int64)
+        row = np.floor((np.array(ys) - bounds[1]) * rows / (bounds[3] - bounds[1])).astype(np.int64)
+        inside = (column >= 0) & (column < columns) & (row >= 0) & (row < rows)
+        flat = (row * columns + column)[inside]
+        priorities = np.array(priorities)[inside]
+        glyphs = np.array([glyph_indices[glyph] for glyph in glyphs])[inside]
+        colors = np.array([color_indices.get(color, -1) for color in colors])[inside]
+
+        #the last entity of each cell once sorted by cell, then priority
+        order = np.argsort(flat * _priorities + priorities, kind='stable')
+        last = order[np.append(flat[order][1:] != flat[order][:-1], True)] if len(order) else order
+
+        glyph_grid = np.full(rows * columns, ' ', dtype='<U1')
+        glyph_grid[flat[last]] = glyph_table[glyphs[last]]
+        color_grid = np.full(rows * columns, -1, dtype=np.int64)
+        color_grid[flat[last]] = colors[last]
+        return glyph_grid.reshape(rows, columns), color_grid.reshape(rows, columns), palette
+
+    def render(self, state: GameState):
+        glyphs, colors, palette = self.cells(state)
+        if not self.colors:
+            return '\n'.join(''.join(line) for line in glyphs)
+
+        codes = np.array([_reset] + [f'\033[38;2;{r};{g};{b}m' for r, g, b in palette])
+        changed = np.ones(colors.shape, dtype=bool)
+        changed[:, 1:] = colors[:, 1:] != colors[:, :-1]
+        changed[:, 0] = colors[:, 0] != -1 #(lines start uncolored)
+        cells = np.char.add(np.where(changed, codes[colors + 1], ''), glyphs)
+        return '\n'.join(''.join(line) + _reset for line in cells)
@@ -0,0 +1,616 @@
+from game_entities import *
+import game_entities
+import dataclasses
+import numpy as np
+import pickle
+import struct
+import json
+import zlib
+import itertools
+import operator
+import mmap
+
+#Capture files persist sequence extractions as chunks of columnar NumPy blocks.
+#
+#Layout:  header magic | chunk | chunk | ... | footer (JSON) | trailer (footer offset + magic)
+#A chunk is a u32 JSON header length, the JSON header, then every column's data back to back.
+#Each chunk covers chunk_frames frames and stores:
+#  - one column per GameState field (score, graze, rng, spellcard...)
+#  - one table per (list field, entity class), e.g. bullets/Bullet or lasers/CurveLaser,
+#    with one column per entity field, an _index column (position in the frame's list)
+#    and a per-frame row count
+#Column types are picked at runtime from the values in the chunk: bool/int/float/str arrays,
+#2D float arrays for tuples (positions, velocities...), and pickled lists for anything else.
+#The run environment and game constants don't change during a sequence, so they're stored once in the footer.
+#
+#With entity_encoding = 'delta', entity tables store each entity's first row in the chunk in full (its spawn record)
+#and every following row as a residual against the same entity (same id) on the previous frame: integer differences,
+#and XORed float bits against a prediction (the previous value; position + velocity for positions).
+#A _link column points each row back to its previous row (0 = spawn record); entities missing from the next frame
+#despawned. Residuals are mostly zeros and compress extremely well. The encoding is lossless, and each chunk still
+#decodes on its own; delta columns are decoded on read rather than returned as views of the file.
+#
+#Column data is 8-byte aligned so uncompressed columns (compression_level = 0) can be read as zero-copy views
+#of the memory-mapped file. Compressed columns (the default, compression_level = 1) are decompressed into a new array
+#on every read instead: the map then only saves reading chunks that aren't needed. Just before the footer, a frame index block maps every frame's seq_frame_id,
+#frame_stage and frame_global (int64, -1 if unset) so readers can jump straight to a frame range.
+#It's followed by the summary block, one packed summary_dtype record per frame (entity counts, spell, lives,
+#player position...), which can be loaded on its own (read_summary) and filtered without decoding any chunk.
+
+header_magic = b'PKCAP001'
+trailer_magic = b'PKCAPEND'
+trailer_format = '<Q8s'
+
+alignment = 8
+index_fields = ['seq_frame_id', 'frame_stage', 'frame_global']
+static_fields = ['constants', 'env']
+
+summary_dtype = np.dtype([
+    ('bullets',       '<i4'),
+    ('enemies',       '<i4'),
+    ('items',         '<i4'),
+    ('lasers',        '<i4'),
+    ('boss_timer',    '<f4'),
+    ('spell_id',      '<i4'), #-1 outside of spell cards
+    ('lives',         '<i4'),
+    ('bombs',         '<i4'),
+    ('pause_state',   '<i4'),
+    ('stage_chapter', '<i4'),
+    ('player_x',      '<f4'),
+    ('player_y',      '<f4'),
+    ('deathbomb',     '?'), #player is in the deathbomb window
+])
+flattened_fields = ['side2'] #nested dataclasses holding entity lists (P2Side), stored as 'side2.<field>'
+
+def _is_entity_list(values):
+    for value in values:
+        if not isinstance(value, list) or (value and not dataclasses.is_dataclass(value[0])):
+            return False
+    return True
+
+def _encode_values(values):
+    types = set(map(type, values))
+
+    try:
+        if types == {bool}:
+            return np.array(values, dtype=np.bool_)
+        elif types == {int}:
+            return np.array(values, dtype=np.int64)
+        elif types == {float}:
+            return np.array(values, dtype=np.float64)
+        elif types == {str}:
+            return np.array(values, dtype=np.str_)
+        elif types == {tuple} and values:
+            lengths = set(map(len, values))
+            if len(lengths) == 1:
+                width = lengths.pop()
+                return np.fromiter(itertools.chain.from_iterable(values), dtype=np.float64, count=width * len(values)).reshape(len(values), width)
+    except (OverflowError, ValueError, TypeError):
+        pass
+
+    return None #needs pickling
+
+def _decode_values(array):
+    if array.ndim == 2:
+        return list(map(tuple, array.tolist()))
+    return array.tolist()
+
+#For each row, the row holding the same entity on the previous frame (-1 if none)
+def _previous_rows(ids, counts):
+    frames = np.repeat(np.arange(len(counts)), counts)
+    order = np.lexsort((frames, ids))
+    linked = (ids[order[1:]] == ids[order[:-1]]) & (frames[order[1:]] == frames[order[:-1]] + 1)
+    previous = np.full(len(ids), -1, dtype=np.int64)
+    previous[order[1:][linked]] = order[:-1][linked]
+    return previous
+
+def _as_float32(array):
+    narrowed = array.astype(np.float32)
+    return narrowed if np.array_equal(narrowed.astype(array.dtype), array, equal_nan=True) else None
+
+#Byte shuffling groups the bytes of residuals by significance, leaving long zero runs for zlib
+def _shuffle(array):
+    return np.ascontiguousarray(array.view(np.uint8).reshape(-1, array.dtype.itemsize).T).tobytes()
+
+def _unshuffle(data, dtype, shape):
+    return np.ascontiguousarray(np.frombuffer(data, dtype=np.uint8).reshape(dtype.itemsize, -1).T).view(dtype).reshape(shape)
+
+def _delta_encode(array, previous, velocity = None):
+    linked = np.flatnonzero(previous >= 0)
+    source = previous[linked]
+
+    if array.dtype.kind == 'f':
+        values = _as_float32(array)
+        if values is None:
+            values = array
+        bits = values.view(np.uint32 if values.dtype == np.float32 else np.uint64)
+        if velocity is not None and values.dtype == np.float32: #(same float32 math as the game, so usually exact)
+            prediction, predict = (values[source] + velocity[source]).view(np.uint32), 'velocity'
+        else:
+            prediction, predict = bits[source], None
+
+        residual = bits.copy()
+        residual[linked] ^= prediction
+        return residual, {'base': values.dtype.str, 'predict': predict}
+
+    residual = array.copy()
+    residual[linked] -= array[source]
+    return residual, {'base': array.dtype.str, 'predict': None}
+
+def _delta_decode(residual, column, previous, counts, velocity = None):
+    decoded = residual.copy()
+    values = decoded.view(np.dtype(column['base'])) if residual.dtype.kind == 'u' else decoded
+    rows = np.concatenate(([0], np.cumsum(counts)))
+
+    #entities only ever link to the previous frame, so decoding frame by frame is enough
+    for row_start, row_stop in zip(rows[:-1].tolist(), rows[1:].tolist()):
+        frame_previous = previous[row_start:row_stop]
+        linked = np.flatnonzero(frame_previous >= 0)
+        if not linked.size:
+            continue
+        source = frame_previous[linked]
+        linked += row_start
+
+        if residual.dtype.kind != 'u':
+            decoded[linked] += decoded[source]
+        elif column['predict'] == 'velocity':
+            decoded[linked] ^= (values[source] + velocity[source]).view(decoded.dtype)
+        else:
+            decoded[linked] ^= decoded[source]
+
+    return values.astype(np.dtype(column['dtype']))
+
+class CaptureWriter:
+    def __init__(self, path, chunk_frames = 120, compression_level = 1, keep_screens = False, entity_encoding = 'rows', metadata = None):
+        self.path = path
+        self.chunk_frames = chunk_frames
+        self.compression_level = compression_level #zlib level; 0 stores columns uncompressed
+        self.entity_encoding = entity_encoding #'rows' or 'delta' (see above)
+        self.keep_screens = keep_screens #screenshots are by far the largest field; dropped unless asked for
+        self.metadata = metadata or {}
+        self.file = open(path, 'wb')
+        self.file.write(header_magic)
+        self.frames = []
+        self.frame_count = 0
+        self.chunks = []
+        self.frame_index = []
+        self.summary = []
+        self.state_class = None
+        self.statics = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, state: GameState):
+        if self.state_class is None:
+            self.state_class = type(state).__name__
+            self.statics = {name: {'class': type(getattr(state, name)).__name__, 'fields': dataclasses.asdict(getattr(state, name))} for name in static_fields}
+
+        self.frame_index.append([-1 if getattr(state, name) is None else getattr(state, name) for name in index_fields])
+        self.summary.append((
+            len(state.bullets), len(state.enemies), len(state.items), len(state.lasers),
+            state.boss_timer, state.spellcard.spell_id if state.spellcard else -1,
+            state.lives, state.bombs, state.pause_state, state.stage_chapter,
+            state.player_position[0], state.player_position[1], state.player_deathbomb_f > 0,
+        ))
+
+        fields = dict(state.__dict__)
+        for name in static_fields:
+            del fields[name]
+        if not self.keep_screens:
+            fields['screen'] = None
+
+        for name in flattened_fields:
+            if name in fields:
+                nested = fields.pop(name)
+                fields[name] = type(nested).__name__ if nested is not None else None
+                if nested is not None:
+                    for nested_name, value in nested.__dict__.items():
+                        fields[f'{name}.{nested_name}'] = value
+
+        self.frames.append(fields)
+        if len(self.frames) >= self.chunk_frames:
+            self._flush()
+
+    def _write_column(self, values, blobs, offset):
+        array = _encode_values(values)
+        if array is None:
+            return self._write_data(pickle.dumps(values, protocol=pickle.HIGHEST_PROTOCOL), {'kind': 'pickle'}, blobs, offset)
+        return self._write_data(array.tobytes(), {'kind': 'array', 'dtype': array.dtype.str, 'shape': list(array.shape)}, blobs, offset)
+
+    def _write_data(self, data, column, blobs, offset):
+        if self.compression_level:
+            data = zlib.compress(data, self.compression_level)
+        column.update({'offset': offset, 'length': len(data), 'compressed': bool(self.compression_level)})
+        blobs.append(data)
+        padding = -len(data) % alignment
+        if padding:
+            blobs.append(bytes(padding))
+        return column, offset + len(data) + padding
+
+    def _flush(self):
+        if not self.frames:
+            return
+
+        frames = self.frames
+        self.frames = []
+        blobs = []
+        offset = 0
+        header = {'frames': len(frames), 'first_frame': self.frame_count, 'columns': {}, 'tables': {}}
+
+        for name in dict.fromkeys(name for frame in frames for name in frame):
+            values = [frame.get(name) for frame in frames]
+
+            if _is_entity_list(values) and any(values):
+                entities = [entity for entities in values for entity in entities]
+                classes = set(map(type, entities))
+
+                if len(classes) == 1: #usual case, handled without touching entities one by one
+                    counts = np.fromiter(map(len, values), dtype=np.int32, count=len(values))
+                    indices = np.arange(len(entities)) - np.repeat(np.cumsum(counts) - counts, counts)
+                    groups = {classes.pop().__name__: (entities, indices.tolist(), counts)}
+
+                else: #group rows by entity class, remembering where each sat in its frame's list
+                    groups = {}
+                    for frame_i, frame_entities in enumerate(values):
+                        for index, entity in enumerate(frame_entities):
+                            key = type(entity).__name__
+                            if key not in groups:
+                                groups[key] = ([], [], np.zeros(len(frames), dtype=np.int32))
+                            group_entities, indices, counts = groups[key]
+                            group_entities.append(entity)
+                            indices.append(index)
+                            counts[frame_i] += 1
+
+                for class_name, (group_entities, indices, counts) in groups.items():
+                    table = {'field': name, 'class': class_name, 'columns': {}}
+                    if len(groups) > 1: #(a lone class's rows are already in list order)
+                        table['columns']['_index'], offset = self._write_column(indices, blobs, offset)
+                    table['columns']['_count'], offset = self._write_column(counts.tolist(), blobs, offset)
+                    field_names = [field.name for field in dataclasses.fields(getattr(game_entities, class_name))]
+                    columns = {field_name: list(map(operator.attrgetter(field_name), group_entities)) for field_name in field_names}
+
+                    if self.entity_encoding == 'delta':
+                        offset = self._write_delta_table(table, columns, counts, blobs, offset)
+                    else:
+                        for field_name, column_values in columns.items():
+                            table['columns'][field_name], offset = self._write_column(column_values, blobs, offset)
+                    header['tables'][f'{name}/{class_name}'] = table
+
+                header['columns'][name] = {'kind': 'table'}
+
+            else:
+                header['columns'][name], offset = self._write_column(values, blobs, offset)
+
+        header_bytes = json.dumps(header).encode()
+        chunk_offset = self.file.tell()
+        header_bytes += b' ' * (-(chunk_offset + 4 + len(header_bytes)) % alignment) #aligns column data
+        self.file.write(struct.pack('<I', len(header_bytes)))
+        self.file.write(header_bytes)
+        for blob in blobs:
+            self.file.write(blob)
+
+        self.chunks.append({'offset': chunk_offset, 'header_length': len(header_bytes), 'frames': len(frames), 'first_frame': self.frame_count})
+        self.frame_count += len(frames)
+
+    def _write_delta_table(self, table, columns, counts, blobs, offset):
+        arrays = {name: _encode_values(values) for name, values in columns.items()}
+        ids = arrays.get('id')
+        if ids is None or ids.dtype.kind != 'i':
+            previous = np.full(len(columns[next(iter(columns))]), -1, dtype=np.int64)
+        else:
+            previous = _previous_rows(ids, counts)
+
+        link = np.where(previous >= 0, np.arange(len(previous)) - previous, 0)
+        table['columns']['_link'], offset = self._write_data(_shuffle(link), {'kind': 'delta_link', 'dtype': link.dtype.str, 'shape': list(link.shape)}, blobs, offset)
+
+        velocity = arrays.get('velocity')
+        velocity = _as_float32(velocity) if velocity is not None and velocity.dtype.kind == 'f' else None
+
+        for name, values in columns.items():
+            array = arrays[name]
+            if array is None or array.dtype.kind not in 'if':
+                table['columns'][name], offset = self._write_column(values, blobs, offset)
+                continue
+
+            predictor = velocity if name == 'position' and velocity is not None and velocity.shape == array.shape else None
+            residual, column = _delta_encode(array, previous, predictor)
+            column.update({'kind': 'delta', 'dtype': array.dtype.str, 'shape': list(array.shape)})
+            table['columns'][name], offset = self._write_data(_shuffle(residual), column, blobs, offset)
+
+        return offset
+
+    def close(self):
+        if self.file.closed:
+            return
+
+        self._flush()
+        self.file.write(bytes(-self.file.tell() % alignment))
+        frame_index_offset = self.file.tell()
+        self.file.write(np.array(self.frame_index, dtype='<i8').reshape(-1, len(index_fields)).tobytes())
+        summary_offset = self.file.tell()
+        self.file.write(np.array(self.summary, dtype=summary_dtype).tobytes())
+
+        footer = json.dumps({
+            'version': 1,
+            'frame_count': self.frame_count,
+            'frame_index': {'offset': frame_index_offset, 'fields': index_fields},
+            'summary': {'offset': summary_offset, 'dtype': summary_dtype.descr},
+            'state_class': self.state_class,
+            'statics': self.statics,
+            'chunks': self.chunks,
+            'metadata': self.metadata,
+        }).encode()
+
+        footer_offset = self.file.tell()
+        self.file.write(footer)
+        self.file.write(struct.pack(trailer_format, footer_offset, trailer_magic))
+        self.file.close()
+
+def _read_footer(data, path):
+    trailer_start = len(data) - struct.calcsize(trailer_format)
+    footer_offset, magic = struct.unpack_from(trailer_format, data, trailer_start)
+    if magic != trailer_magic:
+        raise ValueError(f"{path} is incomplete (capture was not closed properly).")
+    return json.loads(data[footer_offset:trailer_start])
+
+#Loads only the per-frame summary of a capture (no chunk is read), e.g. to find frames worth looking at:
+#  summary = read_summary('run.cap')
+#  frames = np.flatnonzero((summary['bullets'] > 1500) & (summary['spell_id'] == 87))
+def read_summary(path):
+    with open(path, 'rb') as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            footer = _read_footer(data, path)
+            dtype = np.dtype([tuple(field) for field in footer['summary']['dtype']])
+            return np.frombuffer(data, dtype=dtype, count=footer['frame_count'], offset=footer['summary']['offset']).copy()
+        finally:
+            data.close()
+
+#Memory-maps the capture; only the chunks overlapping the requested frames are ever decoded.
+#Frames are numbered by their position in the capture (0 to len - 1); see frame_range() to find them by game frame.
+class CaptureReader:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.data[:len(header_magic)] != header_magic:
+            raise ValueError(f"{path} is not a capture file.")
+
+        self.footer = _read_footer(self.data, path)
+        self.chunks = self.footer['chunks']
+        self.chunk_starts = np.array([chunk['first_frame'] for chunk in self.chunks], dtype=np.int64)
+        self.metadata = self.footer['metadata']
+        self.state_class = getattr(game_entities, self.footer['state_class']) if self.footer['state_class'] else GameState
+        self.statics = {name: getattr(game_entities, static['class'])(**static['fields']) for name, static in (self.footer['statics'] or {}).items()}
+        self.frame_index = np.frombuffer(self.data, dtype='<i8', count=len(self) * len(index_fields), offset=self.footer['frame_index']['offset']).reshape(len(self), len(index_fields))
+        self.summary = np.frombuffer(self.data, dtype=np.dtype([tuple(field) for field in self.footer['summary']['dtype']]), count=len(self), offset=self.footer['summary']['offset'])
+        self._headers = {}
+        self._decoded = (None, {})
+
+    def __len__(self):
+        return self.footer['frame_count']
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.frame_index = None
+        self.summary = None
+        self._headers = {}
+        try:
+            self.data.close()
+        except BufferError: #views handed out are still alive; the map closes once they're gone
+            pass
+        self.file.close()
+
+    #Capture frames [start, stop) covering first..last of seq_frame_id, frame_stage or frame_global.
+    #The range stops early if the value goes backwards (e.g. frame_stage on a stage transition).
+    def frame_range(self, key, first, last = None):
+        values = self.frame_index[:, index_fields.index(key)]
+        last = first if last is None else last
+
+        candidates = np.flatnonzero(values >= first)
+        if not candidates.size:
+            return len(self), len(self)
+
+        start = int(candidates[0])
+        following = values[start:]
+        ends = np.flatnonzero((following > last) | (np.diff(following, prepend=following[0]) < 0))
+        return start, start + int(ends[0]) if ends.size else len(self)
+
+    def _bounds(self, start, stop):
+        stop = len(self) if stop is None else min(stop, len(self))
+        return max(0, start), stop
+
+    #(chunk, first local frame, last local frame + 1) for every chunk overlapping [start, stop)
+    def _chunk_ranges(self, start, stop):
+        start, stop = self._bounds(start, stop)
+        if start >= stop:
+            return
+
+        first_chunk = int(np.searchsorted(self.chunk_starts, start, side='right')) - 1
+        for chunk_i in range(first_chunk, len(self.chunks)):
+            chunk = self.chunks[chunk_i]
+            if chunk['first_frame'] >= stop:
+                break
+            yield chunk_i, max(0, start - chunk['first_frame']), min(chunk['frames'], stop - chunk['first_frame'])
+
+    def _chunk_header(self, chunk_i):
+        if chunk_i not in self._headers:
+            chunk = self.chunks[chunk_i]
+            self._headers[chunk_i] = json.loads(self.data[chunk['offset'] + 4:chunk['offset'] + 4 + chunk['header_length']])
+        return self._headers[chunk_i]
+
+    #Uncompressed columns come back as read-only views of the mapped file (no copy)
+    def _read_column(self, chunk_i, column):
+        chunk = self.chunks[chunk_i]
+        offset = chunk['offset'] + 4 + chunk['header_length'] + column['offset']
+
+        if column['kind'] == 'pickle':
+            data = self.data[offset:offset + column['length']]
+            return pickle.loads(zlib.decompress(data) if column['compressed'] else data)
+
+        if column['kind'] in ['delta', 'delta_link']: #still needs _table_column to decode
+            data = self.data[offset:offset + column['length']]
+            residual_dtype = np.dtype(column.get('base', column['dtype']))
+            if residual_dtype.kind == 'f':
+                residual_dtype = np.dtype(f'<u{residual_dtype.itemsize}')
+            return _unshuffle(zlib.decompress(data) if column['compressed'] else data, residual_dtype, column['shape'])
+
+        dtype = np.dtype(column['dtype'])
+        if column['compressed']:
+            return np.frombuffer(zlib.decompress(self.data[offset:offset + column['length']]), dtype=dtype).reshape(column['shape'])
+        return np.frombuffer(self.data, dtype=dtype, count=int(np.prod(column['shape'])), offset=offset).reshape(column['shape'])
+
+    #Reads an entity table column for a whole chunk, decoding delta columns (the last chunk's are kept around)
+    def _table_column(self, chunk_i, table, name):
+        column = table['columns'][name]
+        if column['kind'] != 'delta':
+            return self._read_column(chunk_i, column)
+
+        key = (chunk_i, table['field'], table['class'])
+        if self._decoded[0] != key:
+            link = self._read_column(chunk_i, table['columns']['_link'])
+            self._decoded = (key, {'_previous': np.where(link > 0, np.arange(len(link)) - link, -1)})
+        decoded = self._decoded[1]
+
+        if name not in decoded:
+            velocity = self._table_column(chunk_i, table, 'velocity').astype(np.float32) if column['predict'] == 'velocity' else None
+            counts = self._read_column(chunk_i, table['columns']['_count'])
+            decoded[name] = _delta_decode(self._read_column(chunk_i, column), column, decoded['_previous'], counts, velocity)
+        return decoded[name]
+
+    def _row_bounds(self, chunk_i, table, local_start, local_stop):
+        counts = self._read_column(chunk_i, table['columns']['_count'])
+        rows = np.concatenate(([0], np.cumsum(counts)))
+        return counts[local_start:local_stop], int(rows[local_start]), int(rows[local_stop])
+
+    @staticmethod
+    def _join(parts):
+        if len(parts) == 1:
+            return parts[0]
+        if all(isinstance(part, np.ndarray) and part.ndim == parts[0].ndim for part in parts):
+            return np.concatenate(parts)
+        return [value for part in parts for value in (_decode_values(part) if isinstance(part, np.ndarray) else part)]
+
+    #Columnar access to one state field over frames [start, stop), as a NumPy array when possible
+    #(a zero-copy view if the frames fall within a single chunk written with compression_level = 0, a decompressed copy otherwise)
+    def column(self, name, start = 0, stop = None):
+        parts = []
+        for chunk_i, local_start, local_stop in self._chunk_ranges(start, stop):
+            column = self._chunk_header(chunk_i)['columns'].get(name)
+            if column is None:
+                raise KeyError(f"No '{name}' field in capture.")
+            if column['kind'] == 'table':
+                raise ValueError(f"'{name}' is an entity list; read it with table('{name}').")
+            parts.append(self._read_column(chunk_i, column)[local_start:local_stop])
+        return self._join(parts) if parts else np.array([])
+
+    #Columnar access to an entity table over frames [start, stop): {column name: values}, plus 'frame', the capture frame of each row
+    #(entity_class defaults to every class found for the field; mixed classes only share their common columns)
+    def table(self, field, entity_class = None, start = 0, stop = None):
+        result = {}
+        for chunk_i, local_start, local_stop in self._chunk_ranges(start, stop):
+            header = self._chunk_header(chunk_i)
+            for table in header['tables'].values():
+                if table['field'] != field or (entity_class and table['class'] != entity_class):
+                    continue
+
+                counts, row_start, row_stop = self._row_bounds(chunk_i, table, local_start, local_stop)
+                first_frame = header['first_frame'] + local_start
+                columns = {'frame': np.repeat(np.arange(first_frame, first_frame + len(counts)), counts)}
+                for name in table['columns']:
+                    if name not in ['_count', '_link']:
+                        columns[name] = self._table_column(chunk_i, table, name)[row_start:row_stop]
+
+                if not result:
+                    result = {name: [values] for name, values in columns.items()}
+                else:
+                    for name in list(result):
+                        if name in columns:
+                            result[name].append(columns[name])
+                        else:
+                            del result[name]
+
+        return {name: self._join(parts) for name, parts in result.items()}
+
+    def _chunk_states(self, chunk_i, local_start, local_stop):
+        header = self._chunk_header(chunk_i)
+        frames = [{} for _ in range(local_stop - local_start)]
+
+        for name, column in header['columns'].items():
+            if column['kind'] == 'table':
+                for frame in frames:
+                    frame[name] = []
+                continue
+
+            values = self._read_column(chunk_i, column)[local_start:local_stop]
+            if isinstance(values, np.ndarray):
+                values = _decode_values(values)
+            for frame, value in zip(frames, values):
+                frame[name] = value
+
+        for table in header['tables'].values():
+            entity_class = getattr(game_entities, table['class'])
+            counts, row_start, row_stop = self._row_bounds(chunk_i, table, local_start, local_stop)
+            columns = []
+            for field in dataclasses.fields(entity_class):
+                values = self._table_column(chunk_i, table, field.name)[row_start:row_stop]
+                columns.append(_decode_values(values) if isinstance(values, np.ndarray) else values)
+
+            entities = list(map(entity_class, *columns))
+            shared_field = sum(other['field'] == table['field'] for other in header['tables'].values()) > 1
+            indices = self._read_column(chunk_i, table['columns']['_index'])[row_start:row_stop].tolist() if shared_field else None
+
+            row = 0
+            for frame, count in zip(frames, counts.tolist()):
+                if not shared_field: #only entity class in this list: rows are already in order
+                    frame[table['field']] = entities[row:row + count]
+                    row += count
+                    continue
+
+                frame_entities = frame[table['field']]
+                for entity, index in zip(entities[row:row + count], indices[row:row + count]):
+                    if index >= len(frame_entities):
+                        frame_entities.extend([None] * (index + 1 - len(frame_entities)))
+                    frame_entities[index] = entity
+                row += count
+
+        states = []
+        for frame in frames:
+            for name in flattened_fields:
+                if name in frame:
+                    nested_class = frame.pop(name)
+                    prefix = f'{name}.'
+                    nested_fields = {key[len(prefix):]: frame.pop(key) for key in list(frame) if key.startswith(prefix)}
+                    frame[name] = getattr(game_entities, nested_class)(**nested_fields) if nested_class else None
+
+            states.append(self.state_class(**frame, **self.statics))
+        return states
+
+    #Rebuilds GameState objects for frames [start, stop) of the capture
+    def states(self, start = 0, stop = None):
+        for chunk_i, local_start, local_stop in self._chunk_ranges(start, stop):
+            yield from self._chunk_states(chunk_i, local_start, local_stop)
+
+    def __iter__(self):
+        return self.states()
+
+    def __getitem__(self, frame_i):
+        if not 0 <= frame_i < len(self):
+            raise IndexError(f"Frame {frame_i} not in capture ({len(self)} frames).")
+        return next(self.states(frame_i, frame_i + 1))
+
+    #Feeds frames [start, stop) to an analyzer's step(); call done() yourself when you're finished with it
+    def analyze(self, analysis, start = 0, stop = None):
+        for state in self.states(start, stop):
+            analysis.step(state)
+        return analysis
@@ -0,0 +1,134 @@
+from capture import CaptureWriter, CaptureReader
+import json
+import time
+import os
+
+#Catalogs split a continuous extraction (see 'continuous' in README.md) into segments, one per attempt at a stage,
+#each saved to its own capture file in the catalog directory, and list them in catalog.jsonl:
+#  {"segment": 12, "run": 5, "file": "segment_000012.cap", "stage": 4, "character": "Reimu", "difficulty": "Lunatic",
+#   "chapters": [[0, 0], [1, 1850]], "score_min": ..., "score_max": ..., "end_reason": "cleared", ...}
+#A new segment starts when the stage changes or the stage timer goes back (retry, restart, new run after a game over);
+#a new run starts with every segment that doesn't follow a cleared stage. Chapters are listed as [chapter, first frame_stage].
+#States can't tell a game over from a restart on the last life, so both end segments as 'restarted':
+#lives_end (and continues, for continues used during the segment) tell how the attempt was going when it ended.
+#Catalogs can be re-opened to append more sessions; numbering picks up where it left off.
+
+catalog_file = 'catalog.jsonl'
+
+def _label(names, index):
+    return names[index] if names and 0 <= index < len(names) else index
+
+#Why the previous segment ended, if state starts a new one
+def segment_break(prev_state, state):
+    if state.env.stage > prev_state.env.stage:
+        return 'cleared'
+    elif state.env.stage != prev_state.env.stage or state.frame_stage < prev_state.frame_stage:
+        return 'restarted'
+    return None
+
+class CatalogWriter:
+    def __init__(self, directory, labels = None, metadata = None, **capture_args):
+        self.directory = directory
+        self.labels = labels or {} #'characters', 'subshots', 'difficulties': names for the env indices
+        self.metadata = metadata or {}
+        self.capture_args = capture_args #passed on to every segment's CaptureWriter
+        self.writer = None
+        self.segment = None
+        self.prev_state = None
+        self.segment_count = 0
+
+        os.makedirs(directory, exist_ok = True)
+        rows = read_catalog(directory) if os.path.exists(os.path.join(directory, catalog_file)) else []
+        self.next_segment = max((row['segment'] for row in rows), default = -1) + 1
+        self.run = max((row['run'] for row in rows), default = -1) + 1
+        self.file = open(os.path.join(directory, catalog_file), 'a')
+
+    def add(self, state):
+        if self.prev_state is not None:
+            end_reason = segment_break(self.prev_state, state)
+            if end_reason:
+                self._end_segment(end_reason)
+                if end_reason != 'cleared':
+                    self.run += 1
+
+        if self.writer is None:
+            self._start_segment(state)
+
+        segment = self.segment
+        if state.stage_chapter != segment['chapters'][-1][0]:
+            segment['chapters'].append([state.stage_chapter, state.frame_stage])
+        segment['last_frame'] = state.seq_frame_id
+        segment['frame_stage_end'] = state.frame_stage
+        segment['frame_count'] += 1
+        segment['score_min'] = min(segment['score_min'], state.score)
+        segment['score_max'] = max(segment['score_max'], state.score)
+        segment['continues'] = state.continues - segment['continues_start']
+        segment['lives_end'] = state.lives
+
+        self.writer.add(state)
+        self.prev_state = state
+
+    def _start_segment(self, state):
+        env = state.env
+        self.segment = {
+            'segment': self.next_segment,
+            'run': self.run,
+            'file': f'segment_{self.next_segment:06d}.cap',
+            'started': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'game_id': self.metadata.get('game_id'),
+            'stage': env.stage,
+            'character': _label(self.labels.get('characters'), env.character),
+            'subshot': _label(self.labels.get('subshots'), env.subshot),
+            'difficulty': _label(self.labels.get('difficulties'), env.difficulty),
+            'chapters': [[state.stage_chapter, state.frame_stage]],
+            'first_frame': state.seq_frame_id,
+            'last_frame': state.seq_frame_id,
+            'frame_stage_start': state.frame_stage,
+            'frame_stage_end': state.frame_stage,
+            'frame_count': 0,
+            'score_min': state.score,
+            'score_max': state.score,
+            'lives_start': state.lives,
+            'lives_end': state.lives,
+            'continues_start': state.continues,
+            'continues': 0,
+            'end_reason': None,
+        }
+        self.next_segment += 1
+        self.writer = CaptureWriter(os.path.join(self.directory, self.segment['file']), metadata = {**self.metadata, 'segment': self.segment['segment'], 'run': self.run}, **self.capture_args)
+
+    def _end_segment(self, end_reason):
+        self.writer.close()
+        self.writer = None
+        self.segment['end_reason'] = end_reason
+        del self.segment['continues_start']
+        self.file.write(json.dumps(self.segment) + '\n')
+        self.file.flush() #keep the catalog usable if extraction dies mid-session
+        self.segment_count += 1
+        self.segment = None
+
+    #end_reason: why the last segment ended (e.g. the extraction's termination reason)
+    def close(self, end_reason = None):
+        if self.writer:
+            self._end_segment(end_reason or 'extraction ended')
+        self.file.close()
+
+def read_catalog(directory):
+    with open(os.path.join(directory, catalog_file)) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+#Segments matching every criterion; a criterion is a value, a list/set/tuple of accepted values or a predicate,
+#e.g. query_catalog('sessions', stage=4, character='Reimu', end_reason=['cleared'], score_max=lambda score: score > 1e9)
+def query_catalog(directory, **criteria):
+    def matches(row, name, criterion):
+        value = row.get(name)
+        if callable(criterion):
+            return criterion(value)
+        elif isinstance(criterion, (list, set, tuple)):
+            return value in criterion
+        return value == criterion
+
+    return [row for row in read_catalog(directory) if all(matches(row, name, criterion) for name, criterion in criteria.items())]
+
+def open_segment(directory, row):
+    return CaptureReader(os.path.join(directory, row['file']))
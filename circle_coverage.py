@@ -0,0 +1,121 @@
+from spatial import SpatialIndex
+from scipy.signal import fftconvolve
+import numpy as np
+
+#Where to put a circle of a given radius to cover the most points (bullets), computed for a whole grid of centers at once.
+#Methods:
+#  'exact'   counts for every grid center, same as testing each center against each point (inclusive distance):
+#            each point is only tested against the grid centers in its radius' bounding box
+#  'raster'  points snapped to a raster of raster_cell units, then convolved with a disk via FFT;
+#            approximate (each point moves by up to raster_cell * 0.71) but its cost doesn't depend on the point count
+#best_continuous_position() instead searches every possible center, not just grid ones.
+
+#Coverage counts as a (len(xs), len(ys)) array: counts[i, j] is the number of points within radius of (xs[i], ys[j]).
+#xs and ys must be sorted.
+def grid_coverage(positions, xs, ys, radius, method = 'exact', raster_cell = 2):
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+
+    if method == 'exact':
+        px, py = positions[:, 0, None], positions[:, 1, None]
+        x_starts, x_stops = np.searchsorted(xs, px - radius, 'left'), np.searchsorted(xs, px + radius, 'right')
+        y_starts, y_stops = np.searchsorted(ys, py - radius, 'left'), np.searchsorted(ys, py + radius, 'right')
+        if not len(positions) or (x_stops - x_starts).max() <= 0 or (y_stops - y_starts).max() <= 0:
+            return np.zeros((len(xs), len(ys)), dtype=np.int64)
+
+        #every point's window of grid columns and rows (padded to the widest one, padding masked out)
+        columns = x_starts + np.arange((x_stops - x_starts).max())
+        rows = y_starts + np.arange((y_stops - y_starts).max())
+        dx2 = np.where(columns < x_stops, (xs[np.minimum(columns, len(xs) - 1)] - px) ** 2, np.inf)
+        dy2 = np.where(rows < y_stops, (ys[np.minimum(rows, len(ys) - 1)] - py) ** 2, np.inf)
+
+        inside = dx2[:, :, None] + dy2[:, None, :] <= radius ** 2
+        cells = (columns[:, :, None] * len(ys) + rows[:, None, :])[inside]
+        return np.bincount(cells, minlength=len(xs) * len(ys)).reshape(len(xs), len(ys))
+
+    elif method == 'raster':
+        margin = int(np.ceil(radius / raster_cell))
+        origin = np.array([xs.min(), ys.min()]) - margin * raster_cell
+        shape = np.ceil((np.array([xs.max(), ys.max()]) - origin) / raster_cell).astype(np.int64) + margin + 1
+
+        nodes = np.rint((positions - origin) / raster_cell).astype(np.int64)
+        nodes = nodes[((nodes >= 0) & (nodes < shape)).all(axis=1)] #(too far off to be covered by any center)
+        raster = np.bincount(nodes[:, 0] * shape[1] + nodes[:, 1], minlength=shape[0] * shape[1]).reshape(shape).astype(np.float64)
+
+        offsets = np.arange(-margin, margin + 1) * raster_cell
+        disk = (offsets[:, None] ** 2 + offsets[None, :] ** 2 <= radius ** 2).astype(np.float64)
+        counts = np.rint(fftconvolve(raster, disk, mode='same')).astype(np.int64)
+
+        columns = np.rint((xs - origin[0]) / raster_cell).astype(np.int64)
+        rows = np.rint((ys - origin[1]) / raster_cell).astype(np.int64)
+        return counts[np.ix_(columns, rows)]
+
+    raise ValueError(f"Unknown coverage method '{method}' (expected 'exact' or 'raster').")
+
+#(count, (x, y)) of the grid center covering the most points, or (0, None) if none covers any.
+#Ties go to the first center in xs, then ys order (the leftmost, then topmost one).
+def best_grid_position(positions, xs, ys, radius, method = 'exact', raster_cell = 2):
+    counts = grid_coverage(positions, xs, ys, radius, method, raster_cell)
+    if not counts.size or counts.max() == 0:
+        return 0, None
+
+    i, j = np.unravel_index(np.argmax(counts), counts.shape)
+    return int(counts[i, j]), (xs[i], ys[j])
+
+#(count, (x, y)) of the best center anywhere (not restricted to a grid or the playfield), or (0, None) without points.
+#Some best circle always has a point on its edge, so for every point, the circles with that point on their edge are
+#swept around it: each neighbor within 2 * radius is covered over an arc of center angles, and the most overlapping
+#arcs give the best circle through that point. All points are swept at once; this is much slower than grid methods
+#on dense frames (about half a second for 2000 bullets spread over the playfield).
+def best_continuous_position(positions, radius):
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+    if not len(positions):
+        return 0, None
+
+    points, neighbors = SpatialIndex(positions, cell_size=max(2 * radius, 1)).pairs_within(positions, 2 * radius)
+    deltas = positions[neighbors] - positions[points]
+    distances = np.hypot(deltas[:, 0], deltas[:, 1])
+
+    #circles centered on points give a lower bound on the best count: points with fewer neighbors can't beat it
+    centered_counts = np.bincount(points[distances <= radius], minlength=len(positions))
+    lower_bound = centered_counts.max()
+    keep = np.bincount(points, minlength=len(positions))[points] > lower_bound
+    points, deltas, distances = points[keep], deltas[keep], distances[keep]
+
+    #neighbors at the same position are always covered; others over [angle - spread, angle + spread]
+    same = distances == 0
+    base = np.bincount(points[same], minlength=len(positions))
+    points, deltas, distances = points[~same], deltas[~same], distances[~same]
+    spreads = np.arccos(np.minimum(distances / (2 * radius), 1))
+    starts = (np.arctan2(deltas[:, 1], deltas[:, 0]) - spreads) % (2 * np.pi)
+    ends = starts + 2 * spreads
+
+    #arcs going past 2pi are covered from angle 0 until they end, then again from where they start
+    wrapped = ends >= 2 * np.pi
+    base += np.bincount(points[wrapped], minlength=len(positions))
+    ends[wrapped] -= 2 * np.pi
+
+    event_points = np.concatenate((points, points))
+    event_angles = np.concatenate((starts, ends))
+    event_changes = np.concatenate((np.ones(len(points), dtype=np.int64), -np.ones(len(points), dtype=np.int64)))
+
+    #sweep each point's events by angle, starts before ends at the same angle (edges are covered)
+    order = np.argsort(event_points * 8 + event_angles, kind='stable') #(angles are under 2pi < 8)
+    event_points, event_angles, event_changes = event_points[order], event_angles[order], event_changes[order]
+    totals = np.cumsum(event_changes)
+    group_starts = np.searchsorted(event_points, np.arange(len(positions)))
+    covered = totals - np.concatenate(([0], totals))[group_starts][event_points] + base[event_points]
+
+    best_counts = base.copy()
+    if len(covered):
+        np.maximum.at(best_counts, event_points, covered)
+    best = np.argmax(best_counts)
+    if best_counts[best] <= lower_bound:
+        return int(lower_bound), tuple(map(float, positions[np.argmax(centered_counts)]))
+
+    angle = 0.0
+    events = np.flatnonzero(event_points == best)
+    if len(events) and covered[events].max() > base[best]:
+        angle = event_angles[events[np.argmax(covered[events])]]
+    return int(best_counts[best]), tuple(map(float, positions[best] + radius * np.array([np.cos(angle), np.sin(angle)])))
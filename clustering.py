@@ -0,0 +1,150 @@
+from game_entities import *
+from spatial import SpatialIndex
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from dataclasses import dataclass
+import numpy as np
+
+#Density-based clustering of bullets (DBSCAN): a bullet with at least min_points bullets (itself included) within
+#eps is a core bullet; core bullets within eps of each other are in the same cluster, and other bullets within eps
+#of a core bullet join its cluster. Everything else is noise. Neighborhoods come from the grid SpatialIndex, so the
+#cost grows with the number of bullets times their local density rather than with the square of the bullet count.
+#
+#ClusterTracker follows clusters across frames (a cluster keeps its track number while it mostly keeps its bullets)
+#and keeps the largest cluster seen so far. Clusters only take over tracks from the previous frame, so a track missing
+#from a frame has ended: only live tracks are kept, plus totals over ended ones and the longest of them.
+
+@dataclass
+class BulletCluster:
+    track: int #-1 unless tracked
+    size: int
+    centroid: Tuple[float, float]
+    bounds: Tuple[float, float, float, float] #min x, min y, max x, max y
+    radius: float #farthest bullet from the centroid
+    members: np.ndarray #indices into state.bullets
+    frame: Optional[int] = None #seq_frame_id, if tracked
+
+#Cluster label of each position (-1 for noise), with labels numbered from 0 by first member
+def cluster_points(positions, eps = 16, min_points = 8):
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+    labels = np.full(len(positions), -1, dtype=np.int64)
+    if not len(positions):
+        return labels
+
+    index = SpatialIndex(positions, cell_size = eps)
+    sources, targets = index.pairs_within(positions, eps)
+    core = np.bincount(sources, minlength = len(positions)) >= min_points
+
+    #core bullets within eps of each other are connected
+    linked = core[sources] & core[targets]
+    graph = coo_matrix((np.ones(np.count_nonzero(linked), dtype=np.int8), (sources[linked], targets[linked])), shape = (len(positions), len(positions)))
+    _, components = connected_components(graph, directed = False)
+    labels[core] = components[core]
+
+    #border bullets join the cluster of their first core neighbor
+    border = ~core[sources] & core[targets]
+    border_sources, first = np.unique(sources[border], return_index = True)
+    labels[border_sources] = labels[targets[border][first]]
+
+    #renumber 0, 1, 2... in order of first member
+    clustered = labels >= 0
+    _, first_members, renumbered = np.unique(labels[clustered], return_index = True, return_inverse = True)
+    labels[clustered] = np.argsort(np.argsort(first_members))[renumbered]
+    return labels
+
+#Clusters of a state's bullets, largest first
+def bullet_clusters(state: GameState, eps = 16, min_points = 8):
+    positions = np.array([bullet.position for bullet in state.bullets], dtype=np.float64).reshape(-1, 2)
+    labels = cluster_points(positions, eps, min_points)
+
+    clusters = []
+    for label in range(labels.max() + 1 if len(labels) else 0):
+        members = np.flatnonzero(labels == label)
+        points = positions[members]
+        centroid = points.mean(axis = 0)
+        clusters.append(BulletCluster(
+            track = -1,
+            size = len(members),
+            centroid = tuple(map(float, centroid)),
+            bounds = tuple(map(float, (*points.min(axis = 0), *points.max(axis = 0)))),
+            radius = float(np.sqrt(((points - centroid) ** 2).sum(axis = 1).max())),
+            members = members,
+        ))
+
+    clusters.sort(key = lambda cluster: cluster.size, reverse = True)
+    return clusters
+
+class ClusterTracker:
+    def __init__(self, eps = 16, min_points = 8):
+        self.eps = eps
+        self.min_points = min_points
+        self.largest = None #largest cluster so far (with its frame)
+        self.largest_track = None #its track's {'track', 'first_frame', 'last_frame', 'frames', 'max_size'}, kept once ended
+        self.tracks = {} #live tracks (in the last frame's clusters): track: {'track', 'first_frame', ...}
+        self.ended_tracks = 0
+        self.ended_frames = 0 #frames tracked over all ended tracks
+        self.longest_track = None #longest ended track
+        self.next_track = 0
+        self.prev_ids = np.zeros(0, dtype=np.int64) #sorted bullet ids of the previous frame's clusters...
+        self.prev_tracks = np.zeros(0, dtype=np.int64) #...and their tracks
+
+    #Clusters of state's bullets with their tracks: each previous cluster passes its track on to the new cluster
+    #sharing the most of its bullets (bigger overlaps first); other clusters start new tracks
+    def add(self, state: GameState):
+        clusters = bullet_clusters(state, self.eps, self.min_points)
+        ids = np.fromiter((bullet.id for bullet in state.bullets), dtype=np.int64, count = len(state.bullets))
+
+        member_ids = np.concatenate([ids[cluster.members] for cluster in clusters] or [np.zeros(0, dtype=np.int64)])
+        member_clusters = np.repeat(np.arange(len(clusters)), [cluster.size for cluster in clusters])
+
+        positions = np.minimum(np.searchsorted(self.prev_ids, member_ids), max(len(self.prev_ids) - 1, 0))
+        shared = self.prev_ids[positions] == member_ids if len(self.prev_ids) else np.zeros(len(member_ids), dtype=bool)
+        pairs, overlaps = np.unique(np.stack((member_clusters[shared], self.prev_tracks[positions[shared]]), axis = 1), axis = 0, return_counts = True)
+
+        taken = set()
+        for cluster_index, track in pairs[np.argsort(-overlaps, kind = 'stable')]:
+            if clusters[cluster_index].track == -1 and track not in taken:
+                clusters[cluster_index].track = int(track)
+                taken.add(track)
+
+        for cluster in clusters:
+            if cluster.track == -1:
+                cluster.track = self.next_track
+                self.next_track += 1
+                self.tracks[cluster.track] = {'track': cluster.track, 'first_frame': state.seq_frame_id, 'last_frame': None, 'frames': 0, 'max_size': 0}
+            cluster.frame = state.seq_frame_id
+            track = self.tracks[cluster.track]
+            track['last_frame'] = state.seq_frame_id
+            track['frames'] += 1
+            track['max_size'] = max(track['max_size'], cluster.size)
+
+        live = {cluster.track for cluster in clusters}
+        for track in [track for track in self.tracks if track not in live]:
+            self._end_track(track)
+
+        if clusters and (self.largest is None or clusters[0].size > self.largest.size):
+            self.largest = clusters[0]
+            self.largest_track = self.tracks[clusters[0].track]
+
+        order = np.argsort(member_ids)
+        self.prev_ids = member_ids[order]
+        self.prev_tracks = np.array([cluster.track for cluster in clusters], dtype=np.int64)[member_clusters[order]]
+        return clusters
+
+    def _end_track(self, track):
+        ended = self.tracks.pop(track)
+        self.ended_tracks += 1
+        self.ended_frames += ended['frames']
+        if self.longest_track is None or ended['frames'] > self.longest_track['frames']:
+            self.longest_track = ended
+
+    #Starts over (e.g. on a new spell), keeping track numbering going
+    def reset(self):
+        self.largest = None
+        self.largest_track = None
+        self.tracks = {}
+        self.ended_tracks = 0
+        self.ended_frames = 0
+        self.longest_track = None
+        self.prev_ids = np.zeros(0, dtype=np.int64)
+        self.prev_tracks = np.zeros(0, dtype=np.int64)
@@ -0,0 +1,153 @@
+from game_entities import *
+from interface import game_id, uses_pivot_angle
+from dataclasses import dataclass
+import numpy as np
+import weakref
+
+#Collision checks between a circle (by default, the player's hitbox) and everything that can hit it, as NumPy
+#operations over all entities at once. Entities are reduced to three kinds of shapes:
+#  circles     bullets (hitbox_radius * scale) and round enemy hitboxes
+#  rectangles  line lasers, telegraphed/infinite lasers and rectangular enemy hitboxes (rotated, or around their
+#              pivot in games using pivot_angle, like AnalysisPlotEnemies draws them)
+#  capsules    curve laser segments between consecutive nodes, width wide
+#Only what can currently hit counts: active, tangible bullets done with their spawn delay, active telegraphed
+#lasers and enemies with a hitbox. Lasers are width wide.
+#
+#Graze checks use graze_margin, the extra distance around the player's hitbox within which grazeable entities
+#that don't hit are grazed (approximate: games graze with their own boxes and timings).
+
+graze_margin = 20
+
+@dataclass
+class Collisions: #indices into the state's entity lists
+    bullets: np.ndarray
+    lasers: np.ndarray
+    enemies: np.ndarray
+
+    def __bool__(self):
+        return bool(len(self.bullets) or len(self.lasers) or len(self.enemies))
+
+_kinds = ['bullets', 'lasers', 'enemies']
+
+#Shape arrays of a state; 'owners' are (kind index, entity index) of each shape, 'grazeable' whether it can be grazed
+class CollisionShapes:
+    #kinds: entity lists to include
+    def __init__(self, state: GameState, pivot_rectangles = game_id in uses_pivot_angle, kinds = _kinds):
+        circles, rectangles, capsules = [], [], []
+
+        for index, bullet in enumerate(state.bullets if 'bullets' in kinds else []):
+            if bullet.is_active and getattr(bullet, 'show_delay', 0) == 0 and not getattr(bullet, 'is_intangible', False):
+                circles.append((*bullet.position, bullet.hitbox_radius * bullet.scale, 0, index, bullet.is_grazeable))
+
+        for index, laser in enumerate(state.lasers if 'lasers' in kinds else []):
+            if laser.laser_type == 2:
+                nodes = laser.nodes
+                for node, next_node in zip(nodes, nodes[1:]):
+                    capsules.append((*node.position, *next_node.position, laser.width / 2, 1, index, True))
+                if len(nodes) == 1:
+                    capsules.append((*nodes[0].position, *nodes[0].position, laser.width / 2, 1, index, True))
+
+            elif laser.laser_type != 1 or laser.state == 2: #(telegraphs only hit once active)
+                cos, sin = np.cos(laser.angle), np.sin(laser.angle)
+                rectangles.append((laser.position[0] + cos * laser.length / 2, laser.position[1] + sin * laser.length / 2, laser.length / 2, laser.width / 2, laser.angle, 1, index, True))
+
+        for index, enemy in enumerate(state.enemies if 'enemies' in kinds else []):
+            if enemy.no_hitbox:
+                continue
+            if not enemy.is_rectangle:
+                circles.append((*enemy.position, enemy.hitbox[0] / 2, 2, index, enemy.is_grazeable))
+            elif pivot_rectangles:
+                pivot_x = enemy.position[0] - np.sin(enemy.pivot_angle + np.pi/2) * enemy.hitbox[1] / 2
+                pivot_y = enemy.position[1] + np.cos(enemy.pivot_angle + np.pi/2) * enemy.hitbox[1] / 2
+                angle = enemy.rotation - np.pi/2
+                rectangles.append((pivot_x - np.sin(angle) * enemy.hitbox[1] / 2, pivot_y + np.cos(angle) * enemy.hitbox[1] / 2, enemy.hitbox[0] / 2, enemy.hitbox[1] / 2, angle, 2, index, enemy.is_grazeable))
+            else:
+                rectangles.append((*enemy.position, enemy.hitbox[0] / 2, enemy.hitbox[1] / 2, enemy.rotation, 2, index, enemy.is_grazeable))
+
+        circles = np.array(circles, dtype=np.float64).reshape(-1, 6)
+        self.circle_centers, self.circle_radii = circles[:, :2], circles[:, 2]
+
+        rectangles = np.array(rectangles, dtype=np.float64).reshape(-1, 8)
+        self.rectangle_centers, self.rectangle_halves = rectangles[:, :2], rectangles[:, 2:4]
+        self.rectangle_axes = np.stack((np.cos(rectangles[:, 4]), np.sin(rectangles[:, 4])), axis=1)
+
+        capsules = np.array(capsules, dtype=np.float64).reshape(-1, 8)
+        self.capsule_starts, self.capsule_ends, self.capsule_radii = capsules[:, :2], capsules[:, 2:4], capsules[:, 4]
+
+        self.owners = np.concatenate((circles[:, 3:5], rectangles[:, 5:7], capsules[:, 5:7])).astype(np.int64)
+        self.grazeable = np.concatenate((circles[:, 5], rectangles[:, 7], capsules[:, 7])).astype(bool)
+
+    def __len__(self):
+        return len(self.owners)
+
+    #Distance from each point (m, 2) to the edge of each shape (m, shapes); negative inside
+    def distances(self, points):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2)
+
+        circle_deltas = points - self.circle_centers
+        circles = np.sqrt(np.einsum('mni,mni->mn', circle_deltas, circle_deltas)) - self.circle_radii
+
+        #rectangles: in each rectangle's frame, distance to a box of its half extents
+        deltas = points - self.rectangle_centers
+        axes = self.rectangle_axes
+        local = np.abs(np.stack((deltas[..., 0] * axes[:, 0] + deltas[..., 1] * axes[:, 1], deltas[..., 1] * axes[:, 0] - deltas[..., 0] * axes[:, 1]), axis=-1)) - self.rectangle_halves
+        outside = np.maximum(local, 0)
+        rectangles = np.sqrt(np.einsum('mni,mni->mn', outside, outside)) + np.minimum(local.max(axis=-1), 0)
+
+        #capsules: distance to the closest point of each segment
+        segments = self.capsule_ends - self.capsule_starts
+        lengths2 = np.einsum('ni,ni->n', segments, segments)
+        deltas = points - self.capsule_starts
+        with np.errstate(invalid='ignore', divide='ignore'):
+            t = np.clip(np.nan_to_num(np.einsum('mni,ni->mn', deltas, segments) / lengths2), 0, 1)
+        closest = deltas - t[..., None] * segments
+        capsules = np.sqrt(np.einsum('mni,mni->mn', closest, closest)) - self.capsule_radii
+
+        return np.concatenate((circles, rectangles, capsules), axis=1)
+
+    def _collisions(self, mask):
+        owners = self.owners[mask]
+        return Collisions(*(np.unique(owners[owners[:, 0] == kind, 1]) for kind in range(len(_kinds))))
+
+    #What a circle at point of radius radius touches
+    def hits(self, point, radius):
+        return self._collisions(self.distances(point)[0] <= radius)
+
+    #What a circle at point of radius radius doesn't touch but is within margin of, among grazeable shapes
+    def grazes(self, point, radius, margin = graze_margin):
+        distances = self.distances(point)[0]
+        grazed = self._collisions(self.grazeable & (distances <= radius + margin))
+        hit = self.hits(point, radius)
+        return Collisions(*(np.setdiff1d(getattr(grazed, kind), getattr(hit, kind)) for kind in _kinds))
+
+    #Whether a circle of radius radius at each point (m, 2) would touch anything, in chunks of chunk_size points
+    def any_hit(self, points, radius, chunk_size = 256):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if not len(self):
+            return np.zeros(len(points), dtype=bool)
+        return np.concatenate([(self.distances(points[start:start + chunk_size]) <= radius).any(axis=1) for start in range(0, len(points), chunk_size)] or [np.zeros(0, dtype=bool)])
+
+    #Distance between a circle of radius radius at each point (m, 2) and the closest shape (inf without shapes)
+    def clearance(self, points, radius, chunk_size = 256):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if not len(self):
+            return np.full(len(points), np.inf)
+        return np.concatenate([self.distances(points[start:start + chunk_size]).min(axis=1) - radius for start in range(0, len(points), chunk_size)] or [np.zeros(0)])
+
+#Shapes of the last state asked for are kept, so analyzers looking at the same frame share them
+#(the state is only weakly referenced, like spatial_index's)
+_last_shapes = (lambda: None, None)
+
+def collision_shapes(state: GameState):
+    global _last_shapes
+    if _last_shapes[0]() is not state:
+        _last_shapes = (weakref.ref(state), CollisionShapes(state))
+    return _last_shapes[1]
+
+#What hits the player (or a circle of radius radius at position)
+def player_hits(state: GameState, position = None, radius = None):
+    return collision_shapes(state).hits(position if position is not None else state.player_position, radius if radius is not None else state.player_hitbox_rad)
+
+#What the player (or a circle of radius radius at position) grazes without getting hit
+def player_grazes(state: GameState, position = None, radius = None, margin = graze_margin):
+    return collision_shapes(state).grazes(position if position is not None else state.player_position, radius if radius is not None else state.player_hitbox_rad, margin)
@@ -0,0 +1,204 @@
+from game_entities import *
+import game_entities
+import dataclasses
+import threading
+import typing
+import queue
+import json
+import gzip
+import csv
+import os
+
+#Exports extracted states as plain text: one states file (one row per frame, scalar fields flattened)
+#plus one file per entity list (one row per entity per frame), as CSV or JSON Lines.
+#Columns come from the game_entities dataclasses: nested dataclasses are flattened with dotted names
+#(spellcard.spell_id, env.character...), 2-tuples become .x/.y columns, and entity tables include the fields of
+#every subclass of their entity class (e.g. lasers has LineLaser/InfiniteLaser/CurveLaser fields, plus class).
+#Nested dataclasses use the classes found in the first state, so game-specific subclasses (RunEnvironmentUDoALG...)
+#get their own columns. Other lists, dicts and unions (player_options_pos, drops, kyouko_echo, CurveLaser nodes...)
+#are written as JSON values.
+#
+#Writing happens in a background thread; add() only blocks once max_buffered_frames states are waiting,
+#which keeps memory bounded however long the extraction runs.
+
+skipped_types = [np.ndarray] #screenshots
+
+def _unwrap_optional(annotation):
+    if typing.get_origin(annotation) is typing.Union:
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return annotation
+
+def _entity_class(annotation):
+    if typing.get_origin(annotation) is list:
+        args = typing.get_args(annotation)
+        if args and dataclasses.is_dataclass(args[0]):
+            return args[0]
+    return None
+
+#(columns, {entity list field: entity class}, JSON columns) for a dataclass.
+#value: an instance to take the runtime classes of nested dataclasses from (e.g. env holds a game-specific
+#RunEnvironment subclass); unions of several types (kyouko_echo...) are kept whole as JSON columns.
+def _schema(cls, prefix = '', value = None):
+    columns = []
+    tables = {}
+    json_columns = set()
+    hints = typing.get_type_hints(cls)
+
+    for field in dataclasses.fields(cls):
+        annotation = _unwrap_optional(hints[field.name])
+        name = prefix + field.name
+        field_value = getattr(value, field.name, None)
+
+        if annotation in skipped_types:
+            continue
+        elif _entity_class(annotation):
+            tables[name] = _entity_class(annotation)
+        elif typing.get_origin(annotation) is typing.Union:
+            columns.append(name)
+            json_columns.add(name)
+        elif dataclasses.is_dataclass(annotation):
+            nested_columns, nested_tables, nested_json_columns = _schema(type(field_value) if dataclasses.is_dataclass(field_value) else annotation, name + '.', field_value)
+            columns += nested_columns
+            tables.update(nested_tables)
+            json_columns |= nested_json_columns
+        elif typing.get_origin(annotation) is tuple and len(typing.get_args(annotation)) == 2:
+            columns += [name + '.x', name + '.y']
+        else:
+            columns.append(name)
+
+    return columns, tables, json_columns
+
+#(columns, JSON columns) of an entity table; entity lists nested in entities (CurveLaser.nodes) are JSON columns
+def _entity_schema(entity_class):
+    columns = ['seq_frame_id', 'frame_stage', 'class']
+    json_columns = set()
+    for cls in [entity_class] + [cls for cls in vars(game_entities).values() if isinstance(cls, type) and cls is not entity_class and issubclass(cls, entity_class)]:
+        class_columns, class_tables, class_json_columns = _schema(cls)
+        columns += [column for column in class_columns + list(class_tables) if column not in columns]
+        json_columns |= class_json_columns | set(class_tables)
+    return columns, json_columns
+
+def _flatten(value, prefix, row, tables = None, json_columns = ()):
+    if prefix in json_columns:
+        row[prefix] = value
+    elif dataclasses.is_dataclass(value):
+        for name, field_value in value.__dict__.items():
+            _flatten(field_value, f'{prefix}.{name}' if prefix else name, row, tables, json_columns)
+    elif isinstance(value, tuple) and len(value) == 2:
+        row[prefix + '.x'], row[prefix + '.y'] = value
+    elif tables is not None and prefix in tables:
+        pass #written to its own table
+    elif isinstance(value, np.ndarray):
+        pass
+    else:
+        row[prefix] = value
+
+#dataclasses nested in JSON values
+def _json_default(value):
+    if dataclasses.is_dataclass(value):
+        return dataclasses.asdict(value)
+    return str(value)
+
+class _TableFile:
+    def __init__(self, path, columns, format, compress):
+        self.file = gzip.open(path + '.gz', 'wt', newline='') if compress else open(path, 'w', newline='')
+        self.columns = columns
+        self.format = format
+        if format == 'csv':
+            self.writer = csv.DictWriter(self.file, columns, restval='', extrasaction='ignore')
+            self.writer.writeheader()
+
+    def write(self, row):
+        if self.format == 'csv':
+            for name, value in row.items():
+                if isinstance(value, (list, dict, tuple)) or dataclasses.is_dataclass(value):
+                    row[name] = json.dumps(value, default=_json_default)
+            self.writer.writerow(row)
+        else:
+            self.file.write(json.dumps({column: row.get(column) for column in self.columns}, default=_json_default) + '\n')
+
+    def close(self):
+        self.file.close()
+
+class StateExporter:
+    def __init__(self, directory, format = 'csv', compress = False, rotate_frames = 0, max_buffered_frames = 300):
+        if format not in ['csv', 'jsonl']:
+            raise ValueError(f"Unknown export format '{format}' (expected 'csv' or 'jsonl').")
+
+        self.directory = directory
+        self.format = format
+        self.compress = compress #gzip every file
+        self.rotate_frames = rotate_frames #start new files every N frames (0 = never)
+        self.frame_count = 0
+        self.part = 0
+        self.files = {}
+        self.schema = None
+        self.error = None
+        self.queue = queue.Queue(max_buffered_frames)
+        os.makedirs(directory, exist_ok = True)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def add(self, state: GameState):
+        if self.error:
+            raise RuntimeError(f"Exporter failed: {self.error}")
+        self.queue.put(state)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.error:
+            raise RuntimeError(f"Exporter failed: {self.error}")
+
+    def _run(self):
+        try:
+            while True:
+                state = self.queue.get()
+                if state is None:
+                    break
+                self._write(state)
+        except Exception as e:
+            self.error = e
+            while self.queue.get() is not None: #keep add() from blocking forever
+                pass
+        finally:
+            for file in self.files.values():
+                file.close()
+            self.files = {}
+
+    def _file(self, name, columns):
+        if name not in self.files:
+            suffix = f'_{self.part:04d}' if self.rotate_frames else ''
+            self.files[name] = _TableFile(os.path.join(self.directory, f'{name}{suffix}.{self.format}'), columns, self.format, self.compress)
+        return self.files[name]
+
+    def _write(self, state):
+        if self.schema is None: #(from the first state, for the runtime classes of its nested dataclasses)
+            columns, tables, json_columns = _schema(type(state), value = state)
+            self.schema = (columns, tables, json_columns, {name: _entity_schema(entity_class) for name, entity_class in tables.items()})
+        columns, tables, json_columns, table_schemas = self.schema
+
+        if self.rotate_frames and self.frame_count and self.frame_count % self.rotate_frames == 0:
+            for file in self.files.values():
+                file.close()
+            self.files = {}
+            self.part += 1
+
+        row = {}
+        _flatten(state, '', row, tables, json_columns)
+        self._file('states', columns).write(row)
+
+        for name in tables:
+            entities = state
+            for attribute in name.split('.'):
+                entities = getattr(entities, attribute, None) if entities is not None else None
+
+            for entity in entities or []:
+                entity_row = {'seq_frame_id': state.seq_frame_id, 'frame_stage': state.frame_stage, 'class': type(entity).__name__}
+                entity_columns, entity_json_columns = table_schemas[name]
+                _flatten(entity, '', entity_row, json_columns = entity_json_columns)
+                self._file(name, entity_columns).write(entity_row)
+
+        self.frame_count += 1
@@ -0,0 +1,85 @@
+#Decides which entity categories get re-read on a given frame during sequence extraction.
+#Categories not due on a frame are carried over from the previous state (see seq_carried_over).
+
+entity_categories = ['bullets', 'lasers', 'enemies', 'items', 'player_shots']
+
+class ExtractionSchedule:
+    max_interval = 60 #adaptive mode never slows a category below once per second
+    recover_frames = 120 #frames spent well under budget before a slowed category speeds back up
+    recover_ratio = 0.5 #"well under budget" = frame time below this fraction of the budget
+
+    #rates: {category: N} to read every Nth game frame, or 0 to read only when the last frame stayed within budget
+    #categories are prioritized in the order they're listed in rates (first = highest priority, never slowed);
+    #categories missing from rates are read every frame, after the listed ones
+    def __init__(self, rates, adaptive = False, frame_budget_ms = 1000/60):
+        self.base_intervals = {category: rate for category, rate in rates.items() if category in entity_categories}
+        self.base_intervals.update({category: 1 for category in entity_categories if category not in self.base_intervals})
+        self.intervals = dict(self.base_intervals)
+        self.priority = list(self.base_intervals)
+        self.adaptive = adaptive
+        self.frame_budget = frame_budget_ms / 1000
+        self.last_read = {}
+        self.last_frame_time = 0
+        self.frames_under_budget = 0
+        self.adjustments = 0
+
+    def due(self, frame_stage):
+        due = set()
+        within_budget = self.last_frame_time <= self.frame_budget
+
+        for category, interval in self.intervals.items():
+            last_read = self.last_read.get(category)
+
+            if interval == 0:
+                is_due = within_budget or last_read is None
+            else:
+                #stage frames go backwards on stage transitions/retries, so always re-read then
+                is_due = last_read is None or not 0 <= frame_stage - last_read < interval
+
+            if is_due:
+                due.add(category)
+
+        return due
+
+    #state: the state extracted; categories it didn't carry over count as read on its frame
+    #(due categories can still be carried over, e.g. past the per-frame deadline, and stay due until read)
+    def record(self, frame_time, state = None):
+        if state is not None:
+            for category in self.intervals:
+                if category not in state.seq_carried_over:
+                    self.last_read[category] = state.frame_stage
+
+        self.last_frame_time = frame_time
+        if not self.adaptive:
+            return
+
+        if frame_time > self.frame_budget:
+            self.frames_under_budget = 0
+
+            #slow down the lowest priority category that can still be slowed
+            for category in reversed(self.priority[1:]):
+                if 0 < self.intervals[category] < self.max_interval:
+                    self.intervals[category] = min(self.max_interval, self.intervals[category] * 2)
+                    self.adjustments += 1
+                    break
+
+        elif frame_time < self.frame_budget * self.recover_ratio:
+            self.frames_under_budget += 1
+
+            if self.frames_under_budget >= self.recover_frames:
+                self.frames_under_budget = 0
+
+                #speed back up the highest priority category that was slowed
+                for category in self.priority:
+                    if self.intervals[category] > self.base_intervals[category]:
+                        self.intervals[category] = max(self.base_intervals[category], self.intervals[category] // 2)
+                        self.adjustments += 1
+                        break
+
+        else:
+            self.frames_under_budget = 0
+
+    def report(self):
+        if self.adaptive and self.adjustments:
+            rates = ", ".join(f"{category} every {interval}f" for category, interval in self.intervals.items() if interval)
+            print(f"| Adaptive extraction rates: {self.adjustments} adjustments; final rates: {rates}")
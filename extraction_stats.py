@@ -0,0 +1,72 @@
+from game_entities import GameState
+import bisect
+
+#Collects frame-drop and latency data over a sequence extraction.
+#Memory use is constant: latencies are binned as they come in rather than stored.
+class ExtractionStats:
+    frame_time = 1/60 #time budget for a single frame at 60fps
+    latency_bins_ms = [1, 2, 4, 8, 12, 16.67, 25, 33.33, 50, 100] #upper bounds; last bin catches everything above
+    histogram_width = 40
+
+    def __init__(self):
+        self.extracted_frames = 0
+        self.skipped_frames = 0
+        self.gaps = 0
+        self.longest_gap = 0
+        self.latency_total = 0
+        self.latency_max = 0
+        self.late_frames = 0
+        self.latency_counts = [0] * (len(self.latency_bins_ms) + 1)
+        self.torn_frames = 0
+        self.torn_categories = {}
+
+    def add(self, state: GameState):
+        self.extracted_frames += 1
+
+        if state.seq_frames_skipped:
+            self.skipped_frames += state.seq_frames_skipped
+            self.gaps += 1
+            self.longest_gap = max(self.longest_gap, state.seq_frames_skipped)
+
+        if state.seq_latency is not None:
+            self.latency_total += state.seq_latency
+            self.latency_max = max(self.latency_max, state.seq_latency)
+            if state.seq_latency > self.frame_time:
+                self.late_frames += 1
+            self.latency_counts[bisect.bisect_left(self.latency_bins_ms, state.seq_latency * 1000)] += 1
+
+        if state.seq_torn:
+            self.torn_frames += 1
+            for category in state.seq_torn:
+                self.torn_categories[category] = self.torn_categories.get(category, 0) + 1
+
+    @property
+    def drop_rate(self):
+        total = self.extracted_frames + self.skipped_frames
+        return self.skipped_frames / total if total else 0
+
+    def report(self):
+        if not self.extracted_frames:
+            return
+
+        print(f"Extraction stats: {self.extracted_frames} frames extracted, {self.skipped_frames} frames skipped ({100*self.drop_rate:.2f}% drop rate)")
+        if self.gaps:
+            print(f"| {self.gaps} gaps in the sequence; longest gap was {self.longest_gap} frames")
+
+        if self.torn_frames:
+            torn_breakdown = ", ".join(f"{category} {count}" for category, count in self.torn_categories.items())
+            print(f"| {self.torn_frames} torn frames ({100*self.torn_frames/self.extracted_frames:.2f}%); torn categories: {torn_breakdown}")
+
+        print(f"| Latency: {1000*self.latency_total/self.extracted_frames:.2f}ms mean, {1000*self.latency_max:.2f}ms max; {self.late_frames} frames ({100*self.late_frames/self.extracted_frames:.2f}%) over the 60fps budget")
+
+        max_count = max(self.latency_counts)
+        lower_bound = 0
+        for i, count in enumerate(self.latency_counts):
+            if i < len(self.latency_bins_ms):
+                label = f"{lower_bound:g}-{self.latency_bins_ms[i]:g}ms"
+                lower_bound = self.latency_bins_ms[i]
+            else:
+                label = f">{lower_bound:g}ms"
+
+            bar = "#" * round(self.histogram_width * count / max_count) if max_count else ""
+            print(f"| {label:>13} {bar} {count if count else ''}")
@@ -328,6 +328,10 @@ class GameState:
     stage_chapter: int
     seq_frame_id: Optional[int]
     seq_real_time: Optional[float]
+    seq_frames_skipped: Optional[int] #game frames missed since the previous extracted state (always 0 in exact mode)
+    seq_latency: Optional[float] #seconds between the frame tick being noticed and the state being fully extracted
+    seq_carried_over: List[str] #entity categories copied from the previous state rather than re-read (see extraction_rates)
+    seq_torn: List[str] #entity categories read after the game had already moved past frame_stage (can't happen in exact mode)
     pause_state: int
     game_mode: int
     game_speed: float #usually 1
@@ -0,0 +1,55 @@
+import numpy as np
+
+#Accumulates how many times each pixel of an area was covered by circles (or squares), frame after frame.
+#Every radius is quantized to a quarter pixel and stamped with a precomputed mask of pixel offsets around the
+#pixel nearest to the center (so covered pixels may be off by up to half a pixel); all stamps of a frame are summed
+#at once with a bincount over flattened pixel indices. Stamps partially outside the area are clipped to it.
+#resolution is in pixels per world unit (2 = half-unit pixels); pixel [row, column] is at
+#(origin x + column / resolution, origin y + row / resolution).
+
+radius_steps = 4 #per pixel
+
+class HeatmapAccumulator:
+    #max_count: cap on each pixel's count (None for no cap)
+    def __init__(self, width, height, origin = (0, 0), resolution = 1, circles = True, max_count = None):
+        self.shape = (int(round(height * resolution)) + 1, int(round(width * resolution)) + 1)
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self.resolution = resolution
+        self.circles = circles
+        self.max_count = max_count
+        self.heatmap = np.zeros(self.shape)
+        self.masks = {}
+
+    #(row offsets, column offsets) of the pixels covered by a stamp of radius steps / radius_steps pixels
+    def _mask(self, steps):
+        if steps not in self.masks:
+            radius = steps / radius_steps
+            offsets = np.arange(-int(radius), int(radius) + 1)
+            rows, columns = np.meshgrid(offsets, offsets, indexing='ij')
+            covered = rows ** 2 + columns ** 2 <= radius ** 2 if self.circles else np.ones(rows.shape, dtype=bool)
+            self.masks[steps] = (rows[covered], columns[covered])
+        return self.masks[steps]
+
+    #positions: (n, 2) world positions, radii: n world radii (or one for all)
+    def add(self, positions, radii):
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        if not len(positions):
+            return
+
+        pixels = (positions - self.origin) * self.resolution
+        centers = np.rint(pixels[:, ::-1]).astype(np.int64) #(row, column)
+        steps = np.rint(np.broadcast_to(np.asarray(radii, dtype=np.float64) * self.resolution * radius_steps, len(positions))).astype(np.int64)
+
+        height, width = self.shape
+        stamped = []
+        for step in np.unique(steps):
+            group = centers[steps == step]
+            mask_rows, mask_columns = self._mask(step)
+            rows = group[:, 0, None] + mask_rows
+            columns = group[:, 1, None] + mask_columns
+            inside = (0 <= rows) & (rows < height) & (0 <= columns) & (columns < width)
+            stamped.append((rows * width + columns)[inside])
+
+        self.heatmap += np.bincount(np.concatenate(stamped), minlength=height * width).reshape(self.shape)
+        if self.max_count is not None:
+            np.minimum(self.heatmap, self.max_count, out=self.heatmap)
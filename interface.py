@@ -13,6 +13,7 @@ import cv2
 import keyboard 
 import struct
 import random  
+import memory_sources
 
 # Step 1 - Find valid game processes & windows
 _game_main_modules = {
@@ -38,44 +39,54 @@ _game_main_modules = {
     'th19.exe':  ('19', 'th19', 'th19.exe', 'udoalg', 'unfinished dream of all living ghost'),
 }
 
-# Windows are found *before* knowing the game process in order to filter out zombie processes
-_windows = {}
-for window in gw.getAllWindows():
-    pid = ctypes.c_ulong()
-    ctypes.windll.user32.GetWindowThreadProcessId(window._hWnd, ctypes.byref(pid))
-    _windows[pid.value] = window
-
-valid_game_processes = []
-valid_game_windows = []
-for process in psutil.process_iter(['pid', 'name', 'status']):
-    if process.info['name'] and process.info['name'] in _game_main_modules.keys():
-        if process.info['status'] != psutil.STATUS_ZOMBIE and process.pid in _windows:
-            valid_game_processes.append(process)
-            valid_game_windows.append(_windows[process.pid])
-
-if not valid_game_processes:
-    print('Interface error: No valid game process found.')
-    print(f'Make sure the game is open.')
-    exit()
-
-
-# Step 2 - Select the desired game (break tie if multiple games are open)
-_valid_game_i = 0
-_tiebreaker = _settings['tiebreaker_game']
-if _tiebreaker and isinstance(_tiebreaker, str) and len(valid_game_processes) > 1:
-    print(f'Tiebreaker: Multiple games are open; {_tiebreaker} will be selected if found (otherwise will select first).')
-    for i in range(len(valid_game_processes)):
-        if _tiebreaker.lower().strip() in _game_main_modules[valid_game_processes[i].info['name']]:
-            _valid_game_i = i
-            break
-
-game_process = valid_game_processes[_valid_game_i]
-_game_window = valid_game_windows[_valid_game_i]
-_module_name = game_process.info['name']
-game_id = int(_game_main_modules[_module_name][0])
-
-print(f'Found the {_module_name} game process with PID: {game_process.pid}')
-print(f'Found the game window: {_game_window}')
+# A non-live memory source (see memory_sources.py) replaces the game process entirely
+_memory_source = memory_sources.active
+
+if _memory_source is None:
+    # Windows are found *before* knowing the game process in order to filter out zombie processes
+    _windows = {}
+    for window in gw.getAllWindows():
+        pid = ctypes.c_ulong()
+        ctypes.windll.user32.GetWindowThreadProcessId(window._hWnd, ctypes.byref(pid))
+        _windows[pid.value] = window
+
+    valid_game_processes = []
+    valid_game_windows = []
+    for process in psutil.process_iter(['pid', 'name', 'status']):
+        if process.info['name'] and process.info['name'] in _game_main_modules.keys():
+            if process.info['status'] != psutil.STATUS_ZOMBIE and process.pid in _windows:
+                valid_game_processes.append(process)
+                valid_game_windows.append(_windows[process.pid])
+
+    if not valid_game_processes:
+        print('Interface error: No valid game process found.')
+        print(f'Make sure the game is open.')
+        exit()
+
+
+    # Step 2 - Select the desired game (break tie if multiple games are open)
+    _valid_game_i = 0
+    _tiebreaker = _settings['tiebreaker_game']
+    if _tiebreaker and isinstance(_tiebreaker, str) and len(valid_game_processes) > 1:
+        print(f'Tiebreaker: Multiple games are open; {_tiebreaker} will be selected if found (otherwise will select first).')
+        for i in range(len(valid_game_processes)):
+            if _tiebreaker.lower().strip() in _game_main_modules[valid_game_processes[i].info['name']]:
+                _valid_game_i = i
+                break
+
+    game_process = valid_game_processes[_valid_game_i]
+    _game_window = valid_game_windows[_valid_game_i]
+    _module_name = game_process.info['name']
+    game_id = int(_game_main_modules[_module_name][0])
+
+    print(f'Found the {_module_name} game process with PID: {game_process.pid}')
+    print(f'Found the game window: {_game_window}')
+else:
+    game_process = None
+    _game_window = None
+    _module_name = _memory_source.module_name
+    game_id = int(_game_main_modules[_module_name][0])
+    print(f'Reading {_module_name} memory from {type(_memory_source).__name__} (no game process)')
 
 
 # Step 3 - Unpack offsets from selected game into namespace
@@ -93,16 +104,19 @@ del offsets #be kind to your namespace :)
 
 
 # Step 4 - Get the selected process's base address
-_base_address = None
-_module_handle = win32api.OpenProcess(win32con.PROCESS_QUERY_INFORMATION | win32con.PROCESS_VM_READ, False, game_process.pid)
-_module_list = win32process.EnumProcessModules(_module_handle)
+if _memory_source is None:
+    _base_address = None
+    _module_handle = win32api.OpenProcess(win32con.PROCESS_QUERY_INFORMATION | win32con.PROCESS_VM_READ, False, game_process.pid)
+    _module_list = win32process.EnumProcessModules(_module_handle)
 
-for module in _module_list:
-    module_info = win32process.GetModuleFileNameEx(_module_handle, module)
+    for module in _module_list:
+        module_info = win32process.GetModuleFileNameEx(_module_handle, module)
 
-    if _module_name in module_info.lower():
-        _base_address = module
-        break
+        if _module_name in module_info.lower():
+            _base_address = module
+            break
+else:
+    _base_address = _memory_source.base_address
 
 if _base_address is not None:
     print(f'Base address of the process main module: {hex(_base_address)}')
@@ -114,7 +128,7 @@ else:
 # Step 5 - Open the process handle
 _PROCESS_VM_READ = 0x0010
 _PROCESS_QUERY_INFORMATION = 0x0400
-_process_handle = ctypes.windll.kernel32.OpenProcess(_PROCESS_VM_READ | _PROCESS_QUERY_INFORMATION, False, game_process.pid)
+_process_handle = ctypes.windll.kernel32.OpenProcess(_PROCESS_VM_READ | _PROCESS_QUERY_INFORMATION, False, game_process.pid) if game_process else None
 
 
 # ==========================================================
@@ -162,11 +176,15 @@ curve_sprites = ['Standard', 'Thunder', 'Grapevine'] #not worth setting per-game
 # Interface Method Definitions
 
 def get_rgb_screenshot(): #Note: fails if the window is not visible!
+    if not _game_window: #no window to capture when reading from a memory source
+        return None
     #screenshot = pyautogui.screenshot(region=(_game_window.left+35, _game_window.top+42, _game_window.width-44, _game_window.height-47))
     screenshot = pyautogui.screenshot(region=(_game_window.left, _game_window.top, _game_window.width, _game_window.height))
     return np.array(screenshot)
 
 def get_greyscale_screenshot(): #Note: fails if the window is not visible!
+    if not _game_window:
+        return None
     #screenshot = pyautogui.screenshot(region=(_game_window.left+35, _game_window.top+42, _game_window.width-44, _game_window.height-47))
     screenshot = pyautogui.screenshot(region=(_game_window.left, _game_window.top, _game_window.width, _game_window.height))
     rgb_screenshot = np.array(screenshot)
@@ -295,24 +313,44 @@ def terminate():
     global auto_termination
     auto_termination = True
 
-def eval_termination_conditions(need_active):
-    if read_int(pause_state, rel=True) == 1:
-        return "Non-run game state detected"
-    elif not game_process.is_running():
+#continuous: don't terminate on non-run states (menus, game over...), e.g. to keep extracting across runs
+def eval_termination_conditions(need_active, continuous=False):
+    memory_ret = eval_memory_termination_conditions(continuous)
+    if memory_ret:
+        return memory_ret
+    elif game_process and not game_process.is_running():
         return "Game was closed" #bugged, but not worth fixing (edge case)
-    elif keyboard.is_pressed(_settings['termination_key']):
+
+    user_ret = eval_user_termination_conditions()
+    if user_ret:
+        return user_ret
+    elif need_active and _game_window and _game_window != gw.getActiveWindow():
+        return "Game no longer active (need_active set to True)"
+
+#Conditions read from game memory (headless workers check these on their own memory source)
+def eval_memory_termination_conditions(continuous=False):
+    if not continuous and read_int(pause_state, rel=True) == 1:
+        return "Non-run game state detected"
+
+#Conditions coming from the user and analyzers rather than the game
+def eval_user_termination_conditions():
+    if keyboard.is_pressed(_settings['termination_key']):
         return "User pressed termination key"
     elif auto_termination:
         return "Automatic termination triggered by analysis step"
-    elif need_active and _game_window != gw.getActiveWindow():
-        return "Game no longer active (need_active set to True)"
 
-def wait_game_frame(cur_game_frame=None, need_active=False):
+def wait_game_frame(cur_game_frame=None, need_active=False, continuous=False):
+    if _memory_source: #memory sources have no clock of their own; step them instead
+        term_ret = eval_termination_conditions(need_active, continuous)
+        if term_ret:
+            return term_ret
+        return None if _memory_source.next_frame() else "End of memory source reached"
+
     if not cur_game_frame:
         cur_game_frame = read_int(stage_timer)
 
     while read_int(stage_timer) == cur_game_frame: 
-        term_ret = eval_termination_conditions(need_active)
+        term_ret = eval_termination_conditions(need_active, continuous)
         if term_ret:
             return term_ret
     return None
@@ -350,7 +388,7 @@ def unpause_game():
             pass
 
 def get_focus():
-    if not game_process.is_running():
+    if not game_process or not game_process.is_running():
         return False
 
     if _game_window != gw.getActiveWindow():
@@ -388,6 +426,8 @@ _buffers = {} #caching helps!
 _kernel32 = ctypes.windll.kernel32 # minor optimization
 _byref = ctypes.byref(ctypes.c_ulonglong()) # minor optimization
 def _read_memory(address, size, rel):
+    if _memory_source:
+        return _memory_source.read(address if not rel else _base_address + address, size)
     if size not in _buffers:
         _buffers[size] = ctypes.create_string_buffer(size)
     buffer = _buffers[size]
@@ -425,102 +465,149 @@ def _random_player():
         apply_action_int(action)
 
 
+# Recording (see memory_sources.py) swaps in a reader going through the recorder's page copies, so extraction
+# parses the same bytes that get recorded; the regular path stays as fast as it was
+if memory_sources.recorder and not _memory_source:
+    memory_sources.recorder.start(_module_name, _base_address, lambda page: _live_read_memory(page, memory_sources.recorder.page_size, False))
+    _live_read_memory = _read_memory
+
+    def _read_memory(address, size, rel):
+        return memory_sources.recorder.read(address if not rel else _base_address + address, size)
+
+
 # Step 6 - Initial reads used by extraction context
-if read_int(game_mode, rel=True) not in game_modes or game_modes[read_int(game_mode, rel=True)] != 'Game World on Screen':
-    print("Error: Game world not loaded.")
-    exit()
+#The game deletes and recreates most of these objects between stages, on retries and between runs;
+#refresh_extraction_context() re-reads them (see also in_game_world() and extraction_context_changed()).
+_global_timer_offset = global_timer
+_stage_timer_offset = stage_timer
+_context_pointers = None
+_context_names = [
+    'global_timer', 'stage_timer', 'zPlayer', 'zBomb', 'zBulletManager', 'zEnemyManager', 'zItemManager', 'zLaserManager', 'zAnmManager', 'zSpellCard', 'zGui',
+    'zSpiritManager', 'ddcSeijaAnm', 'zSeasomBomb', 'zTokenManager', 'zAbilityManager', 'zGaugeManager', 'zPlayerP2', 'zBombP2', 'zBulletManagerP2',
+    'zEnemyManagerP2', 'zItemManagerP2', 'zLaserManagerP2', 'zSpellCardP2', 'zGaugeManagerP2', 'zAbilityManagerP2', 'zAiP2',
+    'ecl_sub_arrs', 'run_environment', 'game_constants', 'p2_run_environment',
+]
+
+#pointers that change whenever the extraction context needs refreshing
+def _read_context_pointers():
+    return (read_int(game_thread_pointer, rel=True), read_int(player_pointer, rel=True), read_int(bullet_manager_pointer, rel=True), read_int(enemy_manager_pointer, rel=True))
+
+#True while a stage is loaded (i.e. not in menus, on game over screens or mid-transition)
+def in_game_world():
+    return (read_int(pause_state, rel=True) != 1
+        and game_modes.get(read_int(game_mode, rel=True)) == 'Game World on Screen'
+        and all(_read_context_pointers()))
+
+def extraction_context_changed():
+    return _read_context_pointers() != _context_pointers
+
+#Returns the refreshed names, for modules that imported them (from interface import *)
+def refresh_extraction_context():
+    global global_timer, stage_timer, zPlayer, zBomb, zBulletManager, zEnemyManager, zItemManager, zLaserManager, zAnmManager, zSpellCard, zGui
+    global zSpiritManager, ddcSeijaAnm, zSeasomBomb, zTokenManager, zAbilityManager
+    global zGaugeManager, zPlayerP2, zBombP2, zBulletManagerP2, zEnemyManagerP2, zItemManagerP2, zLaserManagerP2, zSpellCardP2, zGaugeManagerP2, zAbilityManagerP2, zAiP2
+    global ecl_sub_arrs, run_environment, game_constants, p2_run_environment, _context_pointers
+
+    _context_pointers = _read_context_pointers()
+
+    global_timer = _global_timer_offset + read_int(ascii_manager_pointer, rel=True)
+    stage_timer = _stage_timer_offset + read_int(game_thread_pointer, rel=True)
+
+    zPlayer        = read_int(player_pointer, rel=True)
+    zBomb          = read_int(bomb_pointer, rel=True)
+    zBulletManager = read_int(bullet_manager_pointer, rel=True)
+    zEnemyManager  = read_int(enemy_manager_pointer, rel=True)
+    zItemManager   = read_int(item_manager_pointer, rel=True)
+    zLaserManager  = read_int(laser_manager_pointer, rel=True)
+    zAnmManager    = read_int(anm_manager_pointer, rel=True)
+    zSpellCard     = read_int(spellcard_pointer, rel=True)
+    zGui           = read_int(gui_pointer, rel=True)
+
+    if game_id == 13:
+        zSpiritManager = read_int(spirit_manager_pointer, rel=True)
+
+    elif game_id == 14:
+        ddcSeijaAnm = read_int(seija_anm_pointer, rel=True)
+
+    elif game_id == 16:
+        zSeasomBomb = read_int(season_bomb_ptr, rel=True)
+
+    elif game_id == 17:
+        zTokenManager = read_int(token_manager_pointer, rel=True)
+        zAnmManager = read_int(anm_manager_pointer, rel=True)
+
+    elif game_id == 19:
+        zGaugeManager     = read_int(gauge_manager_pointer, rel=True)
+        zPlayerP2         = read_int(p2_player_pointer, rel=True)
+        zBombP2           = read_int(p2_bomb_pointer, rel=True)
+        zBulletManagerP2  = read_int(p2_bullet_manager_pointer, rel=True)
+        zEnemyManagerP2   = read_int(p2_enemy_manager_pointer, rel=True)
+        zItemManagerP2    = read_int(p2_item_manager_pointer, rel=True)
+        zLaserManagerP2   = read_int(p2_laser_manager_pointer, rel=True)
+        zSpellCardP2      = read_int(p2_spellcard_pointer, rel=True)
+        zGaugeManagerP2   = read_int(p2_gauge_manager_pointer, rel=True)
+        zAbilityManagerP2 = read_int(p2_ability_manager_pointer, rel=True)
+        zAiP2             = read_int(p2_ai_pointer, rel=True)
+
+    if game_id in has_ability_cards:
+        zAbilityManager = read_int(ability_manager_pointer, rel=True)
+
+    ecl_sub_arrs = {}
+    for enemy_manager in ((zEnemyManager, zEnemyManagerP2) if game_id == 19 else (zEnemyManager,)):
+        ecl_sub_names = []
+        ecl_sub_starts = []
+        file_manager = read_int(enemy_manager + zEnemyManager_ecl_file)
+        subroutine_count = read_int(file_manager + zEclFile_sub_count)
+        subroutines = read_int(file_manager + zEclFile_subroutines)
+
+        for i in range(subroutine_count):
+            ecl_sub_names.append(read_string(read_int(subroutines + 0x8 * i), 64))
+            ecl_sub_starts.append(read_int(subroutines + 0x4 + 0x8 * i))
+
+        ecl_sub_arrs[enemy_manager] = (ecl_sub_names, ecl_sub_starts)
+
+    run_environment = RunEnvironment(
+        difficulty = read_int(difficulty, rel=True),
+        character = read_int(character, rel=True),
+        subshot = read_int(subshot, rel=True),
+        stage = read_int(stage, rel=True),
+    )
 
-global_timer += read_int(ascii_manager_pointer, rel=True)
-stage_timer += read_int(game_thread_pointer, rel=True)
-
-zPlayer        = read_int(player_pointer, rel=True)
-zBomb          = read_int(bomb_pointer, rel=True)
-zBulletManager = read_int(bullet_manager_pointer, rel=True)
-zEnemyManager  = read_int(enemy_manager_pointer, rel=True)
-zItemManager   = read_int(item_manager_pointer, rel=True)
-zLaserManager  = read_int(laser_manager_pointer, rel=True)
-zAnmManager    = read_int(anm_manager_pointer, rel=True)
-zSpellCard     = read_int(spellcard_pointer, rel=True)
-zGui           = read_int(gui_pointer, rel=True)
-
-if game_id == 13:
-    zSpiritManager = read_int(spirit_manager_pointer, rel=True)
-
-elif game_id == 14:
-    ddcSeijaAnm = read_int(seija_anm_pointer, rel=True)
-
-elif game_id == 16:
-    zSeasomBomb = read_int(season_bomb_ptr, rel=True)
-
-elif game_id == 17:
-    zTokenManager = read_int(token_manager_pointer, rel=True)
-    zAnmManager = read_int(anm_manager_pointer, rel=True)
-
-elif game_id == 19:
-    zGaugeManager     = read_int(gauge_manager_pointer, rel=True)
-    zPlayerP2         = read_int(p2_player_pointer, rel=True)
-    zBombP2           = read_int(p2_bomb_pointer, rel=True)
-    zBulletManagerP2  = read_int(p2_bullet_manager_pointer, rel=True)
-    zEnemyManagerP2   = read_int(p2_enemy_manager_pointer, rel=True)
-    zItemManagerP2    = read_int(p2_item_manager_pointer, rel=True)
-    zLaserManagerP2   = read_int(p2_laser_manager_pointer, rel=True)
-    zSpellCardP2      = read_int(p2_spellcard_pointer, rel=True)
-    zGaugeManagerP2   = read_int(p2_gauge_manager_pointer, rel=True)
-    zAbilityManagerP2 = read_int(p2_ability_manager_pointer, rel=True)
-    zAiP2             = read_int(p2_ai_pointer, rel=True)
-
-if game_id in has_ability_cards:
-    zAbilityManager = read_int(ability_manager_pointer, rel=True)
-
-ecl_sub_arrs = {}
-for enemy_manager in ((zEnemyManager, zEnemyManagerP2) if 'zBulletManagerP2' in globals() else (zEnemyManager,)):
-    ecl_sub_names = []
-    ecl_sub_starts = []
-    file_manager = read_int(enemy_manager + zEnemyManager_ecl_file)
-    subroutine_count = read_int(file_manager + zEclFile_sub_count)
-    subroutines = read_int(file_manager + zEclFile_subroutines)
-
-    for i in range(subroutine_count):
-        ecl_sub_names.append(read_string(read_int(subroutines + 0x8 * i), 64))
-        ecl_sub_starts.append(read_int(subroutines + 0x4 + 0x8 * i))
-
-    ecl_sub_arrs[enemy_manager] = (ecl_sub_names, ecl_sub_starts)
-
-
-run_environment = RunEnvironment(
-    difficulty = read_int(difficulty, rel=True),
-    character = read_int(character, rel=True),
-    subshot = read_int(subshot, rel=True),
-    stage = read_int(stage, rel=True),
-)
-
-game_constants = GameConstants(
-    deathbomb_window_frames = deathbomb_window_frames,
-    poc_line_height         = 148 if marisa_lower_poc_line and characters[run_environment.character] == 'Marisa' else 128,
-    life_piece_req          = life_piece_req,
-    bomb_piece_req          = bomb_piece_req,
-    world_width             = world_width,
-    world_height            = world_height,
-)
-
-if game_id == 19:
-    run_environment = RunEnvironmentUDoALG(
-        **run_environment.__dict__,
-        card_count              = read_int(zAbilityManager + zAbilityManager_total_cards),
-        charge_attack_threshold = read_int(charge_attack_threshold, rel=True),
-        charge_skill_threshold  = read_int(skill_attack_threshold, rel=True),
-        ex_attack_threshold     = read_int(ex_attack_threshold, rel=True),
-        boss_attack_threshold   = read_int(boss_attack_threshold, rel=True),
+    game_constants = GameConstants(
+        deathbomb_window_frames = deathbomb_window_frames,
+        poc_line_height         = 148 if marisa_lower_poc_line and characters[run_environment.character] == 'Marisa' else 128,
+        life_piece_req          = life_piece_req,
+        bomb_piece_req          = bomb_piece_req,
+        world_width             = world_width,
+        world_height            = world_height,
     )
 
-    p2_run_environment = RunEnvironmentUDoALG(
-        difficulty = run_environment.difficulty,
-        character  = read_int(p2_shottype, rel=True),
-        subshot    = 0,
-        stage      = run_environment.stage,
-        card_count              = read_int(zAbilityManagerP2 + zAbilityManager_total_cards),
-        charge_attack_threshold = read_int(p2_charge_attack_threshold, rel=True),
-        charge_skill_threshold  = read_int(p2_skill_attack_threshold, rel=True),
-        ex_attack_threshold     = read_int(p2_ex_attack_threshold, rel=True),
-        boss_attack_threshold   = read_int(p2_boss_attack_threshold, rel=True),
-    )
\ No newline at end of file
+    if game_id == 19:
+        run_environment = RunEnvironmentUDoALG(
+            **run_environment.__dict__,
+            card_count              = read_int(zAbilityManager + zAbilityManager_total_cards),
+            charge_attack_threshold = read_int(charge_attack_threshold, rel=True),
+            charge_skill_threshold  = read_int(skill_attack_threshold, rel=True),
+            ex_attack_threshold     = read_int(ex_attack_threshold, rel=True),
+            boss_attack_threshold   = read_int(boss_attack_threshold, rel=True),
+        )
+
+        p2_run_environment = RunEnvironmentUDoALG(
+            difficulty = run_environment.difficulty,
+            character  = read_int(p2_shottype, rel=True),
+            subshot    = 0,
+            stage      = run_environment.stage,
+            card_count              = read_int(zAbilityManagerP2 + zAbilityManager_total_cards),
+            charge_attack_threshold = read_int(p2_charge_attack_threshold, rel=True),
+            charge_skill_threshold  = read_int(p2_skill_attack_threshold, rel=True),
+            ex_attack_threshold     = read_int(p2_ex_attack_threshold, rel=True),
+            boss_attack_threshold   = read_int(p2_boss_attack_threshold, rel=True),
+        )
+
+    return {name: globals()[name] for name in _context_names if name in globals()}
+
+if game_modes.get(read_int(game_mode, rel=True)) != 'Game World on Screen':
+    print("Error: Game world not loaded.")
+    exit()
+
+refresh_extraction_context()
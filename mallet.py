@@ -0,0 +1,133 @@
+from game_entities import *
+from circle_coverage import grid_coverage
+from dataclasses import dataclass
+import numpy as np
+
+#Search over a whole sequence of frames for where and when a circle (e.g. UM's Miracle Mallet) covers the most
+#bullets, on a grid of centers every step_size units, same as AnalysisMostBulletsCircleFrame's exact method.
+#Most frames can't beat the candidates already found, so each frame is checked against cheap upper bounds first:
+#  1. bullets within the radius of the area centers can be in: no circle covers more
+#  2. a coarse grid of blocks of block x block centers, each counted with a radius grown by the block's half diagonal:
+#     no center in the block covers more
+#Only the centers of blocks whose bound reaches the best count of the highest-bound block are then counted exactly,
+#so results are the same as counting every center of every frame.
+#
+#Centers are limited to those whose required player position (player_distance units off, see player_position())
+#stays in player_bounds. The top_k best frames are kept, at least min_frame_gap frames apart from each other.
+
+@dataclass
+class MalletCandidate:
+    count: int
+    position: Tuple[float, float] #circle center
+    player_position: Tuple[float, float]
+    frame: int #seq_frame_id
+    state: GameState #(as returned by keep_state)
+
+class MalletSearch:
+    #bounds: (min x, min y, max x, max y) of the bullets and centers considered, player_bounds: same for the player
+    #(both the playfield by default); keep_state: called on the states kept as candidates (e.g. freeze)
+    def __init__(self, radius = 66, player_distance = 100, step_size = 10, top_k = 5, min_frame_gap = 60, block = 3, bounds = None, player_bounds = None, keep_state = None):
+        self.radius = radius
+        self.player_distance = player_distance
+        self.step_size = step_size
+        self.top_k = top_k
+        self.min_frame_gap = min_frame_gap
+        self.block = block
+        self.bounds = bounds
+        self.player_bounds = player_bounds
+        self.keep_state = keep_state if keep_state is not None else (lambda state: state)
+        self.candidates = [] #best first
+        self.frames_searched = 0
+        self.frames_pruned = 0
+        self.xs = self.ys = None
+
+    def player_position(self, position):
+        return (position[0], position[1] - self.player_distance)
+
+    def _setup(self, state: GameState):
+        width, height = state.constants.world_width, state.constants.world_height
+        if self.bounds is None:
+            self.bounds = (-width / 2, 0, width / 2, height)
+        if self.player_bounds is None:
+            self.player_bounds = (-width / 2, 0, width / 2, height)
+
+        xs = np.arange(int(self.bounds[0]), int(self.bounds[2]), self.step_size, dtype=np.float64)
+        ys = np.arange(int(self.bounds[1]), int(self.bounds[3]), self.step_size, dtype=np.float64)
+        players_x, players_y = self.player_position((xs, ys))
+        self.xs = xs[(self.player_bounds[0] <= players_x) & (players_x <= self.player_bounds[2])]
+        self.ys = ys[(self.player_bounds[1] <= players_y) & (players_y <= self.player_bounds[3])]
+
+        #coarse centers: the middle of each block of centers
+        self.block_xs = [self.xs[start:start + self.block] for start in range(0, len(self.xs), self.block)]
+        self.block_ys = [self.ys[start:start + self.block] for start in range(0, len(self.ys), self.block)]
+        self.coarse_xs = np.array([xs[0] + (self.block - 1) * self.step_size / 2 for xs in self.block_xs])
+        self.coarse_ys = np.array([ys[0] + (self.block - 1) * self.step_size / 2 for ys in self.block_ys])
+        self.coarse_reach = self.radius + (self.block - 1) * self.step_size / 2 * np.sqrt(2)
+
+    #Count a frame needs to beat to become a candidate
+    @property
+    def threshold(self):
+        return self.candidates[-1].count if len(self.candidates) >= self.top_k else 0
+
+    #(count, (x, y)) of the best center of the frame if it beats threshold (ties to the first center in x, then y
+    #order, like best_grid_position), else (0, None)
+    def search(self, positions, threshold = 0):
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        if not len(self.xs) or not len(self.ys):
+            return 0, None
+        in_bounds = (self.bounds[0] <= positions[:, 0]) & (positions[:, 0] <= self.bounds[2]) & (self.bounds[1] <= positions[:, 1]) & (positions[:, 1] <= self.bounds[3])
+        positions = positions[in_bounds]
+
+        #bound 1
+        reachable = (self.xs[0] - self.radius <= positions[:, 0]) & (positions[:, 0] <= self.xs[-1] + self.radius) & (self.ys[0] - self.radius <= positions[:, 1]) & (positions[:, 1] <= self.ys[-1] + self.radius)
+        positions = positions[reachable]
+        if len(positions) <= threshold:
+            return 0, None
+
+        #bound 2, then the block with the highest bound gives a first best count: only blocks bounded at or above it
+        #can hold the best center, and all of them are counted at once over the part of the grid they span
+        bounds = grid_coverage(positions, self.coarse_xs, self.coarse_ys, self.coarse_reach)
+        i, j = np.unravel_index(np.argmax(bounds), bounds.shape)
+        if bounds[i, j] <= threshold:
+            return 0, None
+        first_best = self._counts(positions, self.block_xs[i], self.block_ys[j]).max()
+
+        columns, rows = np.nonzero(bounds >= max(first_best, threshold + 1))
+        xs = self.xs[columns.min() * self.block:(columns.max() + 1) * self.block]
+        ys = self.ys[rows.min() * self.block:(rows.max() + 1) * self.block]
+        counts = self._counts(positions, xs, ys)
+        k, l = np.unravel_index(np.argmax(counts), counts.shape)
+        if counts[k, l] <= threshold:
+            return 0, None
+        return int(counts[k, l]), (xs[k], ys[l])
+
+    #exact counts for the centers xs, ys, from the positions close enough to them
+    def _counts(self, positions, xs, ys):
+        near = (xs[0] - self.radius <= positions[:, 0]) & (positions[:, 0] <= xs[-1] + self.radius) & (ys[0] - self.radius <= positions[:, 1]) & (positions[:, 1] <= ys[-1] + self.radius)
+        return grid_coverage(positions[near], xs, ys, self.radius)
+
+    #Searches a frame; returns its candidate if it made it into the top_k, else None
+    def add(self, state: GameState):
+        if self.xs is None:
+            self._setup(state)
+        self.frames_searched += 1
+
+        count, position = self.search([bullet.position for bullet in state.bullets], self.threshold)
+        if position is None:
+            self.frames_pruned += 1
+            return None
+
+        #frames too close to a better (or as good, earlier) candidate aren't distinct from it; worse ones get replaced
+        close = [candidate for candidate in self.candidates if abs(candidate.frame - state.seq_frame_id) < self.min_frame_gap]
+        if any(candidate.count >= count for candidate in close):
+            return None
+
+        candidate = MalletCandidate(count, (float(position[0]), float(position[1])), tuple(map(float, self.player_position(position))), state.seq_frame_id, self.keep_state(state))
+        self.candidates = [other for other in self.candidates if abs(other.frame - state.seq_frame_id) >= self.min_frame_gap] + [candidate]
+        self.candidates.sort(key = lambda candidate: candidate.count, reverse = True)
+        del self.candidates[self.top_k:]
+        return candidate
+
+    @property
+    def best(self):
+        return self.candidates[0] if self.candidates else None
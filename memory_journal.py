@@ -0,0 +1,124 @@
+from memory_sources import PageRecorder, PagedMemorySource
+import numpy as np
+import struct
+import json
+import zlib
+import mmap
+
+#Memory journals are append-only logs of the game memory read during an extraction, so that extraction can be
+#re-run later with newer extractors or offsets and give the same results as it would have live.
+#
+#Layout:  magic | u32 meta length | meta (JSON) | record | record | ...
+#Each record holds one frame (-1 = pages read while the interface connected): a header (frame index, page count,
+#payload length) and a zlib-compressed payload of the page addresses (u32) followed by the pages.
+#A page is only written when its content differs from the last time it was journaled;
+#replays keep every page's latest content, so unchanged pages come from earlier records.
+#Every keyframe_interval frames (see meta), a keyframe record holds every page journaled so far instead, so seeking
+#to a frame loads the closest keyframe before it and replays at most keyframe_interval records from there.
+#Records are flushed as they're written, so a journal cut short by a crash is still readable up to its last frame.
+#Readers memory-map the journal and only decompress the records they replay.
+
+journal_magic = b'PKJRNL01'
+record_format = '<iII'
+
+class JournalRecorder(PageRecorder):
+    reads_everything = True #categories that weren't read at capture time could never be replayed
+
+    def __init__(self, path, compression_level = 1, keyframe_interval = 600):
+        super().__init__()
+        self.path = path
+        self.compression_level = compression_level
+        self.keyframe_interval = keyframe_interval #0 for no keyframes
+        self.file = None
+        self.last_pages = {}
+        self.pages_read = 0
+        self.pages_written = 0
+
+    def start(self, module_name, base_address, read_page):
+        super().start(module_name, base_address, read_page)
+        meta = json.dumps({'module_name': module_name, 'base_address': base_address, 'page_size': self.page_size, 'keyframe_interval': self.keyframe_interval}).encode()
+        self.file = open(self.path, 'wb')
+        self.file.write(journal_magic + struct.pack('<I', len(meta)) + meta)
+
+    def _flush(self):
+        if not self.file:
+            return
+
+        changed = {page: data for page, data in self.pages.items() if self.last_pages.get(page) != data}
+        self.last_pages.update(changed)
+        self.pages_read += len(self.pages)
+        self.pages_written += len(changed)
+
+        if self.keyframe_interval and self.frame_index > 0 and self.frame_index % self.keyframe_interval == 0:
+            changed = self.last_pages
+        addresses = sorted(changed)
+        payload = zlib.compress(np.array(addresses, dtype='<u4').tobytes() + b''.join(changed[address] for address in addresses), self.compression_level)
+        self.file.write(struct.pack(record_format, self.frame_index, len(addresses), len(payload)) + payload)
+        self.file.flush()
+
+    def close(self):
+        if not self.file or self.file.closed:
+            return
+
+        super().close()
+        size = self.file.tell()
+        self.file.close()
+        print(f"Journaled {self.frame_index + 1} frames of memory to '{self.path}' ({self.pages_written} of {self.pages_read} pages read were new, {size / 1e6:.1f}MB)")
+
+class JournalMemorySource(PagedMemorySource):
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.data[:len(journal_magic)] != journal_magic:
+            self.close()
+            raise ValueError(f"{path} is not a memory journal.")
+
+        meta_length = struct.unpack_from('<I', self.data, len(journal_magic))[0]
+        offset = len(journal_magic) + 4
+        meta = json.loads(self.data[offset:offset + meta_length])
+        offset += meta_length
+
+        #index the records (a truncated last record is ignored)
+        self.records = {}
+        record_size = struct.calcsize(record_format)
+        while offset + record_size <= len(self.data):
+            frame_index, page_count, payload_length = struct.unpack_from(record_format, self.data, offset)
+            if offset + record_size + payload_length > len(self.data):
+                break
+            self.records[frame_index] = (offset + record_size, page_count, payload_length)
+            offset += record_size + payload_length
+
+        self.page_size = meta['page_size']
+        self.keyframe_interval = meta.get('keyframe_interval', 0) #(older journals have no keyframes)
+        self._frame_total = sum(frame_index >= 0 for frame_index in self.records)
+        super().__init__(meta['module_name'], meta['base_address'], None, self.load_frame(-1))
+
+    @property
+    def frame_total(self):
+        return self._frame_total
+
+    def load_frame(self, frame_index):
+        if frame_index not in self.records:
+            return {}
+
+        offset, page_count, payload_length = self.records[frame_index]
+        payload = zlib.decompress(self.data[offset:offset + payload_length])
+        addresses = np.frombuffer(payload, dtype='<u4', count=page_count).tolist()
+        start = 4 * page_count
+        return {address: payload[start + i * self.page_size:start + (i + 1) * self.page_size] for i, address in enumerate(addresses)}
+
+    #pages only hold changes, so jumping to a frame replays the records since the last keyframe up to it
+    def seek(self, frame_index):
+        last = min(frame_index, self.frame_total - 1)
+        first = last - last % self.keyframe_interval if self.keyframe_interval and last > 0 else 0
+
+        self.pages = dict(self.base_pages)
+        for i in range(first, last + 1):
+            self.pages.update(self.load_frame(i))
+        self.frame_index = frame_index
+
+    def close(self):
+        self.data.close()
+        self.file.close()
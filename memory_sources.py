@@ -0,0 +1,227 @@
+from abc import ABC, abstractmethod
+import struct
+import json
+import os
+
+#Memory sources let the interface read game memory from somewhere other than a running game process
+#(recorded sessions, hand-built memory for tests...). Select one with use() *before* importing interface.
+#Recorders likewise capture the memory a live extraction reads; select one with record().
+active = None
+recorder = None
+
+def use(source):
+    global active
+    active = source
+
+def record(new_recorder):
+    global recorder
+    recorder = new_recorder
+
+#CLI hook: 'headless <path>' replays a snapshot directory or memory journal,
+#'record <dir>' records a snapshot directory from the live game and 'journal <file>' a memory journal
+def select_from_args(args):
+    import memory_journal #(imports this module)
+
+    for i in range(len(args) - 1):
+        if args[i] == 'headless':
+            use(SnapshotDirectorySource(args[i+1]) if os.path.isdir(args[i+1]) else memory_journal.JournalMemorySource(args[i+1]))
+        elif args[i] == 'record':
+            record(SnapshotRecorder(args[i+1]))
+        elif args[i] == 'journal':
+            record(memory_journal.JournalRecorder(args[i+1]))
+
+class MemorySource(ABC):
+    module_name = None #main module of the game the memory belongs to, e.g. 'th18.exe'
+    base_address = None #address of that module in the source's address space
+
+    @abstractmethod
+    def read(self, address, size):
+        pass #must return exactly size bytes, or raise RuntimeError like the live interface does
+
+    #called by extraction loops in place of waiting for the game; returns False once the source has no more frames
+    def next_frame(self):
+        return False
+
+#Memory made of fixed-size pages, one page table per frame.
+#Pages missing from a frame keep their content from earlier frames.
+class PagedMemorySource(MemorySource):
+    page_size = 0x1000
+
+    def __init__(self, module_name, base_address, frames, base_pages = None):
+        self.module_name = module_name
+        self.base_address = base_address
+        self.frames = frames #list of {page address: page bytes}
+        self.base_pages = base_pages or {} #pages shared by every frame
+        self.seek(0)
+
+    @property
+    def frame_total(self):
+        return len(self.frames)
+
+    def load_frame(self, frame_index):
+        return self.frames[frame_index]
+
+    #jumps straight to a frame; only the base pages and that frame's pages are loaded
+    def seek(self, frame_index):
+        self.frame_index = frame_index
+        self.pages = dict(self.base_pages)
+        if frame_index < self.frame_total:
+            self.pages.update(self.load_frame(frame_index))
+
+    def next_frame(self):
+        if self.frame_index + 1 >= self.frame_total:
+            return False
+
+        self.frame_index += 1
+        self.pages.update(self.load_frame(self.frame_index))
+        return True
+
+    def read(self, address, size):
+        page = address & ~(self.page_size - 1)
+        offset = address - page
+
+        if offset + size <= self.page_size: #fast path, by far the most common
+            data = self.pages.get(page)
+            if data is None:
+                raise RuntimeError(f"Failed to read memory at address {hex(address)} with size {size} (page not in memory source).")
+            return data[offset:offset + size]
+
+        chunks = []
+        end = address + size
+        while page < end:
+            data = self.pages.get(page)
+            if data is None:
+                raise RuntimeError(f"Failed to read memory at address {hex(address)} with size {size} (page {hex(page)} not in memory source).")
+            chunks.append(data)
+            page += self.page_size
+        return b''.join(chunks)[offset:offset + size]
+
+    #helper to build memory by hand, e.g. for tests
+    def write(self, address, data, frame = 0):
+        pages = self.frames[frame]
+        for i in range(len(data)):
+            page = (address + i) & ~(self.page_size - 1)
+            if page not in pages:
+                pages[page] = bytearray(self.page_size)
+            elif not isinstance(pages[page], bytearray):
+                pages[page] = bytearray(pages[page])
+            pages[page][address + i - page] = data[i]
+
+        if frame == self.frame_index:
+            self.pages.update(pages)
+
+
+#Snapshot directory layout:
+#  meta.json          module name, base address, page size & frame count
+#  init.bin           pages read while the interface connected (before the first frame)
+#  frame_000000.bin   pages read while extracting each frame
+#Each .bin file holds a little-endian u32 page count, that many u32 page addresses, then the pages themselves.
+def write_pages(path, pages):
+    addresses = sorted(pages)
+    with open(path, 'wb') as file:
+        file.write(struct.pack(f'<I{len(addresses)}I', len(addresses), *addresses))
+        for address in addresses:
+            file.write(pages[address])
+
+def read_pages(path, page_size):
+    with open(path, 'rb') as file:
+        data = file.read()
+
+    count = struct.unpack_from('<I', data)[0]
+    addresses = struct.unpack_from(f'<{count}I', data, 4)
+    start = 4 + 4 * count
+    return {address: data[start + i * page_size:start + (i + 1) * page_size] for i, address in enumerate(addresses)}
+
+def frame_file(directory, frame_index):
+    return os.path.join(directory, f'frame_{frame_index:06d}.bin')
+
+#Replays a recorded snapshot directory one frame file at a time (memory use doesn't grow with the recording)
+class SnapshotDirectorySource(PagedMemorySource):
+    def __init__(self, directory):
+        with open(os.path.join(directory, 'meta.json')) as file:
+            meta = json.load(file)
+
+        self.directory = directory
+        self.page_size = meta['page_size']
+        self._frame_total = meta['frame_count']
+        super().__init__(meta['module_name'], meta['base_address'], None, read_pages(os.path.join(directory, 'init.bin'), self.page_size))
+
+    @property
+    def frame_total(self):
+        return self._frame_total
+
+    def load_frame(self, frame_index):
+        return read_pages(frame_file(self.directory, frame_index), self.page_size)
+
+#Base for recorders: captures every page the live extraction touches, whole and once per frame.
+#The interface reads through read(): a page is fetched from the game the first time it's touched in a frame,
+#and that same copy serves the rest of the frame's reads, so extraction parses exactly the recorded bytes
+#(replays give the same states even when the game kept running). Subclasses decide how pages get stored.
+class PageRecorder(ABC):
+    page_size = 0x1000
+    reads_everything = False #if set, extraction reads every entity category so the recording holds them all
+
+    def __init__(self):
+        self.frame_index = -1 #-1 = pages read before the first frame
+        self.pages = {}
+        self.module_name = None
+        self.base_address = None
+        self.read_page = None
+
+    def start(self, module_name, base_address, read_page):
+        self.module_name = module_name
+        self.base_address = base_address
+        self.read_page = read_page #read_page(page address) -> page bytes, straight from the game
+
+    def read(self, address, size):
+        first_page = address & ~(self.page_size - 1)
+        page = first_page
+        while page < address + size:
+            if page not in self.pages:
+                self.pages[page] = self.read_page(page)
+            page += self.page_size
+
+        offset = address - first_page
+        if offset + size <= self.page_size:
+            return self.pages[first_page][offset:offset + size]
+        return b''.join(self.pages[page] for page in range(first_page, address + size, self.page_size))[offset:offset + size]
+
+    @abstractmethod
+    def _flush(self):
+        pass #stores self.pages for self.frame_index
+
+    #called as each new frame starts being extracted
+    def next_frame(self):
+        self._flush()
+        self.pages = {}
+        self.frame_index += 1
+
+    def close(self):
+        self._flush()
+        self.pages = {}
+
+#Records into a snapshot directory (see SnapshotDirectorySource)
+class SnapshotRecorder(PageRecorder):
+    def __init__(self, directory):
+        super().__init__()
+        self.directory = directory
+
+    def start(self, module_name, base_address, read_page):
+        os.makedirs(self.directory, exist_ok = True)
+        super().start(module_name, base_address, read_page)
+
+    def _flush(self):
+        write_pages(os.path.join(self.directory, 'init.bin') if self.frame_index < 0 else frame_file(self.directory, self.frame_index), self.pages)
+
+    def close(self):
+        super().close()
+
+        with open(os.path.join(self.directory, 'meta.json'), 'w') as file:
+            json.dump({
+                'module_name': self.module_name,
+                'base_address': self.base_address,
+                'page_size': self.page_size,
+                'frame_count': self.frame_index + 1,
+            }, file, indent = 4)
+
+        print(f"Recorded {self.frame_index + 1} frames of memory to '{self.directory}'")
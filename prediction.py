@@ -0,0 +1,89 @@
+from game_entities import *
+import numpy as np
+
+#Linear extrapolation of bullet motion: each bullet is assumed to keep moving by its velocity every frame.
+#Most bullets do for long stretches; deviations() compares a forecast against a later extracted state to find
+#those that don't (curving, accelerating, bouncing...), so their forecasts can be discarded or handled separately.
+#Frame offsets are game frames after the state (1 = the next frame), and rows follow state.bullets' order
+#(or that of the bullets given).
+
+class BulletForecast:
+    #bullets: subset of the state's bullets to forecast (all by default)
+    def __init__(self, state: GameState, frames = 60, bullets = None):
+        bullets = state.bullets if bullets is None else bullets
+        self.state = state
+        self.frames = frames
+        self.ids = np.fromiter((bullet.id for bullet in bullets), dtype=np.int64, count=len(bullets))
+        self.origins = np.array([bullet.position for bullet in bullets], dtype=np.float64).reshape(-1, 2)
+        self.velocities = np.array([bullet.velocity for bullet in bullets], dtype=np.float64).reshape(-1, 2)
+        self.radii = np.array([bullet.hitbox_radius * bullet.scale for bullet in bullets], dtype=np.float64)
+
+    #(len(offsets), bullets, 2) positions at the given frame offsets (every frame up to the horizon by default)
+    def positions(self, offsets = None):
+        offsets = np.arange(1, self.frames + 1) if offsets is None else np.asarray(offsets)
+        return self.origins + offsets.reshape(-1, 1, 1) * self.velocities
+
+    #(frames, rows, columns) bullet counts per cell_size cell for every frame up to the horizon, over the area
+    #bounds (min x, min y, max x, max y) (the playfield by default); bullets outside it aren't counted
+    def occupancy(self, cell_size = 8, bounds = None):
+        if bounds is None:
+            width, height = self.state.constants.world_width, self.state.constants.world_height
+            bounds = (-width / 2, 0, width / 2, height)
+
+        columns = int(np.ceil((bounds[2] - bounds[0]) / cell_size))
+        rows = int(np.ceil((bounds[3] - bounds[1]) / cell_size))
+        cells = np.floor((self.positions() - bounds[:2]) / cell_size).astype(np.int64)
+        inside = (cells[..., 0] >= 0) & (cells[..., 0] < columns) & (cells[..., 1] >= 0) & (cells[..., 1] < rows)
+
+        frame_indices = np.broadcast_to(np.arange(self.frames)[:, None], inside.shape)
+        flat = (frame_indices * rows + cells[..., 1]) * columns + cells[..., 0]
+        return np.bincount(flat[inside], minlength=self.frames * rows * columns).reshape(self.frames, rows, columns)
+
+    #First frame offset at which each bullet touches a circle of radius radius staying at position (the player's
+    #hitbox by default): 0 if it already does, inf if it won't within the horizon.
+    #Solved per bullet from where its path enters and leaves the circle, rather than frame by frame.
+    def time_to_impact(self, position = None, radius = None):
+        position = np.asarray(position if position is not None else self.state.player_position, dtype=np.float64)
+        radius = radius if radius is not None else self.state.player_hitbox_rad
+
+        #|origin + t * velocity - position| <= radius + bullet radius, a quadratic in t
+        deltas = self.origins - position
+        reach = radius + self.radii
+        a = np.einsum('ij,ij->i', self.velocities, self.velocities)
+        b = 2 * np.einsum('ij,ij->i', deltas, self.velocities)
+        c = np.einsum('ij,ij->i', deltas, deltas) - reach ** 2
+        discriminant = b ** 2 - 4 * a * c
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            root = np.sqrt(discriminant)
+            enter = np.where(a > 0, (-b - root) / (2 * a), np.inf)
+            leave = np.where(a > 0, (-b + root) / (2 * a), -np.inf)
+
+        first_frame = np.maximum(np.ceil(enter), 0)
+        impact = np.where((discriminant >= 0) & (first_frame <= leave) & (first_frame <= self.frames), first_frame, np.inf)
+        return np.where(c <= 0, 0, impact) #(already touching, moving or not)
+
+    #Indices of the bullets touching the circle (the player's hitbox by default) within the horizon, soonest first
+    def impacts(self, position = None, radius = None):
+        times = self.time_to_impact(position, radius)
+        hitting = np.flatnonzero(np.isfinite(times))
+        return hitting[np.argsort(times[hitting], kind='stable')]
+
+    #Distance between each bullet's forecast and where it actually is in later_state (NaN for bullets gone by then)
+    def deviations(self, later_state: GameState):
+        offset = max(later_state.frame_stage - self.state.frame_stage, 1)
+        later_ids = np.fromiter((bullet.id for bullet in later_state.bullets), dtype=np.int64, count=len(later_state.bullets))
+        later_positions = np.array([bullet.position for bullet in later_state.bullets], dtype=np.float64).reshape(-1, 2)
+
+        order = np.argsort(later_ids, kind='stable')
+        matches = np.minimum(np.searchsorted(later_ids[order], self.ids), max(len(later_ids) - 1, 0))
+        found = later_ids[order][matches] == self.ids if len(later_ids) else np.zeros(len(self.ids), dtype=bool)
+
+        errors = np.full(len(self.ids), np.nan)
+        predicted = self.origins[found] + offset * self.velocities[found]
+        errors[found] = np.hypot(*(later_positions[order][matches[found]] - predicted).T)
+        return errors
+
+    #Indices of the bullets that didn't end up within tolerance of their forecast in later_state
+    def deviating(self, later_state: GameState, tolerance = 0.01):
+        return np.flatnonzero(self.deviations(later_state) > tolerance)
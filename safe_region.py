@@ -0,0 +1,102 @@
+from game_entities import *
+from prediction import BulletForecast
+from collision import CollisionShapes
+from scipy.ndimage import binary_dilation
+import numpy as np
+
+#Which cells of the playfield stay clear of bullets over the next frames, and which of those the player can get to.
+#The playfield is split in cell_size cells, each standing for its center: a cell is occupied on a frame if the
+#player's hitbox there would touch something, i.e. if its center is within a bullet's radius + player_hitbox_rad
+#of the bullet's forecast position (see prediction.py). Lasers and enemies are held where they are on the state's
+#frame (their motion isn't forecast). Frame 0 is the state's own frame.
+#
+#Player speeds aren't extracted; the defaults below are typical, override them per game/shot type as needed.
+
+unfocused_speed = 4.5 #units per frame
+focused_speed = 2
+
+class SafeRegionForecast:
+    #bounds: (min x, min y, max x, max y) of the area covered (the playfield by default; required for P2Side states)
+    def __init__(self, state: GameState, frames = 30, cell_size = 4, bounds = None):
+        if bounds is None:
+            width, height = state.constants.world_width, state.constants.world_height
+            bounds = (-width / 2, 0, width / 2, height)
+        self.state = state
+        self.frames = frames
+        self.cell_size = cell_size
+        self.bounds = bounds
+        self.columns = int(np.ceil((bounds[2] - bounds[0]) / cell_size))
+        self.rows = int(np.ceil((bounds[3] - bounds[1]) / cell_size))
+        self.centers_x = self.bounds[0] + (np.arange(self.columns) + 0.5) * cell_size
+        self.centers_y = self.bounds[1] + (np.arange(self.rows) + 0.5) * cell_size
+
+        #(frames + 1, rows, columns)
+        self.occupied = np.zeros((frames + 1, self.rows, self.columns), dtype=bool)
+        self._stamp_bullets()
+
+        static = CollisionShapes(state, kinds = ['lasers', 'enemies'])
+        if len(static):
+            centers = np.stack(np.meshgrid(self.centers_x, self.centers_y), axis=-1).reshape(-1, 2)
+            self.occupied |= static.any_hit(centers, state.player_hitbox_rad).reshape(1, self.rows, self.columns)
+
+    #marks the cells around every forecast bullet position; bullets with the same reach (in cells) share offsets
+    def _stamp_bullets(self):
+        bullets = [bullet for bullet in self.state.bullets if bullet.is_active and getattr(bullet, 'show_delay', 0) == 0 and not getattr(bullet, 'is_intangible', False)]
+        forecast = BulletForecast(self.state, self.frames, bullets)
+        positions = forecast.positions(np.arange(self.frames + 1)) #(frames + 1, bullets, 2)
+        reaches = forecast.radii + self.state.player_hitbox_rad
+
+        frames = np.broadcast_to(np.arange(self.frames + 1)[:, None], positions.shape[:2])
+        cells = np.floor((positions - self.bounds[:2]) / self.cell_size).astype(np.int64)
+        spans = np.ceil(reaches / self.cell_size).astype(np.int64) + 1
+        for span in np.unique(spans):
+            group = spans == span
+            offsets = np.arange(-span, span + 1)
+            columns = cells[:, group, 0, None, None] + offsets[None, :]
+            rows = cells[:, group, 1, None, None] + offsets[:, None]
+
+            inside = (0 <= columns) & (columns < self.columns) & (0 <= rows) & (rows < self.rows)
+            dx = self.centers_x[np.clip(columns, 0, self.columns - 1)] - positions[:, group, 0, None, None]
+            dy = self.centers_y[np.clip(rows, 0, self.rows - 1)] - positions[:, group, 1, None, None]
+            inside &= dx ** 2 + dy ** 2 <= reaches[group, None, None] ** 2
+
+            flat = (frames[:, group, None, None] * self.rows + rows) * self.columns + columns
+            self.occupied.reshape(-1)[flat[inside]] = True
+
+    #(rows, columns) cells clear on every frame of the horizon
+    @property
+    def always_safe(self):
+        return ~self.occupied.any(axis=0)
+
+    def cell_of(self, position):
+        column = int(np.clip((position[0] - self.bounds[0]) // self.cell_size, 0, self.columns - 1))
+        row = int(np.clip((position[1] - self.bounds[1]) // self.cell_size, 0, self.rows - 1))
+        return row, column
+
+    #(frames + 1, rows, columns) cells the player can be in on each frame having only gone through clear cells,
+    #starting from their current cell and moving at speed units per frame (the current focus state's by default).
+    #Each frame, the reachable cells grow by however many cells the player could have crossed, then drop occupied ones.
+    def reachable(self, speed = None):
+        if speed is None:
+            speed = focused_speed if self.state.player_focused else unfocused_speed
+
+        reachable = np.zeros_like(self.occupied)
+        reachable[(0, *self.cell_of(self.state.player_position))] = True
+        reachable[0] &= ~self.occupied[0]
+
+        for frame in range(1, self.frames + 1):
+            steps = int(speed * frame // self.cell_size) - int(speed * (frame - 1) // self.cell_size)
+            current = reachable[frame - 1]
+            if steps:
+                offsets = np.arange(-steps, steps + 1)
+                current = binary_dilation(current, structure = offsets[:, None] ** 2 + offsets[None, :] ** 2 <= (steps + 0.5) ** 2)
+            reachable[frame] = current & ~self.occupied[frame]
+        return reachable
+
+    #Draws always-safe cells (light) and cells the player can still be in at the end of the horizon (dark) on an
+    #AnalysisPlot axis
+    def plot(self, ax, speed = None):
+        overlay = np.zeros((self.rows, self.columns, 4))
+        overlay[self.always_safe] = (0.3, 0.8, 0.3, 0.25)
+        overlay[self.reachable(speed)[-1]] = (0.1, 0.6, 0.1, 0.6)
+        ax.imshow(overlay, origin='lower', extent=(self.bounds[0], self.bounds[0] + self.columns * self.cell_size, self.bounds[1], self.bounds[1] + self.rows * self.cell_size), zorder=-1)
@@ -39,6 +39,24 @@ seqext_settings = {
     'auto_repause': True,
     'need_active':  False,
     'infinite_print_updates': False,
+    'print_extraction_stats': True,
+    'extraction_rates': {'bullets': 1, 'lasers': 1, 'enemies': 1, 'items': 1, 'player_shots': 1}, #every Nth frame, 0 = when budget allows
+    'adaptive_rates': False,
+    'frame_budget_ms': 16.67,
+    'frame_deadline_ms': 0, #0 = no deadline
+    'headless_workers': 1,
+    'capture_file': '', #e.g. 'captures/run.cap'
+    'capture_compression': 1, #zlib level, 0 = uncompressed
+    'capture_entity_encoding': 'rows', #'rows' or 'delta'
+    'export_directory': '', #e.g. 'exports/run'
+    'export_format': 'csv', #'csv' or 'jsonl'
+    'export_compress': False,
+    'export_rotate_frames': 0, #0 = never
+    'continuous_directory': '', #e.g. 'sessions/practice'
+    'trigger_directory': '', #e.g. 'events/deaths'
+    'triggers': ['life_lost', 'bomb_used'], #'life_lost', 'bomb_used', 'deathbomb', 'spell_changed'
+    'trigger_pre_frames': 180,
+    'trigger_post_frames': 120,
 }
 
 # Game-World Plotting Settings (Analysis)
@@ -0,0 +1,127 @@
+from game_entities import *
+from capture import _encode_values, _decode_values, _as_float32, flattened_fields
+import numpy as np
+import dataclasses
+import operator
+import pickle
+import zlib
+
+#Frozen states are compact, immutable copies of a GameState for analyzers that hold on to frames (best frame so far,
+#candidate frames...): entity lists are stored as one NumPy column per field (like capture files), every other field
+#as one compressed pickle, and the screenshot (if any) downscaled. They're several times smaller than the state.
+#
+#Fields are rehydrated on access, so a frozen state can be passed as is to code expecting a GameState (e.g. plots);
+#each access decodes the field again, so use thaw() to get the full GameState back for repeated use.
+
+#screen_scale: fraction of the screenshot's resolution kept (1 = full size, 0 = dropped)
+def freeze(state: GameState, screen_scale = 0.5):
+    return FrozenState(state, screen_scale)
+
+#game values are 32-bit, so columns usually fit in half the space losslessly
+def _narrow(array):
+    if array.dtype == np.float64:
+        narrowed = _as_float32(array)
+        return narrowed if narrowed is not None else array
+    if array.dtype == np.int64 and array.size and np.iinfo(np.int32).min <= array.min() and array.max() <= np.iinfo(np.int32).max:
+        return array.astype(np.int32)
+    return array
+
+def _freeze_entities(entities):
+    groups = {}
+    for index, entity in enumerate(entities):
+        key = type(entity)
+        if key not in groups:
+            groups[key] = []
+        groups[key].append(index)
+
+    frozen = []
+    for entity_class, indices in groups.items():
+        group = entities if len(groups) == 1 else [entities[index] for index in indices]
+        columns = []
+        for field in dataclasses.fields(entity_class):
+            values = list(map(operator.attrgetter(field.name), group))
+            array = _encode_values(values)
+            if array is None:
+                columns.append(pickle.dumps(values, protocol=pickle.HIGHEST_PROTOCOL))
+            else:
+                array = _narrow(array)
+                array.flags.writeable = False
+                columns.append(array)
+        frozen.append((entity_class, None if len(groups) == 1 else indices, columns))
+    return frozen
+
+def _thaw_entities(frozen):
+    if len(frozen) == 1:
+        entity_class, indices, columns = frozen[0]
+        return list(map(entity_class, *(_decode_values(column) if isinstance(column, np.ndarray) else pickle.loads(column) for column in columns)))
+
+    entities = [None] * sum(len(indices) for _, indices, _ in frozen)
+    for entity_class, indices, columns in frozen:
+        for index, entity in zip(indices, map(entity_class, *(_decode_values(column) if isinstance(column, np.ndarray) else pickle.loads(column) for column in columns))):
+            entities[index] = entity
+    return entities
+
+def _is_entity_list(value):
+    return isinstance(value, list) and value and dataclasses.is_dataclass(value[0])
+
+class FrozenState:
+    __slots__ = ['state_class', 'screen', '_fields', '_tables', '_nested', '__weakref__'] #(weak references: spatial_index and collision_shapes caches)
+
+    def __init__(self, state, screen_scale = 0.5):
+        fields = dict(state.__dict__)
+        tables = {}
+        nested = {}
+
+        for name in flattened_fields:
+            if name in fields and fields[name] is not None:
+                nested[name] = FrozenState(fields.pop(name), 0)
+
+        for name, value in list(fields.items()):
+            if _is_entity_list(value):
+                tables[name] = _freeze_entities(fields.pop(name))
+
+        screen = fields.pop('screen', None)
+        if screen is not None:
+            step = round(1 / screen_scale) if screen_scale else 0
+            screen = np.ascontiguousarray(screen[::step, ::step]) if step else None
+        if screen is not None:
+            screen.flags.writeable = False
+
+        object.__setattr__(self, 'state_class', type(state))
+        object.__setattr__(self, 'screen', screen)
+        object.__setattr__(self, '_fields', zlib.compress(pickle.dumps(fields, protocol=pickle.HIGHEST_PROTOCOL), 1))
+        object.__setattr__(self, '_tables', tables)
+        object.__setattr__(self, '_nested', nested)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Frozen states are immutable (thaw() them to get a GameState).")
+
+    def __getattr__(self, name):
+        if name.startswith('_'): #(slots not set yet)
+            raise AttributeError(name)
+        if name in self._tables:
+            return _thaw_entities(self._tables[name])
+        if name in self._nested:
+            return self._nested[name].thaw()
+
+        fields = pickle.loads(zlib.decompress(self._fields))
+        if name in fields:
+            return fields[name]
+        raise AttributeError(f"'{self.state_class.__name__}' has no field '{name}'")
+
+    def thaw(self):
+        fields = pickle.loads(zlib.decompress(self._fields))
+        fields.update({name: _thaw_entities(frozen) for name, frozen in self._tables.items()})
+        fields.update({name: frozen.thaw() for name, frozen in self._nested.items()})
+        if 'screen' in (field.name for field in dataclasses.fields(self.state_class)):
+            fields['screen'] = self.screen
+        return self.state_class(**fields)
+
+    #approximate memory held, in bytes
+    @property
+    def nbytes(self):
+        size = len(self._fields) + (self.screen.nbytes if self.screen is not None else 0)
+        for frozen in self._tables.values():
+            for _, indices, columns in frozen:
+                size += sum(column.nbytes if isinstance(column, np.ndarray) else len(column) for column in columns) + 8 * len(indices or [])
+        return size + sum(frozen.nbytes for frozen in self._nested.values())
@@ -0,0 +1,167 @@
+from game_entities import *
+from scipy.spatial import cKDTree
+import numpy as np
+import weakref
+import math
+
+#Spatial index over entity positions, for "which bullets are near this point" questions without looping over every bullet.
+#The default backend is a uniform grid over the playfield: positions are sorted by cell, so the cells of each row
+#of a query's bounding box form one contiguous slice, and only those candidates get their exact distance checked.
+#The 'kdtree' backend (scipy's cKDTree) is usually faster when there are few positions and large radii.
+#
+#Queries return indices into the positions the index was built from (sorted ascending).
+#Distances are inclusive (a position exactly at distance r is within r). Positions outside the bounds are kept in
+#the edge cells, so they're still found. Batch queries take an (m, 2) array of points and are vectorized over all of them.
+
+class SpatialIndex:
+    #bounds: (min x, min y, max x, max y) covered by the grid; defaults to the positions' bounding box
+    def __init__(self, positions, bounds = None, cell_size = 16, backend = 'grid'):
+        if backend not in ['grid', 'kdtree']:
+            raise ValueError(f"Unknown spatial index backend '{backend}' (expected 'grid' or 'kdtree').")
+
+        self.positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        self.backend = backend
+
+        if backend == 'kdtree':
+            self.tree = cKDTree(self.positions)
+            return
+
+        if bounds is None:
+            bounds = (*self.positions.min(axis=0), *self.positions.max(axis=0)) if len(self.positions) else (0, 0, 1, 1)
+        self.origin = np.array(bounds[:2], dtype=np.float64)
+        self.cell_size = cell_size
+        self.nx = max(1, math.ceil((bounds[2] - bounds[0]) / cell_size))
+        self.ny = max(1, math.ceil((bounds[3] - bounds[1]) / cell_size))
+
+        cells_x, cells_y = self._cells(self.positions)
+        cell_ids = cells_y * self.nx + cells_x
+        self.order = np.argsort(cell_ids, kind='stable')
+        self.sorted_positions = self.positions[self.order]
+        self.cell_starts = np.concatenate(([0], np.cumsum(np.bincount(cell_ids, minlength=self.nx * self.ny))))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _cells(self, points):
+        cells = np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+        return np.clip(cells[:, 0], 0, self.nx - 1), np.clip(cells[:, 1], 0, self.ny - 1)
+
+    #(query index, position index) of every position in the cells covering each box; boxes are (m, 4) min/max corners
+    def _candidates(self, boxes):
+        cx0, cy0 = self._cells(boxes[:, :2])
+        cx1, cy1 = self._cells(boxes[:, 2:])
+        rows = cy0[:, None] + np.arange((cy1 - cy0).max() + 1 if len(boxes) else 0)
+        valid = rows <= cy1[:, None]
+        rows = np.minimum(rows, self.ny - 1)
+
+        starts = self.cell_starts[rows * self.nx + cx0[:, None]]
+        lengths = np.where(valid, self.cell_starts[rows * self.nx + cx1[:, None] + 1] - starts, 0).ravel()
+        total = lengths.sum()
+        queries = np.repeat(np.repeat(np.arange(len(boxes)), rows.shape[1]), lengths)
+        offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return queries, np.repeat(starts.ravel(), lengths) + offsets
+
+    #(query index, position index) pairs for every position within r of each point, sorted by query
+    def pairs_within(self, points, r):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+
+        if self.backend == 'kdtree':
+            neighbors = self.tree.query_ball_point(points, r) if len(points) else []
+            lengths = np.fromiter(map(len, neighbors), dtype=np.int64, count=len(points))
+            indices = np.concatenate([np.sort(np.asarray(n, dtype=np.int64)) for n in neighbors]) if lengths.sum() else np.zeros(0, dtype=np.int64)
+            return np.repeat(np.arange(len(points)), lengths), indices
+
+        queries, candidates = self._candidates(np.hstack((points - r, points + r)))
+        deltas = self.sorted_positions[candidates] - points[queries]
+        within = np.einsum('ij,ij->i', deltas, deltas) <= r * r
+        queries, indices = queries[within], self.order[candidates[within]]
+        order = np.argsort(queries * len(self.positions) + indices)
+        return queries[order], indices[order]
+
+    #number of positions within r of each point
+    def count_within(self, points, r):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if self.backend == 'kdtree':
+            return np.asarray(self.tree.query_ball_point(points, r, return_length=True), dtype=np.int64).reshape(len(points))
+        return np.bincount(self.pairs_within(points, r)[0], minlength=len(points))
+
+    def radius(self, point, r):
+        return self.pairs_within([point], r)[1]
+
+    #positions with r_inner < distance <= r_outer
+    def annulus(self, point, r_inner, r_outer):
+        indices = self.radius(point, r_outer)
+        deltas = self.positions[indices] - np.asarray(point, dtype=np.float64)
+        return indices[np.einsum('ij,ij->i', deltas, deltas) > r_inner * r_inner]
+
+    #positions inside the box (inclusive)
+    def box(self, min_x, min_y, max_x, max_y):
+        if self.backend == 'kdtree':
+            center = ((min_x + max_x) / 2, (min_y + max_y) / 2)
+            candidates = self.radius(center, math.hypot(max_x - min_x, max_y - min_y) / 2)
+        else:
+            candidates = np.sort(self.order[self._candidates(np.array([[min_x, min_y, max_x, max_y]], dtype=np.float64))[1]])
+
+        x, y = self.positions[candidates].T
+        return candidates[(min_x <= x) & (x <= max_x) & (min_y <= y) & (y <= max_y)]
+
+    #the k positions closest to point, closest first
+    def nearest(self, point, k = 1):
+        k = min(k, len(self.positions))
+        if k == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        if self.backend == 'kdtree':
+            return np.atleast_1d(self.tree.query(point, k)[1]).astype(np.int64)
+
+        #grow the search radius until it holds k positions; the k closest are then all inside it
+        r = self.cell_size
+        while True:
+            indices = self.radius(point, r)
+            if len(indices) >= k or r > (self.nx + self.ny) * self.cell_size * 2:
+                break
+            r *= 2
+        if len(indices) < k: #(far from everything)
+            indices = np.arange(len(self.positions))
+
+        deltas = self.positions[indices] - np.asarray(point, dtype=np.float64)
+        distances = np.einsum('ij,ij->i', deltas, deltas)
+        return indices[np.lexsort((indices, distances))[:k]]
+
+    #k nearest positions for each point, as an (m, k) array (-1 where there are fewer than k positions)
+    def nearest_batch(self, points, k = 1):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        result = np.full((len(points), k), -1, dtype=np.int64)
+        if not len(self.positions):
+            return result
+
+        if self.backend == 'kdtree':
+            indices = self.tree.query(points, k)[1].reshape(len(points), k)
+            result[:] = np.where(indices < len(self.positions), indices, -1)
+            return result
+
+        for i, point in enumerate(points):
+            nearest = self.nearest(point, k)
+            result[i, :len(nearest)] = nearest
+        return result
+
+#Index over an entity list of a state (e.g. 'bullets', 'enemies', 'side2.bullets'), with a grid sized to the playfield.
+#The index of the last state asked for is kept, so analyzers looking at the same frame share it
+#(the state is only weakly referenced, so keeping its index doesn't keep the state alive).
+_last_index = (lambda: None, None, None)
+
+def spatial_index(state: GameState, field = 'bullets', cell_size = 16, backend = 'grid'):
+    global _last_index
+    key = (field, cell_size, backend)
+    if _last_index[0]() is state and _last_index[1] == key:
+        return _last_index[2]
+
+    entities = state
+    for attribute in field.split('.'):
+        entities = getattr(entities, attribute)
+
+    positions = np.fromiter((coordinate for entity in entities for coordinate in entity.position), dtype=np.float64, count=2 * len(entities))
+    width, height = state.constants.world_width, state.constants.world_height
+    index = SpatialIndex(positions, (-width / 2, 0, width / 2, height), cell_size, backend)
+    _last_index = (weakref.ref(state), key, index)
+    return index
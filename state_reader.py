@@ -1,18 +1,38 @@
 from settings import extraction_settings, singlext_settings, seqext_settings
+import memory_sources
+import sys
+
+#headless/record arguments must pick the memory source before the interface connects to a game
+#(also applies to multiprocessing workers, which re-run this as __mp_main__ with the same arguments)
+if __name__ in ['__main__', '__mp_main__']:
+    memory_sources.select_from_args(sys.argv[1:])
+
 from interface import *
+from extraction_stats import ExtractionStats
+from extraction_schedule import ExtractionSchedule
+from capture import CaptureWriter
+from exporter import StateExporter
+from catalog import CatalogWriter
+from trigger_capture import TriggerCapture
 import analysis_examples as analysis #(includes analysis.py analyzers)
-import sys
 import math
 import time
 import atexit
+import asyncio
+import concurrent.futures
+import multiprocessing
 
 #For quick access
 analyzer, requires_bullets, requires_enemies, requires_items, requires_lasers, requires_player_shots, requires_screenshots, requires_side2_pvp = extraction_settings.values()
 exact = seqext_settings['exact']
 need_active = seqext_settings['need_active']
 infinite_print_updates = seqext_settings['infinite_print_updates']
+print_extraction_stats = seqext_settings['print_extraction_stats']
+frame_deadline_ms = seqext_settings['frame_deadline_ms']
 
-def extract_bullets(bullet_manager = zBulletManager):
+#Manager defaults are looked up on each call, as refresh_context() replaces them when the game recreates its managers
+def extract_bullets(bullet_manager = None):
+    bullet_manager = bullet_manager or zBulletManager
     bullets = []
     current_bullet_list = read_zList(bullet_manager + zBulletManager_list)
 
@@ -94,7 +114,8 @@ def extract_enemy_drops(enemy_drops):
 
     return drops
 
-def extract_enemies(enemy_manager = zEnemyManager):
+def extract_enemies(enemy_manager = None):
+    enemy_manager = enemy_manager or zEnemyManager
     enemies = []
     current_enemy_list = {"entry": 0, "next": read_int(enemy_manager + zEnemyManager_list)}
     ecl_sub_names, ecl_sub_starts = ecl_sub_arrs[enemy_manager]
@@ -229,7 +250,8 @@ def extract_enemies(enemy_manager = zEnemyManager):
     return enemies
 
 #used to get special state info contained by the boss, like kyouko echo, okina season disable...
-def find_special_enemy_addr(special_func, enemy_manager = zEnemyManager):
+def find_special_enemy_addr(special_func, enemy_manager = None):
+    enemy_manager = enemy_manager or zEnemyManager
     current_enemy_list = {"entry": 0, "next": read_int(enemy_manager + zEnemyManager_list)}
 
     while current_enemy_list["next"]:
@@ -239,7 +261,8 @@ def find_special_enemy_addr(special_func, enemy_manager = zEnemyManager):
         if read_int(zEnemy + zEnemy_special_func) == special_func:
             return zEnemy
 
-def extract_items(item_manager = zItemManager):
+def extract_items(item_manager = None):
+    item_manager = item_manager or zItemManager
     items = []
     item_array_start = item_manager + zItemManager_array
     item_array_end   = item_array_start + zItemManager_array_len * zItem_len
@@ -310,7 +333,8 @@ def extract_animal_tokens():
 
     return animal_tokens
 
-def extract_lasers(laser_manager = zLaserManager):
+def extract_lasers(laser_manager = None):
+    laser_manager = laser_manager or zLaserManager
     lasers = []
     current_laser_ptr = read_int(laser_manager + zLaserManager_list) #pointer to head laser 
 
@@ -461,7 +485,8 @@ def find_anm_vm_by_id(anm_id, list_offset=zAnmManager_list):
         if read_int(zAnmVm + zAnmVm_id) == anm_id:
             return zAnmVm
 
-def extract_player_option_positions(player = zPlayer):
+def extract_player_option_positions(player = None):
+    player = player or zPlayer
     player_option_positions = []
     player_option_array_start = player + zPlayer_option_array
     player_option_array_end   = player_option_array_start + zPlayer_option_array_len * zPlayerOption_len
@@ -480,7 +505,8 @@ def extract_player_option_positions(player = zPlayer):
 
     return player_option_positions
 
-def extract_player_shots(player = zPlayer):
+def extract_player_shots(player = None):
+    player = player or zPlayer
     player_shots = []
     player_shot_array_start = player + zPlayer_shots_array
     player_shot_array_end   = player_shot_array_start + zPlayer_shots_array_len * zPlayerShot_len
@@ -501,7 +527,8 @@ def extract_player_shots(player = zPlayer):
 
     return player_shots
 
-def extract_spellcard(spellcard = zSpellCard):
+def extract_spellcard(spellcard = None):
+    spellcard = spellcard or zSpellCard
     if read_int(spellcard + zSpellcard_indicator) == 0:
         return None
 
@@ -513,7 +540,51 @@ def extract_spellcard(spellcard = zSpellCard):
         capture_bonus = spell_capture_bonus,
     )
 
-def extract_game_state(frame_id = 0, real_time = 0):
+#Entity categories, mapped to the state fields they fill and how to extract them
+#Categories are read in priority order after the rest of the state (see extract_game_state)
+category_fields = {
+    'bullets':      [('bullets', extract_bullets)],
+    'lasers':       [('lasers', extract_lasers)],
+    'enemies':      [('enemies', extract_enemies)],
+    'items':        [('items', extract_items)],
+    'player_shots': [('player_shots', extract_player_shots)],
+}
+
+if game_id == 13:
+    category_fields['items'].append(('spirit_items', extract_spirit_items))
+
+elif game_id == 17:
+    category_fields['items'].append(('field_tokens', extract_animal_tokens))
+
+elif game_id == 19 and requires_side2_pvp:
+    category_fields['bullets'].append(('side2.bullets', lambda: extract_bullets(zBulletManagerP2)))
+    category_fields['lasers'].append(('side2.lasers', lambda: extract_lasers(zLaserManagerP2)))
+    category_fields['enemies'].append(('side2.enemies', lambda: extract_enemies(zEnemyManagerP2)))
+    category_fields['items'].append(('side2.items', lambda: extract_items(zItemManagerP2)))
+    category_fields['player_shots'].append(('side2.player_shots', lambda: extract_player_shots(zPlayerP2)))
+
+category_required = {
+    'bullets':      requires_bullets,
+    'lasers':       requires_lasers,
+    'enemies':      requires_enemies,
+    'items':        requires_items,
+    'player_shots': requires_player_shots,
+}
+if memory_sources.recorder and memory_sources.recorder.reads_everything: #(journals must hold every category for replays)
+    category_required = dict.fromkeys(category_required, True)
+
+#same order as extraction_rates; categories missing from it go last (and are read every frame, see ExtractionSchedule)
+category_priority = [category for category in seqext_settings['extraction_rates'] if category in category_fields]
+category_priority += [category for category in category_fields if category not in category_priority]
+
+def get_state_field(state, field): #supports side2 fields, e.g. 'side2.bullets'
+    for name in field.split('.'):
+        state = getattr(state, name)
+    return state
+
+#due_categories: entity categories to read this frame (None = all); the others are carried over from prev_state
+#deadline: perf_counter time after which lower priority categories are carried over instead of read
+def extract_game_state(frame_id = 0, real_time = 0, due_categories = None, prev_state = None, deadline = None):
     boss_timer = -1
     if (game_id in has_boss_timer_drawn_if_indic_zero) == (read_int(zGui+zGui_bosstimer_drawn) == 0):
         boss_timer = read_int(zGui+zGui_bosstimer_s) + read_int(zGui+zGui_bosstimer_ms)/100
@@ -521,9 +592,18 @@ def extract_game_state(frame_id = 0, real_time = 0):
     state_base = {
         'frame_stage':        read_int(stage_timer),
         'frame_global':       read_int(global_timer),
+        'player_position':    (read_float(zPlayer + zPlayer_pos), read_float(zPlayer + zPlayer_pos + 0x4)),
+        'player_hitbox_rad':  read_float(zPlayer + zPlayer_hit_rad),
+        'player_iframes':     read_int(zPlayer + zPlayer_iframes),
+        'player_focused':     read_int(zPlayer + zPlayer_focused) == 1,
+        'player_deathbomb_f': max(0, game_constants.deathbomb_window_frames - read_int(zPlayer + zPlayer_db_timer)) if read_int(zPlayer + zPlayer_state) == 4 else 0,
         'stage_chapter':      read_int(stage_chapter, rel=True),
         'seq_frame_id':       frame_id,
         'seq_real_time':      real_time,
+        'seq_frames_skipped': None, #set by the sequence extraction loop
+        'seq_latency':        None, #idem
+        'seq_carried_over':   [],
+        'seq_torn':           [],
         'pause_state':        read_int(pause_state, rel=True),
         'game_mode':          read_int(game_mode, rel=True),
         'game_speed':         read_float(game_speed, rel=True),
@@ -541,23 +621,40 @@ def extract_game_state(frame_id = 0, real_time = 0):
         'input':              read_int(input, rel=True),
         'rng':                read_int(replay_rng, rel=True),
         'continues':          read_int(continues, rel=True),
-        'player_position':    (read_float(zPlayer + zPlayer_pos), read_float(zPlayer + zPlayer_pos + 0x4)),
-        'player_hitbox_rad':  read_float(zPlayer + zPlayer_hit_rad),
-        'player_iframes':     read_int(zPlayer + zPlayer_iframes),
-        'player_focused':     read_int(zPlayer + zPlayer_focused) == 1,
         'player_options_pos': extract_player_option_positions(),
-        'player_shots':       extract_player_shots() if requires_player_shots else [],
-        'player_deathbomb_f': max(0, game_constants.deathbomb_window_frames - read_int(zPlayer + zPlayer_db_timer)) if read_int(zPlayer + zPlayer_state) == 4 else 0,
         'bomb_state':         read_int(zBomb + zBomb_state),
-        'bullets':            extract_bullets() if requires_bullets else [],
-        'enemies':            extract_enemies() if requires_enemies else [],
-        'items':              extract_items() if requires_items else [],
-        'lasers':             extract_lasers() if requires_lasers else [],
-        'screen':             get_rgb_screenshot() if requires_screenshots else None,
         'constants':          game_constants,
         'env':                run_environment,
     }
 
+    #Entity categories, highest priority first; the stage timer is re-checked after each one
+    #so that categories read after the game moved on to the next frame are reported as torn
+    entity_fields = {}
+    read_any = False
+    for category in category_priority:
+        if not category_required[category]:
+            for field, extract in category_fields[category]:
+                entity_fields[field] = []
+            continue
+
+        carry = prev_state is not None and (
+            (due_categories is not None and category not in due_categories) or
+            (deadline is not None and read_any and time.perf_counter() > deadline)) #top priority category always read
+
+        for field, extract in category_fields[category]:
+            entity_fields[field] = get_state_field(prev_state, field) if carry else extract()
+
+        if carry:
+            state_base['seq_carried_over'].append(category)
+            continue
+
+        read_any = True
+        if state_base['seq_torn'] or read_int(stage_timer) != state_base['frame_stage']:
+            state_base['seq_torn'].append(category)
+
+    state_base['screen'] = get_rgb_screenshot() if requires_screenshots else None
+    state_base.update({field: value for field, value in entity_fields.items() if '.' not in field})
+
     if game_id == 13:
         game_constants.life_piece_req = life_piece_reqs[read_int(extend_count, rel=True)]
 
@@ -600,7 +697,7 @@ def extract_game_state(frame_id = 0, real_time = 0):
             spawned_spirit_count    = read_int(zSpiritManager + zSpiritManager_spawn_total),
             chain_timer             = read_int(zSpiritManager + zSpiritManager_chain_timer),
             chain_counter           = read_int(zSpiritManager + zSpiritManager_chain_counter),
-            spirit_items            = extract_spirit_items() if requires_items else [],
+            spirit_items            = entity_fields['spirit_items'],
             kyouko_echo             = kyouko_echo,
             youmu_charge_timer      = read_int(zPlayer + zPlayer_youmu_charge_timer, signed=True),
             miko_final_logic_active = bool(find_special_enemy_addr(miko_final_func))
@@ -679,7 +776,7 @@ def extract_game_state(frame_id = 0, real_time = 0):
         return GameStateWBaWC(
             **state_base,
             held_tokens                   = held_tokens,
-            field_tokens                  = extract_animal_tokens() if requires_items else [],
+            field_tokens                  = entity_fields['field_tokens'],
             roaring_hyper                 = hyper,
             extra_token_spawn_delay_timer = read_int(hyper_token_spawn_delay, rel=True),
             youmu_charge_timer            = read_int(zPlayer + zPlayer_youmu_charge_timer, signed=True),
@@ -766,12 +863,12 @@ def extract_game_state(frame_id = 0, real_time = 0):
                 player_iframes      = read_int(zPlayerP2 + zPlayer_iframes),
                 player_focused      = read_int(zPlayerP2 + zPlayer_focused) == 1,
                 player_options_pos  = extract_player_option_positions(zPlayerP2),
-                player_shots        = extract_player_shots(zPlayerP2) if requires_player_shots else [],
+                player_shots        = entity_fields['side2.player_shots'],
                 bomb_state          = read_int(zBombP2 + zBomb_state),
-                bullets             = extract_bullets(zBulletManagerP2) if requires_bullets else [],
-                enemies             = extract_enemies(zEnemyManagerP2) if requires_enemies else [],
-                items               = extract_items(zItemManagerP2) if requires_items else [],
-                lasers              = extract_lasers(zLaserManagerP2) if requires_lasers else [],
+                bullets             = entity_fields['side2.bullets'],
+                enemies             = entity_fields['side2.enemies'],
+                items               = entity_fields['side2.items'],
+                lasers              = entity_fields['side2.lasers'],
                 hitstun_status      = read_int(zPlayerP2 + zPlayer_hitstun_status),
                 shield_status       = read_int(zPlayerP2 + zPlayer_shield_status),
                 last_combo_hits     = read_int(zPlayerP2 + zPlayer_last_combo_hits),
@@ -1366,8 +1463,252 @@ def print_game_state(gs: GameState):
                 print(f'• ... [{len(gs.player_shots)} shots total]')
                 break
 
+#Sequence extraction as an asyncio API; the CLI below is one consumer of it.
+#States are published to every subscriber (async for state in session / session.subscribe()),
+#and extraction itself runs in a single worker thread so consumers stay responsive.
+#Runs against memory_sources.active instead of the game if one was selected before importing interface.
+class ExtractionSession:
+    def __init__(self, frame_count = None, exact = exact, need_active = need_active, queue_size = 60, poll_interval = 0, executor = None, continuous = False):
+        self.frame_count = frame_count #None = until termination
+        self.continuous = continuous #keep going through stage transitions, retries, game overs and menus (states are only extracted in-stage)
+        self.exact = exact #in exact mode, the game stays suspended until every subscriber is done with the state
+        self.need_active = need_active
+        self.queue_size = queue_size #states buffered per subscriber before extraction waits on it
+        self.poll_interval = poll_interval #seconds between frame checks; 0 busy-waits like the CLI always has
+        self.executor = executor
+        self.stats = ExtractionStats()
+        self.schedule = ExtractionSchedule(seqext_settings['extraction_rates'], seqext_settings['adaptive_rates'], seqext_settings['frame_budget_ms'])
+        self.frame_counter = 0
+        self.state = None
+        self.termination_reason = None
+        self.error = None #exception extraction failed with, re-raised to subscribers once they've consumed what came before
+        self.start_time = None
+        self.end_time = None
+        self._subscribers = []
+        self._waiters = []
+        self._task = None
+        self._closed = False
+        self._suspended = False
+        self._context_refreshed = False
+
+    @property
+    def elapsed(self):
+        if self.start_time is None:
+            return 0
+        return (self.end_time or time.perf_counter()) - self.start_time
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+        return self._task
+
+    def cancel(self):
+        if not self.termination_reason:
+            self.termination_reason = "Extraction cancelled"
+        if self._task:
+            self._task.cancel()
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def subscribe(self, queue_size = None):
+        queue = asyncio.Queue(queue_size if queue_size is not None else self.queue_size)
+        if self._closed:
+            queue.put_nowait(None)
+        else:
+            self._subscribers.append(queue)
+        return self._consume(queue)
+
+    def __aiter__(self):
+        subscription = self.subscribe()
+        self.start()
+        return subscription
+
+    async def _consume(self, queue):
+        try:
+            while True:
+                state = await queue.get()
+                if state is None:
+                    if self.error is not None:
+                        await self._task #(re-raises the error, and marks it retrieved)
+                    return
+                try:
+                    yield state
+                finally:
+                    queue.task_done()
+        finally:
+            #unsubscribing must never leave extraction waiting on this queue
+            if queue in self._subscribers:
+                self._subscribers.remove(queue)
+            while not queue.empty():
+                queue.get_nowait()
+                queue.task_done()
+
+    #Returns the first extracted state whose stage frame is at least frame_stage (the next extracted state if None);
+    #returns None if the session ends first, or raises the error extraction failed with.
+    async def wait_frame(self, frame_stage = None):
+        if frame_stage is not None and not self._closed and self.state and self.state.frame_stage >= frame_stage:
+            return self.state
+
+        state = None
+        if not self._closed:
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append((frame_stage, future))
+            state = await future
+
+        if state is None and self.error is not None:
+            await self._task #(re-raises the error, and marks it retrieved)
+        return state
+
+    async def _wait_tick(self, frame_timestamp):
+        if memory_sources.active: #no clock to wait on; the source is stepped instead
+            term_return = wait_game_frame(frame_timestamp, self.need_active, self.continuous)
+            if term_return or not self.continuous or (in_game_world() and not extraction_context_changed()):
+                return term_return
+            return await self._wait_game_world()
+
+        while True: #(do...while, ensuring term conditions evaluated at least once)
+            term_return = eval_termination_conditions(self.need_active, self.continuous)
+            if term_return:
+                return term_return
+
+            if self.continuous and (not in_game_world() or extraction_context_changed()):
+                return await self._wait_game_world()
+
+            if read_int(stage_timer) != frame_timestamp:
+                return None
+
+            await asyncio.sleep(self.poll_interval)
+
+    #Continuous mode: waits out menus, game over screens and stage transitions, then picks up the game's new managers
+    async def _wait_game_world(self):
+        while not in_game_world():
+            if memory_sources.active:
+                term_return = wait_game_frame(None, self.need_active, True)
+            else:
+                term_return = eval_termination_conditions(self.need_active, True)
+                await asyncio.sleep(max(self.poll_interval, 0.001))
+            if term_return:
+                return term_return
+
+        refresh_context()
+        self._context_refreshed = True
+        return None
+
+    async def _publish(self, state):
+        for queue in list(self._subscribers):
+            await queue.put(state)
+
+        waiters = []
+        for frame_stage, future in self._waiters:
+            if not future.done():
+                if frame_stage is None or state.frame_stage >= frame_stage:
+                    future.set_result(state)
+                else:
+                    waiters.append((frame_stage, future))
+        self._waiters = waiters
+
+        if self.exact:
+            await asyncio.gather(*(queue.join() for queue in list(self._subscribers)))
+
+    def _close(self):
+        if not self._closed: #cancelled or failed: end subscriptions now, dropping states they haven't consumed
+            self._closed = True
+            for queue in self._subscribers:
+                while queue.full():
+                    queue.get_nowait()
+                    queue.task_done()
+                queue.put_nowait(None)
+
+        for frame_stage, future in self._waiters:
+            if not future.done():
+                future.set_result(None)
+        self._waiters = []
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        executor = self.executor or concurrent.futures.ThreadPoolExecutor(max_workers = 1) #memory reads aren't thread-safe; keep to one worker
+        self.start_time = time.perf_counter()
+        tick_time = self.start_time
+        prev_frame_stage = None
+
+        try:
+            while self.frame_count is None or self.frame_counter < self.frame_count:
+                frame_timestamp = read_int(stage_timer)
+
+                if memory_sources.recorder:
+                    memory_sources.recorder.next_frame()
+
+                if self.exact and game_process:
+                    game_process.suspend()
+                    self._suspended = True
+
+                extract_start = time.perf_counter()
+                deadline = tick_time + frame_deadline_ms/1000 if frame_deadline_ms else None
+                prev_state = None if self._context_refreshed else self.state #nothing carries over into a new stage
+                if self._context_refreshed:
+                    prev_frame_stage = None
+                    self._context_refreshed = False
+
+                state = await loop.run_in_executor(executor, extract_game_state, self.frame_counter, extract_start - self.start_time, self.schedule.due(frame_timestamp), prev_state, deadline)
+                self.schedule.record(time.perf_counter() - extract_start, state)
+                state.seq_latency = time.perf_counter() - tick_time
+                state.seq_frames_skipped = max(0, state.frame_stage - prev_frame_stage - 1) if prev_frame_stage is not None else 0
+                prev_frame_stage = state.frame_stage
+
+                self.state = state
+                self.stats.add(state)
+                self.frame_counter += 1
+                await self._publish(state)
+
+                if self._suspended:
+                    game_process.resume()
+                    self._suspended = False
+
+                if self.frame_count is not None and self.frame_counter >= self.frame_count:
+                    break
+
+                term_return = await self._wait_tick(frame_timestamp)
+                if term_return:
+                    self.termination_reason = term_return
+                    break
+                tick_time = time.perf_counter()
+
+            for queue in list(self._subscribers):
+                await queue.put(None)
+            self._closed = True
+
+        except Exception as error:
+            self.error = error
+            raise
+
+        finally:
+            self.end_time = time.perf_counter()
+            if self._suspended:
+                game_process.resume()
+                self._suspended = False
+            if not self.executor:
+                executor.shutdown(wait = False)
+            self._close()
+
+#Re-reads the game's managers etc. into this module too (see refresh_extraction_context in interface.py)
+def refresh_context():
+    globals().update(refresh_extraction_context())
+
 def on_exit():
-    if game_process.is_running:
+    if game_process and game_process.is_running:
         game_process.resume()
 atexit.register(on_exit)
 
@@ -1390,112 +1731,242 @@ def parse_frame_count(expr):
 
     return frame_count
 
-print("================================")
+#sinks: objects with an add(state) method that get every state (capture writers, exporters...)
+async def run_sequence_extraction(session, analysis, print_states = False, sinks = None):
+    async for state in session:
+        if session.frame_count is None:
+            if infinite_print_updates:
+                print(f"Extracted frame #{state.seq_frame_id+1} (in-stage: #{state.frame_stage})")
+        else:
+            print(f"[{int(100*state.seq_frame_id/session.frame_count)}%] Extracted frame #{state.seq_frame_id+1} (in-stage: #{state.frame_stage})")
 
-infinite = False
-frame_count = 0
-if seqext_settings['ingame_duration']:
-    if seqext_settings['ingame_duration'].lower() in ['inf', 'infinite', 'endless', 'forever']:
-        infinite = True
+        for sink in sinks or []:
+            sink.add(state)
+        analysis.step(state)
+        if print_states:
+            print_game_state(state)
+
+#Headless multiprocessing worker: extracts a range of recorded frames from this process's own memory source.
+#Returns the states, and the termination reason if a frame's memory ended extraction (that frame's state included).
+def extract_frame_range(frame_range):
+    first_frame, end_frame = frame_range
+    memory_sources.active.seek(first_frame)
+    start_time = time.perf_counter()
+    states = []
 
-    else:
-        parsed_frame_count = parse_frame_count(seqext_settings['ingame_duration'])
+    for frame_index in range(first_frame, end_frame):
+        if frame_index > first_frame and not memory_sources.active.next_frame():
+            break
 
-        if parsed_frame_count:
-            frame_count = parsed_frame_count
-        else:
-            print(f"Error: Couldn't parse duration '{seqext_settings['ingame_duration']}'; remember to include a unit (e.g. 150f / 12.4s).")
-            print("Defaulting to single-state extraction.\n")
+        extract_start = time.perf_counter()
+        state = extract_game_state(frame_index, extract_start - start_time)
+        state.seq_latency = time.perf_counter() - extract_start
+        states.append(state)
+
+        termination_reason = eval_memory_termination_conditions()
+        if termination_reason:
+            return states, termination_reason
+
+    return states, None
+
+#Headless extraction split across worker processes; states are still analyzed in order, as they come back
+def run_headless_extraction(analysis, frame_count, workers, print_states = False, sinks = None, chunk_frames = 240):
+    total = memory_sources.active.frame_total
+    if frame_count:
+        total = min(total, frame_count)
+
+    stats = ExtractionStats()
+    termination_reason = None
+    prev_frame_stage = None
+    frame_ranges = [(first_frame, min(total, first_frame + chunk_frames)) for first_frame in range(0, total, chunk_frames)]
+
+    with multiprocessing.Pool(workers) as pool:
+        for states, worker_termination_reason in pool.imap(extract_frame_range, frame_ranges):
+            for state in states:
+                state.seq_frames_skipped = max(0, state.frame_stage - prev_frame_stage - 1) if prev_frame_stage is not None else 0
+                prev_frame_stage = state.frame_stage
+                stats.add(state)
+
+                for sink in sinks or []:
+                    sink.add(state)
+                analysis.step(state)
+                if print_states:
+                    print_game_state(state)
+
+                termination_reason = eval_user_termination_conditions() #(the parent's memory source isn't stepped)
+                if termination_reason:
+                    break
+
+            termination_reason = termination_reason or worker_termination_reason
+            if termination_reason:
+                break
 
-if len(sys.argv) > 1:
-    for arg in sys.argv[1:]:
-        parsed_frame_count = parse_frame_count(arg)
+            print(f"[{int(100*(states[-1].seq_frame_id+1)/total) if states else 100}%] Extracted {stats.extracted_frames} frames")
 
-        if parsed_frame_count:
-            frame_count = parsed_frame_count
+    return stats, termination_reason
 
-        elif arg in ['inf', 'infinite', 'endless', 'forever']:
-            infinite = True
+def main():
+    global analyzer, analysis, exact
+
+    headless = memory_sources.active is not None
+    workers = seqext_settings['headless_workers']
+    capture_file = seqext_settings['capture_file']
+    export_directory = seqext_settings['export_directory']
+    continuous_directory = seqext_settings['continuous_directory']
+    trigger_directory = seqext_settings['trigger_directory']
+    print_states = False
 
-        elif arg == 'exact':
-            exact = True #overwrites settings
+    print("================================")
+
+    infinite = False
+    frame_count = 0
+    if seqext_settings['ingame_duration']:
+        if seqext_settings['ingame_duration'].lower() in ['inf', 'infinite', 'endless', 'forever']:
+            infinite = True
 
         else:
-            print(f"Error: Unrecognized argument '{arg}'.")
-            exit()
+            parsed_frame_count = parse_frame_count(seqext_settings['ingame_duration'])
 
-if not hasattr(analysis, analyzer):
-    print(f"Error: Unrecognized analyzer {analyzer}; defaulting to template.")
-    analyzer = 'AnalysisTemplate'
+            if parsed_frame_count:
+                frame_count = parsed_frame_count
+            else:
+                print(f"Error: Couldn't parse duration '{seqext_settings['ingame_duration']}'; remember to include a unit (e.g. 150f / 12.4s).")
+                print("Defaulting to single-state extraction.\n")
 
-if frame_count < 2 and not infinite: #Single-State Extraction
-    analysis = getattr(analysis, analyzer)()
+    if len(sys.argv) > 1:
+        args = iter(sys.argv[1:])
+        for arg in args:
+            parsed_frame_count = parse_frame_count(arg)
 
-    if requires_screenshots:
-        get_focus()
+            if parsed_frame_count:
+                frame_count = parsed_frame_count
 
-    state = extract_game_state()
-    analysis.step(state)
-    print_game_state(state)
+            elif arg in ['inf', 'infinite', 'endless', 'forever']:
+                infinite = True
 
-    print("================================")
-    analysis.done()
+            elif arg == 'exact':
+                exact = True #overwrites settings
 
-else: #State Sequence Extraction
-    if infinite:
-        print(f"Extracting until termination (infinite mode){' (exact mode)' if exact else ''}.")
-    else:
-        print(f"Extracting for {frame_count} frames{' (exact mode)' if exact else ''}.")
+            elif arg in ['headless', 'record', 'journal']:
+                next(args, None) #(memory source already selected before importing the interface)
 
-    if seqext_settings['auto_unpause']:
-        unpause_game()
-    else:
-        if seqext_settings['auto_focus']:
+            elif arg == 'capture':
+                capture_file = next(args, '') #overwrites settings
+
+            elif arg == 'export':
+                export_directory = next(args, '') #overwrites settings
+
+            elif arg == 'continuous':
+                continuous_directory = next(args, '') #overwrites settings
+
+            elif arg == 'triggers':
+                trigger_directory = next(args, '') #overwrites settings
+
+            elif arg.startswith('workers=') and arg[8:].isdigit():
+                workers = int(arg[8:]) #overwrites settings
+
+            elif arg == 'print':
+                print_states = True
+
+            else:
+                print(f"Error: Unrecognized argument '{arg}'.")
+                exit()
+
+    if headless and not frame_count and not infinite: #default to the whole recording
+        infinite = True
+
+    if continuous_directory:
+        infinite = True
+
+    if not hasattr(analysis, analyzer):
+        print(f"Error: Unrecognized analyzer {analyzer}; defaulting to template.")
+        analyzer = 'AnalysisTemplate'
+
+    if frame_count < 2 and not infinite: #Single-State Extraction
+        analysis = getattr(analysis, analyzer)()
+
+        if requires_screenshots:
             get_focus()
-        print("(Unpause the game to begin extraction)")
 
-    analysis = getattr(analysis, analyzer)()
-    start_time = time.perf_counter()
-    terminated = False
-    frame_counter = 0
+        if memory_sources.recorder:
+            memory_sources.recorder.next_frame()
 
-    while infinite or frame_counter < frame_count:
-        if terminated:
-            break
+        state = extract_game_state()
+        analysis.step(state)
+        print_game_state(state)
+
+        print("================================")
+        analysis.done()
+
+    else: #State Sequence Extraction
+        if continuous_directory:
+            print(f"Extracting continuously across stages and runs until termination{' (exact mode)' if exact else ''}; saving segments to '{continuous_directory}'.")
+        elif headless:
+            print(f"Extracting {'all recorded frames' if infinite else f'{frame_count} frames'} (headless mode{f', {workers} workers' if workers > 1 else ''}).")
+        elif infinite:
+            print(f"Extracting until termination (infinite mode){' (exact mode)' if exact else ''}.")
+        else:
+            print(f"Extracting for {frame_count} frames{' (exact mode)' if exact else ''}.")
 
-        frame_timestamp = read_int(stage_timer)
-        if infinite:
-            if infinite_print_updates:
-                print(f"Extracting from frame #{frame_counter+1} (in-stage: #{frame_timestamp})")
+        if not headless:
+            if seqext_settings['auto_unpause']:
+                unpause_game()
+            else:
+                if seqext_settings['auto_focus']:
+                    get_focus()
+                print("(Unpause the game to begin extraction)")
+
+        analysis = getattr(analysis, analyzer)()
+        capture_writer = CaptureWriter(capture_file, compression_level = seqext_settings['capture_compression'], entity_encoding = seqext_settings['capture_entity_encoding'], metadata = {'game_id': game_id, 'analyzer': analyzer}) if capture_file else None
+        exporter = StateExporter(export_directory, seqext_settings['export_format'], seqext_settings['export_compress'], seqext_settings['export_rotate_frames']) if export_directory else None
+        catalog = CatalogWriter(continuous_directory, {'characters': characters, 'subshots': subshots, 'difficulties': difficulties}, {'game_id': game_id, 'analyzer': analyzer}, compression_level = seqext_settings['capture_compression'], entity_encoding = seqext_settings['capture_entity_encoding']) if continuous_directory else None
+        trigger_capture = TriggerCapture(trigger_directory, seqext_settings['triggers'], seqext_settings['trigger_pre_frames'], seqext_settings['trigger_post_frames'], {'game_id': game_id, 'analyzer': analyzer}, compression_level = seqext_settings['capture_compression'], entity_encoding = seqext_settings['capture_entity_encoding']) if trigger_directory else None
+        sinks = [sink for sink in [capture_writer, exporter, catalog, trigger_capture] if sink]
+
+        if headless and workers > 1 and not continuous_directory:
+            start_time = time.perf_counter()
+            stats, termination_reason = run_headless_extraction(analysis, None if infinite else frame_count, workers, print_states, sinks)
+            elapsed = time.perf_counter() - start_time
+            schedule = None
         else:
-            print(f"[{int(100*frame_counter/frame_count)}%] Extracting from frame #{frame_counter+1} (in-stage: #{frame_timestamp})")
+            session = ExtractionSession(None if infinite else frame_count, exact, need_active, continuous = bool(continuous_directory))
+            asyncio.run(run_sequence_extraction(session, analysis, print_states, sinks))
+            stats, schedule, termination_reason, elapsed = session.stats, session.schedule, session.termination_reason, session.elapsed
 
-        if exact:
-            game_process.suspend()
+        if termination_reason and not (headless and termination_reason == "End of memory source reached"):
+            print(f"{termination_reason}; terminating now.")
+        else:
+            print(f"{'[100%] ' if infinite else ''}Finished extraction in { round(elapsed, 2) } seconds{f' ({round(stats.extracted_frames / elapsed)} frames/s)' if headless and elapsed else ''}.")
 
-        state = extract_game_state(frame_counter, time.perf_counter() - start_time)
-        analysis.step(state)
-        frame_counter += 1
+        if capture_writer:
+            capture_writer.close()
+            print(f"Saved {capture_writer.frame_count} frames to capture file '{capture_file}'")
 
-        if exact:
-            game_process.resume()
+        if exporter:
+            exporter.close()
+            print(f"Exported {exporter.frame_count} frames to '{export_directory}' ({seqext_settings['export_format']})")
 
-        #busy wait for new frame
-        while True: #(do...while, ensuring term conditions evaluated at least once)
-            term_return = eval_termination_conditions(need_active)
-            if term_return:
-                print(f"{term_return}; terminating now.")
-                terminated = True
-                break
+        if catalog:
+            catalog.close(termination_reason)
+            print(f"Saved {catalog.segment_count} segments to '{continuous_directory}'")
 
-            if read_int(stage_timer) != frame_timestamp:
-                break
+        if trigger_capture:
+            trigger_capture.close()
+            print(f"Saved {trigger_capture.event_count} triggered events to '{trigger_directory}'")
 
-    if not terminated:
-        print(f"{'[100%] ' if infinite else ''}Finished extraction in { round(time.perf_counter() - start_time, 2) } seconds.")
+        if print_extraction_stats:
+            stats.report()
+            if schedule:
+                schedule.report()
 
-    if seqext_settings['auto_repause']:
-        pause_game()
+        if seqext_settings['auto_repause']:
+            pause_game()
 
-    print("================================")
-    analysis.done()
\ No newline at end of file
+        print("================================")
+        analysis.done()
+
+    if memory_sources.recorder:
+        memory_sources.recorder.close()
+
+if __name__ == '__main__':
+    main()
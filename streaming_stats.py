@@ -0,0 +1,207 @@
+import numpy as np
+
+#Streaming aggregators for analyzers: each takes one value per frame in O(1) (amortized) time and fixed memory.
+#Values are keyed by frame number (seq_frame_id, or frame_stage to follow the game's own clock); windows cover the
+#last `window` frames up to the latest one, counted in frames rather than values, so skipped frames don't stretch
+#them. A frame number lower than the previous one (e.g. frame_stage after a restart) starts the aggregator over.
+#
+#  RollingStats      sum, mean, count, min and max over a window (min/max via monotonic deques)
+#  EWMA              exponentially weighted moving average with a half-life in frames
+#  StreamingQuantile quantile estimate of everything seen so far (P-square algorithm, 5 markers)
+#  RateCounter       events per second over a window, from per-frame counts or from a running total (e.g. graze)
+
+#Fixed-capacity deque of (frame, value) pairs over NumPy arrays
+class _FrameDeque:
+    def __init__(self, capacity):
+        self.frames = np.zeros(capacity, dtype=np.int64)
+        self.values = np.zeros(capacity)
+        self.capacity = capacity
+        self.head = 0 #index of the first pair
+        self.size = 0
+
+    def clear(self):
+        self.head = self.size = 0
+
+    def _index(self, offset):
+        return (self.head + offset) % self.capacity
+
+    def front(self):
+        return self.frames[self.head], self.values[self.head]
+
+    def back(self):
+        index = self._index(self.size - 1)
+        return self.frames[index], self.values[index]
+
+    def push_back(self, frame, value):
+        index = self._index(self.size)
+        self.frames[index] = frame
+        self.values[index] = value
+        self.size += 1
+
+    def pop_front(self):
+        self.head = self._index(1)
+        self.size -= 1
+
+    def pop_back(self):
+        self.size -= 1
+
+class RollingStats:
+    def __init__(self, window = 60):
+        self.window = window
+        self.values = _FrameDeque(window)
+        self.mins = _FrameDeque(window) #increasing values
+        self.maxs = _FrameDeque(window) #decreasing values
+        self.last_frame = None
+        self.sum = 0.0
+
+    def clear(self):
+        for deque in [self.values, self.mins, self.maxs]:
+            deque.clear()
+        self.last_frame = None
+        self.sum = 0.0
+
+    #one value per frame: a value for the same frame as the last one is ignored
+    def add(self, frame, value):
+        if self.last_frame is not None and frame <= self.last_frame:
+            if frame == self.last_frame:
+                return
+            self.clear()
+        self.last_frame = frame
+        self._evict(frame)
+
+        self.values.push_back(frame, value)
+        self.sum += value
+        while self.mins.size and self.mins.back()[1] >= value:
+            self.mins.pop_back()
+        self.mins.push_back(frame, value)
+        while self.maxs.size and self.maxs.back()[1] <= value:
+            self.maxs.pop_back()
+        self.maxs.push_back(frame, value)
+
+    #drops values that fall out of the window as of frame
+    def _evict(self, frame):
+        oldest = frame - self.window
+        while self.values.size and self.values.front()[0] <= oldest:
+            self.sum -= self.values.front()[1]
+            self.values.pop_front()
+        for deque in [self.mins, self.maxs]:
+            while deque.size and deque.front()[0] <= oldest:
+                deque.pop_front()
+        if not self.values.size:
+            self.sum = 0.0 #(no rounding drift carried over)
+
+    @property
+    def count(self):
+        return self.values.size
+
+    @property
+    def mean(self):
+        return self.sum / self.values.size if self.values.size else np.nan
+
+    @property
+    def min(self):
+        return self.mins.front()[1] if self.mins.size else np.nan
+
+    @property
+    def max(self):
+        return self.maxs.front()[1] if self.maxs.size else np.nan
+
+class EWMA:
+    def __init__(self, half_life = 60):
+        self.half_life = half_life
+        self.value = np.nan
+        self.last_frame = None
+
+    def add(self, frame, value):
+        if self.last_frame is None or frame <= self.last_frame:
+            self.value = value
+        else:
+            #a gap of n frames decays the old average as much as n values would have
+            decay = 0.5 ** ((frame - self.last_frame) / self.half_life)
+            self.value = decay * self.value + (1 - decay) * value
+        self.last_frame = frame
+        return self.value
+
+class StreamingQuantile:
+    def __init__(self, quantile = 0.5):
+        self.quantile = quantile
+        self.heights = np.zeros(5) #marker values: min, q/2, q, (1+q)/2, max
+        self.positions = np.arange(1, 6, dtype=np.float64)
+        self.desired = np.array([1, 1 + 2 * quantile, 1 + 4 * quantile, 3 + 2 * quantile, 5])
+        self.increments = np.array([0, quantile / 2, quantile, (1 + quantile) / 2, 1])
+        self.count = 0
+        self.last_frame = None
+
+    def add(self, frame, value):
+        if self.last_frame is not None and frame < self.last_frame:
+            self.__init__(self.quantile)
+        self.last_frame = frame
+
+        if self.count < 5:
+            self.heights[self.count] = value
+            self.count += 1
+            if self.count == 5:
+                self.heights.sort()
+            return
+
+        heights, positions = self.heights, self.positions
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = int(np.searchsorted(heights, value, side='right')) - 1
+        positions[cell + 1:] += 1
+        self.desired += self.increments
+        self.count += 1
+
+        #move the middle markers toward their desired positions, parabolically if that keeps them in order
+        for i in range(1, 4):
+            offset = self.desired[i] - positions[i]
+            if (offset >= 1 and positions[i + 1] - positions[i] > 1) or (offset <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if offset > 0 else -1
+                parabolic = heights[i] + step / (positions[i + 1] - positions[i - 1]) * (
+                    (positions[i] - positions[i - 1] + step) * (heights[i + 1] - heights[i]) / (positions[i + 1] - positions[i]) +
+                    (positions[i + 1] - positions[i] - step) * (heights[i] - heights[i - 1]) / (positions[i] - positions[i - 1]))
+                if heights[i - 1] < parabolic < heights[i + 1]:
+                    heights[i] = parabolic
+                else:
+                    heights[i] += step * (heights[i + step] - heights[i]) / (positions[i + step] - positions[i])
+                positions[i] += step
+
+    @property
+    def value(self):
+        if self.count == 0:
+            return np.nan
+        if self.count < 5: #(exact while there are few values)
+            return float(np.quantile(self.heights[:self.count], self.quantile))
+        return float(self.heights[2])
+
+class RateCounter:
+    #cumulative: values added are a running total (e.g. state.graze) rather than per-frame counts
+    def __init__(self, window = 60, fps = 60, cumulative = False):
+        self.window = window
+        self.fps = fps
+        self.cumulative = cumulative
+        self.stats = RollingStats(window)
+        self.start_frame = None
+        self.prev_total = None
+
+    def add(self, frame, value):
+        if self.stats.last_frame is None or frame < self.stats.last_frame: #(starting over)
+            self.start_frame = frame
+            self.prev_total = None
+        elif frame == self.stats.last_frame:
+            return
+
+        if self.cumulative:
+            value, self.prev_total = (value - self.prev_total if self.prev_total is not None else 0), value
+        self.stats.add(frame, value)
+
+    #events per second over the window (over the frames seen, if fewer than the window)
+    @property
+    def rate(self):
+        frames = min(self.window, self.stats.last_frame - self.start_frame + (0 if self.cumulative else 1)) if self.stats.count else 0
+        return self.stats.sum * self.fps / frames if frames > 0 else 0.0
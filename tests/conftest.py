@@ -0,0 +1,65 @@
+import importlib.abc
+import importlib.machinery
+import importlib.util
+import ctypes
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+#Windows-only and GUI modules imported by the interface and analyzers. Tests never reach a game process, window
+#or plot, so those that aren't installed are replaced by permissive stubs: any attribute is another stub (a class,
+#so they can be subclassed), calls return stub instances, and stub instances are falsy (keyboard.is_pressed()...).
+stubbed_modules = ['pygetwindow', 'pyautogui', 'psutil', 'win32process', 'win32api', 'win32con', 'cv2', 'keyboard', 'matplotlib', 'pyqtgraph', 'PyQt5']
+
+class _StubMeta(type):
+    def __getattr__(cls, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return _stub_class(name)
+
+class _Stub(metaclass=_StubMeta):
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return _stub_class(name)()
+
+    def __call__(self, *args, **kwargs):
+        return _Stub()
+
+    def __bool__(self):
+        return False
+
+def _stub_class(name):
+    return _StubMeta(name, (_Stub,), {})
+
+class _StubModule(type(sys)):
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return _stub_class(name)
+
+class _StubFinder(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    def __init__(self, packages):
+        self.packages = packages
+
+    def find_spec(self, fullname, path, target = None):
+        if fullname.split('.')[0] in self.packages:
+            return importlib.machinery.ModuleSpec(fullname, self, is_package = True)
+        return None
+
+    def create_module(self, spec):
+        return _StubModule(spec.name)
+
+    def exec_module(self, module):
+        pass
+
+_missing = [name for name in stubbed_modules if importlib.util.find_spec(name) is None]
+if _missing:
+    sys.meta_path.insert(0, _StubFinder(_missing))
+
+if not hasattr(ctypes, 'windll'):
+    ctypes.windll = _Stub()
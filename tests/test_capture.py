@@ -0,0 +1,154 @@
+import random
+import numpy as np
+import pytest
+
+from game_entities import *
+from capture import CaptureWriter, CaptureReader
+
+frame_total = 50
+chunk_frames = 16 #(frames span several chunks, the last one partial)
+
+def float32(value):
+    return float(np.float32(value))
+
+def make_state(frame, bullets, items = ()):
+    return GameState(
+        frame_stage = frame, frame_global = 1000 + frame, stage_chapter = 0,
+        seq_frame_id = frame, seq_real_time = frame / 60, seq_frames_skipped = 0, seq_latency = None, seq_carried_over = [], seq_torn = [],
+        pause_state = 0, game_mode = 7, game_speed = 1.0,
+        score = 10 * frame, lives = 2, life_pieces = 0, bombs = 3, bomb_pieces = 0, power = 400, piv = 10000, graze = frame // 3,
+        boss_timer = 30.0 - frame / 60, spellcard = Spellcard(87, 1000000) if frame >= 20 else None,
+        rank = 0, input = frame % 16, rng = (frame * 7919) % 65536, continues = 0,
+        player_position = (float32(frame * 0.5), 400.0), player_hitbox_rad = 2.0, player_iframes = 0, player_focused = frame % 2 == 0,
+        player_options_pos = [], player_shots = [], player_deathbomb_f = 0, bomb_state = 0,
+        bullets = list(bullets), enemies = [], items = list(items), lasers = [],
+        screen = None,
+        constants = GameConstants(8, 128, 3, 5, 384, 448),
+        env = RunEnvironment(3, 0, 1, 4),
+    )
+
+def make_bullet(id, position, velocity, alive_timer):
+    return Bullet(id, position, velocity, 2.5, 0.5, 1.0, 4.0, 0, True, True, alive_timer, 3, id % 16)
+
+#Bullets moving in float32 steps like the game's, a few spawning and despawning every frame
+def make_states(seed = 1):
+    rng = random.Random(seed)
+    bullets = {}
+    next_id = 1
+    states = []
+
+    for frame in range(frame_total):
+        for id in [id for id in bullets if rng.random() < 0.05]:
+            del bullets[id]
+        for _ in range(rng.randrange(4)):
+            velocity = (float32(rng.uniform(-3, 3)), float32(rng.uniform(-3, 3)))
+            bullets[next_id] = make_bullet(next_id, (float32(rng.uniform(-192, 192)), float32(rng.uniform(0, 448))), velocity, 0)
+            next_id += 1
+
+        states.append(make_state(frame, [Bullet(**bullet.__dict__) for bullet in bullets.values()]))
+        for bullet in bullets.values():
+            position = np.float32(bullet.position) + np.float32(bullet.velocity)
+            bullet.position = (float(position[0]), float(position[1]))
+            bullet.alive_timer += 1
+
+    return states
+
+def write_capture(path, states, **options):
+    with CaptureWriter(path, chunk_frames = chunk_frames, **options) as writer:
+        for state in states:
+            writer.add(state)
+
+@pytest.fixture(params = [('rows', 1), ('rows', 0), ('delta', 1), ('delta', 0)], ids = lambda param: f'{param[0]}-level{param[1]}')
+def capture(request, tmp_path):
+    entity_encoding, compression_level = request.param
+    states = make_states()
+    write_capture(tmp_path / 'run.cap', states, entity_encoding = entity_encoding, compression_level = compression_level)
+    with CaptureReader(tmp_path / 'run.cap') as reader:
+        yield states, reader
+
+def test_states_round_trip(capture):
+    states, reader = capture
+    assert len(reader) == frame_total
+    assert list(reader) == states
+    assert list(reader.states(10, 40)) == states[10:40]
+
+def test_random_access(capture):
+    states, reader = capture
+    for frame in random.Random(2).sample(range(frame_total), 20) + [0, chunk_frames - 1, chunk_frames, frame_total - 1]:
+        assert reader[frame] == states[frame]
+    with pytest.raises(IndexError):
+        reader[frame_total]
+
+def test_column(capture):
+    states, reader = capture
+    assert reader.column('score').tolist() == [state.score for state in states]
+    assert reader.column('graze', 10, 40).tolist() == [state.graze for state in states[10:40]]
+    assert reader.column('spellcard') == [state.spellcard for state in states]
+    assert np.array_equal(reader.column('player_position'), [state.player_position for state in states])
+
+    with pytest.raises(KeyError):
+        reader.column('not_a_field')
+    with pytest.raises(ValueError):
+        reader.column('bullets')
+
+def test_table(capture):
+    states, reader = capture
+    table = reader.table('bullets', start = 5, stop = 45)
+    rows = [(frame, bullet) for frame in range(5, 45) for bullet in states[frame].bullets]
+    assert table['frame'].tolist() == [frame for frame, bullet in rows]
+    assert table['id'].tolist() == [bullet.id for frame, bullet in rows]
+    assert np.array_equal(table['position'], [bullet.position for frame, bullet in rows])
+
+def test_frame_range(capture):
+    states, reader = capture
+    assert reader.frame_range('frame_global', 1010, 1019) == (10, 20)
+    assert reader.frame_range('seq_frame_id', frame_total) == (frame_total, frame_total)
+
+def delta_column(reader, chunk_i, field, name):
+    table = reader._chunk_header(chunk_i)['tables'][f'{field}/Bullet']
+    return table['columns'][name], reader._read_column(chunk_i, table['columns']['_link']), reader._read_column(chunk_i, table['columns'][name])
+
+def test_delta_predicts_positions_from_velocity(tmp_path):
+    states = make_states()
+    write_capture(tmp_path / 'run.cap', states, entity_encoding = 'delta')
+
+    with CaptureReader(tmp_path / 'run.cap') as reader:
+        assert list(reader) == states
+        for chunk_i in range(len(reader.chunks)):
+            column, link, residual = delta_column(reader, chunk_i, 'bullets', 'position')
+            assert column['predict'] == 'velocity' and column['base'] == '<f4'
+            assert (link > 0).any()
+            assert not residual[link > 0].any() #float32 steps are predicted exactly
+            assert residual[link == 0].any() #spawn records are stored in full
+
+def test_delta_xors_float64_values(tmp_path):
+    states = make_states()
+    for frame, state in enumerate(states):
+        for bullet in state.bullets:
+            bullet.position = (bullet.position[0] + 0.1 * frame, bullet.position[1]) #(not float32 values anymore)
+            bullet.angle = 0.1 * (bullet.id + frame)
+
+    write_capture(tmp_path / 'run.cap', states, entity_encoding = 'delta')
+    with CaptureReader(tmp_path / 'run.cap') as reader:
+        assert list(reader) == states
+        for name in ['position', 'angle']:
+            column, link, residual = delta_column(reader, 0, 'bullets', name)
+            assert column['base'] == '<f8' and column['predict'] is None
+            assert residual.dtype == np.uint64
+
+def test_delta_links_only_consecutive_frames(tmp_path):
+    bullet = lambda id, frame: make_bullet(id, (float32(id), float32(frame)), (0.0, 1.0), frame)
+    frames = [
+        [bullet(1, 0), bullet(2, 0)],
+        [bullet(2, 1), bullet(1, 1), bullet(3, 1)], #reordered, 3 spawns
+        [bullet(3, 2)], #1 and 2 despawn
+        [],
+        [bullet(1, 4), bullet(3, 4)], #ids coming back after a gap are new spawns
+    ]
+    states = [make_state(frame, bullets) for frame, bullets in enumerate(frames)]
+    write_capture(tmp_path / 'run.cap', states, entity_encoding = 'delta')
+
+    with CaptureReader(tmp_path / 'run.cap') as reader:
+        assert list(reader) == states
+        column, link, residual = delta_column(reader, 0, 'bullets', 'position')
+        assert link.tolist() == [0, 0, 1, 3, 0, 1, 0, 0]
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from circle_coverage import grid_coverage, best_grid_position, best_continuous_position
+
+world_width, world_height = 384, 448
+radius = 50
+step_size = 10
+xs = range(int(-world_width/2), int(world_width/2), step_size)
+ys = range(0, world_height, step_size)
+
+#Random bullets, some on a coarse lattice (exactly on circle edges of grid centers) and a few dense clusters
+def make_bullets(seed, count):
+    rng = np.random.default_rng(seed)
+    bullets = np.column_stack((rng.uniform(-world_width/2, world_width/2, count), rng.uniform(0, world_height, count)))
+    bullets[:count // 5] = np.round(bullets[:count // 5] / 10) * 10
+    for center in rng.uniform((-150, 50), (150, 400), (3, 2)):
+        bullets = np.vstack((bullets, center + rng.normal(0, 15, (count // 10, 2))))
+    return [tuple(bullet) for bullet in bullets.tolist()]
+
+#The per-center loop AnalysisMostBulletsCircleFrame used before circle_coverage
+def old_best_position(points):
+    frame_best_count = 0
+    frame_best_position = None
+    for x in xs:
+        for y in ys:
+            count = 0
+            for px, py in points:
+                if (px - x) ** 2 + (py - y) ** 2 <= radius ** 2:
+                    count += 1
+            if count > frame_best_count:
+                frame_best_count = count
+                frame_best_position = (x, y)
+    return frame_best_count, frame_best_position
+
+def brute_counts(points, xs, ys):
+    points = np.array(points).reshape(-1, 2)
+    return np.array([[np.count_nonzero((points[:, 0] - x) ** 2 + (points[:, 1] - y) ** 2 <= radius ** 2) for y in ys] for x in xs])
+
+@pytest.mark.parametrize('seed', range(5))
+def test_grid_coverage_matches_per_center_loop(seed):
+    bullets = make_bullets(seed, 150)
+    assert np.array_equal(grid_coverage(bullets, xs, ys, radius), brute_counts(bullets, xs, ys))
+    count, position = best_grid_position(bullets, xs, ys, radius)
+    assert (count, tuple(map(int, position))) == old_best_position(bullets)
+
+def test_grid_coverage_edge_cases():
+    assert best_grid_position([], xs, ys, radius) == (0, None)
+    assert best_continuous_position([], radius) == (0, None)
+    assert not grid_coverage([(5000, 5000)], xs, ys, radius).any()
+    assert grid_coverage([(0, 100)], [-50, 0, 50], [100], radius).ravel().tolist() == [1, 1, 1] #(inclusive)
+
+#Best count over every circle through two points or centered on one: some best circle is always one of them
+def brute_continuous_count(points):
+    points = np.array(points)
+    centers = [points]
+    for i in range(len(points)):
+        deltas = points[i + 1:] - points[i]
+        distances = np.hypot(deltas[:, 0], deltas[:, 1])
+        close = (distances > 0) & (distances <= 2 * radius)
+        deltas, distances = deltas[close], distances[close]
+        middles = points[i] + deltas / 2
+        offsets = np.column_stack((-deltas[:, 1], deltas[:, 0])) / distances[:, None] * np.sqrt(radius ** 2 - (distances / 2) ** 2)[:, None]
+        centers += [middles + offsets, middles - offsets]
+    centers = np.vstack(centers)
+    distances2 = ((centers[:, None, :] - points[None, :, :]) ** 2).sum(axis=2)
+    return int((distances2 <= radius ** 2 + 1e-6).sum(axis=1).max())
+
+@pytest.mark.parametrize('seed', range(5))
+def test_continuous_position_is_optimal(seed):
+    bullets = make_bullets(seed, 60)
+    count, position = best_continuous_position(bullets, radius)
+    assert count == brute_continuous_count(bullets)
+    assert count >= best_grid_position(bullets, xs, ys, radius)[0]
+
+    covered = ((np.array(bullets) - position) ** 2).sum(axis=1) <= radius ** 2 + 1e-6
+    assert np.count_nonzero(covered) == count
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from game_entities import *
+from clustering import cluster_points, ClusterTracker
+
+#Textbook DBSCAN, with border points joining their lowest-index core neighbor's cluster like cluster_points
+def brute_dbscan(positions, eps, min_points):
+    distances2 = ((positions[:, None, :] - positions[None, :, :]) ** 2).sum(axis=2)
+    neighbors = distances2 <= eps * eps
+    core = neighbors.sum(axis=1) >= min_points
+    labels = np.full(len(positions), -1)
+
+    label = 0
+    for start in np.flatnonzero(core):
+        if labels[start] >= 0:
+            continue
+        labels[start] = label
+        stack = [start]
+        while stack:
+            point = stack.pop()
+            for neighbor in np.flatnonzero(neighbors[point] & core):
+                if labels[neighbor] < 0:
+                    labels[neighbor] = label
+                    stack.append(neighbor)
+        label += 1
+
+    for point in np.flatnonzero(~core):
+        core_neighbors = np.flatnonzero(neighbors[point] & core)
+        if len(core_neighbors):
+            labels[point] = labels[core_neighbors[0]]
+
+    #renumbered by first member
+    renumbered = np.full(len(positions), -1)
+    for new_label, old_label in enumerate(dict.fromkeys(labels[labels >= 0].tolist())):
+        renumbered[labels == old_label] = new_label
+    return renumbered
+
+def make_positions(seed, count = 400):
+    rng = np.random.default_rng(seed)
+    noise = np.column_stack((rng.uniform(-192, 192, count), rng.uniform(0, 448, count)))
+    blobs = [center + rng.normal(0, 10, (count // 8, 2)) for center in rng.uniform((-150, 50), (150, 400), (4, 2))]
+    positions = np.vstack([noise] + blobs)
+    positions[:50] = np.round(positions[:50] / 16) * 16 #(neighbors exactly eps apart)
+    return positions[rng.permutation(len(positions))]
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('eps, min_points', [(16, 8), (10, 4), (30, 20)])
+def test_labels_match_brute_force(seed, eps, min_points):
+    positions = make_positions(seed)
+    assert cluster_points(positions, eps, min_points).tolist() == brute_dbscan(positions, eps, min_points).tolist()
+
+def test_no_positions():
+    assert len(cluster_points(np.zeros((0, 2)))) == 0
+
+class State:
+    def __init__(self, frame, bullets):
+        self.seq_frame_id = frame
+        self.bullets = [Bullet(id, position, (0.0, 0.0), 0.0, 0.0, 1.0, 4.0, 0, True, True, 0, 3, 0) for id, position in bullets]
+
+#count bullets in rows of 4, 4 units apart from center, ids from first_id
+def blob(first_id, center, count = 16):
+    return [(first_id + i, (center[0] + 4 * (i % 4), center[1] + 4 * (i // 4))) for i in range(count)]
+
+def test_tracks_carry_over_between_frames():
+    tracker = ClusterTracker(eps = 6, min_points = 4)
+
+    clusters = tracker.add(State(0, blob(0, (0, 100)) + blob(100, (100, 300), 12)))
+    assert [cluster.track for cluster in clusters] == [0, 1]
+
+    #both move, the first one losing a few bullets, and a new cluster appears
+    clusters = tracker.add(State(1, blob(2, (10, 110), 14) + blob(100, (110, 290), 12) + blob(200, (-100, 50), 8)))
+    assert [(cluster.size, cluster.track) for cluster in clusters] == [(14, 0), (12, 1), (8, 2)]
+
+    #bullets of track 0 mostly move to a new blob: the new blob takes track 0, the leftovers start a new track
+    leftovers = list(zip([2, 3, 14, 15], [(150, 150), (154, 150), (150, 154), (154, 154)]))
+    clusters = tracker.add(State(2, blob(4, (-50, 200), 12) + leftovers + blob(100, (120, 280), 12)))
+    assert sorted((cluster.size, cluster.track) for cluster in clusters) == [(4, 3), (12, 0), (12, 1)]
+    assert sorted(tracker.tracks) == [0, 1, 3]
+    assert tracker.ended_tracks == 1 and tracker.longest_track['track'] == 2
+
+def test_ended_tracks_are_dropped():
+    tracker = ClusterTracker(eps = 6, min_points = 4)
+    for frame in range(10):
+        tracker.add(State(frame, blob(0, (0, 100)) + blob(100 + 100 * frame, (100, 300), 12)))
+
+    assert sorted(tracker.tracks) == [0, 10] #(the second blob changes ids every frame)
+    assert tracker.ended_tracks == 9 and tracker.ended_frames == 9
+    assert tracker.tracks[0]['frames'] == 10 and tracker.tracks[0]['max_size'] == 16
+
+    tracker.add(State(10, []))
+    assert tracker.tracks == {}
+    assert tracker.largest.size == 16
+    assert tracker.largest_track == {'track': 0, 'first_frame': 0, 'last_frame': 9, 'frames': 10, 'max_size': 16}
+    assert tracker.longest_track is tracker.largest_track
+
+    tracker.reset()
+    assert tracker.largest is None and tracker.ended_tracks == 0
+    assert tracker.add(State(11, blob(0, (0, 100))))[0].track == 11
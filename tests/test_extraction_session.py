@@ -0,0 +1,75 @@
+import asyncio
+import types
+import pytest
+
+import memory_sources
+from offsets import offsets, modern_game_modes
+
+module_name = 'th18.exe'
+base_address = 0x400000
+frame_total = 5
+marker = 0x10000 #(relative address holding each frame's number)
+
+#Memory that reads as zeros wherever nothing was written, so the interface can connect without a full game image
+class ZeroFilledSource(memory_sources.PagedMemorySource):
+    def read(self, address, size):
+        page = address & ~(self.page_size - 1)
+        data = b''.join(self.pages.get(start, bytes(self.page_size)) for start in range(page, address + size, self.page_size))
+        return bytes(data[address - page:address - page + size])
+
+def game_offset(name):
+    for category in offsets[module_name].__dict__.values():
+        values = category if isinstance(category, dict) else category.__dict__
+        if name in values:
+            return values[name]
+
+@pytest.fixture(scope = 'module')
+def state_reader():
+    source = ZeroFilledSource(module_name, base_address, [{} for frame in range(frame_total)])
+    game_world = next(mode for mode, name in modern_game_modes.items() if name == 'Game World on Screen')
+    for frame in range(frame_total):
+        source.write(base_address + game_offset('supervisor_addr') + game_offset('zSupervisor_game_mode'), game_world.to_bytes(4, 'little'), frame)
+        source.write(base_address + marker, frame.to_bytes(4, 'little'), frame)
+    memory_sources.use(source)
+
+    import interface
+    interface.keyboard.is_pressed = lambda key: False
+    import state_reader
+    return state_reader
+
+#Stand-in for extract_game_state reading only the frame number from the source; fails on fail_frame
+def fake_extractor(state_reader, fail_frame = None):
+    def extract(frame_id = 0, real_time = 0, due_categories = None, prev_state = None, deadline = None):
+        frame = state_reader.read_int(marker, rel = True)
+        if frame == fail_frame:
+            raise RuntimeError(f"Failed to read memory on frame {frame}")
+        return types.SimpleNamespace(frame_stage = frame, seq_frame_id = frame_id, seq_frames_skipped = None, seq_latency = None, seq_carried_over = [], seq_torn = [])
+    return extract
+
+async def consume(session):
+    return [state.frame_stage async for state in session]
+
+def test_session_extracts_every_frame(state_reader, monkeypatch):
+    memory_sources.active.seek(0)
+    monkeypatch.setattr(state_reader, 'extract_game_state', fake_extractor(state_reader))
+
+    session = state_reader.ExtractionSession(exact = False)
+    assert asyncio.run(consume(session)) == list(range(frame_total))
+    assert session.termination_reason == "End of memory source reached"
+    assert session.error is None
+
+def test_session_propagates_extraction_errors(state_reader, monkeypatch):
+    memory_sources.active.seek(0)
+    monkeypatch.setattr(state_reader, 'extract_game_state', fake_extractor(state_reader, fail_frame = 3))
+
+    session = state_reader.ExtractionSession(exact = False)
+    frames = []
+    async def consume_until_error():
+        async for state in session:
+            frames.append(state.frame_stage)
+
+    with pytest.raises(RuntimeError, match = "frame 3"):
+        asyncio.run(consume_until_error())
+    assert frames == [0, 1, 2]
+    assert isinstance(session.error, RuntimeError)
+    assert session.termination_reason is None
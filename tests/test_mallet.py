@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from game_entities import *
+from circle_coverage import grid_coverage
+from mallet import MalletSearch
+
+class State:
+    def __init__(self, frame, positions):
+        self.seq_frame_id = frame
+        self.bullets = [Bullet(i, tuple(position), (0.0, 0.0), 0.0, 0.0, 1.0, 4.0, 0, True, True, 0, 3, 0) for i, position in enumerate(positions.tolist())]
+        self.constants = GameConstants(8, 128, 3, 5, 384, 448)
+
+#Counts every center of the grid, without any bound
+class ExhaustiveSearch(MalletSearch):
+    def search(self, positions, threshold = 0):
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        in_bounds = (self.bounds[0] <= positions[:, 0]) & (positions[:, 0] <= self.bounds[2]) & (self.bounds[1] <= positions[:, 1]) & (positions[:, 1] <= self.bounds[3])
+        counts = grid_coverage(positions[in_bounds], self.xs, self.ys, self.radius)
+        i, j = np.unravel_index(np.argmax(counts), counts.shape)
+        if counts[i, j] <= threshold:
+            return 0, None
+        return int(counts[i, j]), (self.xs[i], self.ys[j])
+
+#Bullets spread over the playfield (some off it, some on the 10 unit grid), with a dense ring now and then
+def make_states(seed, count = 200):
+    rng = np.random.default_rng(seed)
+    states = []
+    for frame in range(count):
+        positions = np.column_stack((rng.uniform(-220, 220, 300), rng.uniform(-20, 470, 300)))
+        positions[:30] = np.round(positions[:30] / 10) * 10
+        if rng.random() < 0.3:
+            center = rng.uniform((-150, 50), (150, 400))
+            angles = rng.uniform(0, 2 * np.pi, rng.integers(20, 120))
+            positions = np.vstack((positions, center + rng.uniform(0, 70, (len(angles), 1)) * np.column_stack((np.cos(angles), np.sin(angles)))))
+        states.append(State(frame, positions))
+    return states
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('block', [2, 3, 5])
+def test_search_matches_exhaustive_search(seed, block):
+    pruned, exhaustive = MalletSearch(block = block), ExhaustiveSearch(block = block)
+    for state in make_states(seed, 40):
+        pruned._setup(state)
+        exhaustive._setup(state)
+        positions = [bullet.position for bullet in state.bullets]
+        best = exhaustive.search(positions)
+        assert pruned.search(positions) == best
+        for threshold in [best[0] - 1, best[0]]:
+            assert pruned.search(positions, threshold) == exhaustive.search(positions, threshold)
+
+@pytest.mark.parametrize('seed', range(3))
+def test_candidates_match_exhaustive_search(seed):
+    pruned, exhaustive = MalletSearch(top_k = 5, min_frame_gap = 10), ExhaustiveSearch(top_k = 5, min_frame_gap = 10)
+    for state in make_states(seed):
+        pruned.add(state)
+        exhaustive.add(state)
+
+    assert pruned.candidates == exhaustive.candidates
+    assert pruned.frames_pruned > 0
+
+def test_player_bounds_limit_centers():
+    search = MalletSearch(player_bounds = (-192, 0, 192, 300))
+    state = make_states(0, 1)[0]
+    search.add(state)
+    assert search.ys.max() - search.player_distance <= 300
+    assert search.best.player_position[1] <= 300
@@ -0,0 +1,43 @@
+import random
+
+from memory_journal import JournalRecorder, JournalMemorySource
+
+page_size = 0x1000
+pages = [0x400000 + i * page_size for i in range(16)]
+
+#Journals 40 frames of memory where a few pages change and a few get read every frame
+def record_journal(path, keyframe_interval):
+    rng = random.Random(1)
+    memory = {page: bytes([rng.randrange(256)]) * page_size for page in pages}
+    recorder = JournalRecorder(path, keyframe_interval = keyframe_interval)
+    recorder.start('th18.exe', 0x400000, lambda page: memory[page])
+    recorder.read(pages[0], 4)
+
+    for frame in range(40):
+        recorder.next_frame()
+        for page in rng.sample(pages, 3):
+            memory[page] = bytes([frame]) * page_size
+        for page in rng.sample(pages, 8):
+            recorder.read(page + 5, 10)
+    recorder.close()
+
+def test_keyframes_replay_like_full_journal(tmp_path):
+    record_journal(tmp_path / 'full.jrnl', keyframe_interval = 0)
+    record_journal(tmp_path / 'keyframes.jrnl', keyframe_interval = 7)
+    full = JournalMemorySource(tmp_path / 'full.jrnl')
+    keyframed = JournalMemorySource(tmp_path / 'keyframes.jrnl')
+    assert full.frame_total == keyframed.frame_total == 40
+
+    for frame in [39, 0, 13, 14, 15, 21, 6]:
+        full.seek(frame)
+        keyframed.seek(frame)
+        assert keyframed.pages == full.pages
+
+    full.seek(0)
+    keyframed.seek(0)
+    while full.next_frame():
+        assert keyframed.next_frame()
+        assert keyframed.pages == full.pages
+
+    full.close()
+    keyframed.close()
@@ -0,0 +1,97 @@
+import gc
+import weakref
+import numpy as np
+import pytest
+
+from game_entities import *
+from spatial import SpatialIndex, spatial_index
+
+bounds = (-192, 0, 192, 448)
+
+#Random positions plus some on integer coordinates (exactly at query distances) and some outside the bounds
+def make_positions(seed = 1, count = 600):
+    rng = np.random.default_rng(seed)
+    positions = np.column_stack((rng.uniform(-192, 192, count), rng.uniform(0, 448, count)))
+    positions[:100] = np.round(positions[:100] / 8) * 8
+    positions[100:120] = rng.uniform(-400, 600, (20, 2))
+    return positions
+
+def make_points(seed = 2, count = 40):
+    rng = np.random.default_rng(seed)
+    points = np.column_stack((rng.uniform(-220, 220, count), rng.uniform(-20, 470, count)))
+    points[:10] = np.round(points[:10] / 8) * 8
+    return points
+
+def brute_radius(positions, point, r):
+    return np.flatnonzero(((positions - point) ** 2).sum(axis=1) <= r * r)
+
+def brute_box(positions, min_x, min_y, max_x, max_y):
+    x, y = positions.T
+    return np.flatnonzero((min_x <= x) & (x <= max_x) & (min_y <= y) & (y <= max_y))
+
+@pytest.fixture(params = ['grid', 'kdtree'])
+def index(request):
+    positions = make_positions()
+    return positions, SpatialIndex(positions, bounds, 16, request.param)
+
+@pytest.mark.parametrize('r', [0, 8, 16, 40, 150])
+def test_radius_matches_brute_force(index, r):
+    positions, index = index
+    for point in make_points():
+        assert index.radius(point, r).tolist() == brute_radius(positions, point, r).tolist()
+
+def test_batch_queries_match_brute_force(index):
+    positions, index = index
+    points = make_points()
+    queries, indices = index.pairs_within(points, 24)
+    expected = [(query, position) for query, point in enumerate(points) for position in brute_radius(positions, point, 24)]
+    assert list(zip(queries.tolist(), indices.tolist())) == expected
+    assert index.count_within(points, 24).tolist() == [len(brute_radius(positions, point, 24)) for point in points]
+
+def test_annulus_matches_brute_force(index):
+    positions, index = index
+    for point in make_points():
+        inner = set(brute_radius(positions, point, 16).tolist())
+        assert index.annulus(point, 16, 48).tolist() == [i for i in brute_radius(positions, point, 48).tolist() if i not in inner]
+
+def test_box_matches_brute_force(index):
+    positions, index = index
+    rng = np.random.default_rng(3)
+    boxes = [(-192, 0, 192, 448), (-8, 8, 8, 64), (100, 300, 100, 300), (-500, -500, -300, -300)]
+    for x, y in rng.uniform((-220, -20), (220, 470), (30, 2)):
+        width, height = rng.uniform(0, 120, 2)
+        boxes.append((x, y, x + width, y + height))
+
+    for box in boxes:
+        assert index.box(*box).tolist() == brute_box(positions, *box).tolist()
+
+def test_nearest_matches_brute_force(index):
+    positions, index = index
+    for point in make_points():
+        distances = ((positions - point) ** 2).sum(axis=1)
+        nearest = index.nearest(point, 5)
+        assert np.array_equal(distances[nearest], np.sort(distances)[:5])
+
+def test_empty_index():
+    for backend in ['grid', 'kdtree']:
+        index = SpatialIndex(np.zeros((0, 2)), bounds, 16, backend)
+        assert len(index.radius((0, 0), 50)) == 0
+        assert len(index.nearest((0, 0), 3)) == 0
+
+class State:
+    def __init__(self, positions):
+        self.bullets = [Bullet(i, tuple(position), (0.0, 0.0), 0.0, 0.0, 1.0, 4.0, 0, True, True, 0, 3, 0) for i, position in enumerate(positions)]
+        self.constants = GameConstants(8, 128, 3, 5, 384, 448)
+
+def test_spatial_index_cache_doesnt_keep_states_alive():
+    state = State(make_positions())
+    index = spatial_index(state)
+    assert spatial_index(state) is index
+    assert spatial_index(State(make_positions())) is not index
+
+    state = State(make_positions())
+    spatial_index(state)
+    reference = weakref.ref(state)
+    del state
+    gc.collect()
+    assert reference() is None
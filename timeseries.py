@@ -0,0 +1,173 @@
+from game_entities import *
+import numpy as np
+
+#Time series of scalar metrics over arbitrarily long extractions, in constant memory.
+#Values are kept at several resolutions, each in a preallocated ring of NumPy arrays:
+#  'frame'   every value, for the last raw_minutes
+#  'second'  min/max/mean over each 60 frames, for the last second_hours
+#  'minute'  min/max/mean over each 3600 frames, for the last minute_hours
+#Once a ring is full, its oldest points are overwritten. Queries pick the finest resolution still covering the
+#requested window (or the one asked for) and return a series_dtype array, where frame is the first frame of each point
+#(at 'frame' resolution, min, max and mean are all the value itself). Frames are seq_frame_id values.
+#NaN values (e.g. a metric that doesn't exist in this game) are ignored by aggregates.
+
+series_dtype = np.dtype([('frame', '<i8'), ('min', '<f8'), ('max', '<f8'), ('mean', '<f8')])
+
+builtin_metrics = {
+    'score':        lambda state: state.score,
+    'graze':        lambda state: state.graze,
+    'power':        lambda state: state.power,
+    'piv':          lambda state: state.piv,
+    'rank':         lambda state: state.rank,
+    'lives':        lambda state: state.lives,
+    'bombs':        lambda state: state.bombs,
+    'bullets':      lambda state: len(state.bullets),
+    'enemies':      lambda state: len(state.enemies),
+    'items':        lambda state: len(state.items),
+    'lasers':       lambda state: len(state.lasers),
+    'gauge_charge': lambda state: getattr(state, 'gauge_charge', np.nan), #UDoALG
+}
+
+class _Ring:
+    def __init__(self, capacity, columns, width):
+        self.frames = np.zeros(capacity, dtype=np.int64)
+        self.values = np.zeros((capacity, columns, width))
+        self.capacity = capacity
+        self.head = 0 #next slot written
+        self.count = 0
+
+    def append(self, frame, values):
+        self.frames[self.head] = frame
+        self.values[self.head] = values
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def oldest_frame(self):
+        return self.frames[(self.head - self.count) % self.capacity] if self.count else None
+
+    #chronological order
+    def ordered(self):
+        order = (np.arange(self.count) + self.head - self.count) % self.capacity
+        return self.frames[order], self.values[order]
+
+#Aggregates values into fixed buckets of frames before appending them to its ring
+class _Tier:
+    def __init__(self, name, bucket_frames, capacity, width):
+        self.name = name
+        self.bucket_frames = bucket_frames
+        self.ring = _Ring(capacity, 3, width)
+        self.bucket = None
+        self.mins = np.full(width, np.inf)
+        self.maxs = np.full(width, -np.inf)
+        self.sums = np.zeros(width)
+        self.counts = np.zeros(width)
+
+    def add(self, frame, values, valid):
+        bucket = frame // self.bucket_frames
+        if bucket != self.bucket:
+            self.flush()
+            self.bucket = bucket
+
+        np.fmin(self.mins, values, out=self.mins)
+        np.fmax(self.maxs, values, out=self.maxs)
+        self.sums += np.where(valid, values, 0)
+        self.counts += valid
+
+    #aggregates of the bucket being filled
+    def pending(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = self.sums / self.counts
+        return np.where(self.counts == 0, np.nan, [self.mins, self.maxs, means])
+
+    def flush(self):
+        if self.bucket is None or not self.counts.any():
+            return
+
+        self.ring.append(self.bucket * self.bucket_frames, self.pending())
+        self.mins.fill(np.inf)
+        self.maxs.fill(-np.inf)
+        self.sums.fill(0)
+        self.counts.fill(0)
+
+class TimeSeriesStore:
+    #metrics: names of built-in metrics and/or a {name: function(state) -> number} dict (functions can be None if
+    #values are only given to record()); score, graze and bullets by default
+    def __init__(self, metrics = None, raw_minutes = 5, second_hours = 2, minute_hours = 48, fps = 60):
+        if metrics is None:
+            metrics = ['score', 'graze', 'bullets']
+        if not isinstance(metrics, dict):
+            unknown = [name for name in metrics if name not in builtin_metrics]
+            if unknown:
+                raise ValueError(f"Unknown metrics {unknown} (built-in metrics: {list(builtin_metrics)}).")
+            metrics = {name: builtin_metrics[name] for name in metrics}
+
+        self.metrics = metrics
+        self.columns = {name: i for i, name in enumerate(metrics)}
+        self.raw = _Ring(int(raw_minutes * 60 * fps), 1, len(metrics))
+        self.tiers = [
+            _Tier('second', fps, int(second_hours * 3600), len(metrics)),
+            _Tier('minute', 60 * fps, int(minute_hours * 60), len(metrics)),
+        ]
+        self.first_frame = None
+        self.last_frame = None
+
+    def add(self, state: GameState):
+        self.record(state.seq_frame_id, [metric(state) for metric in self.metrics.values()])
+
+    #values: one per metric, in the order they were given
+    def record(self, frame, values):
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        self.raw.append(frame, values[None])
+        for tier in self.tiers:
+            tier.add(frame, values, valid)
+        if self.first_frame is None:
+            self.first_frame = frame
+        self.last_frame = frame
+
+    #(name, frames per point, oldest frame still held) for each resolution
+    @property
+    def resolutions(self):
+        return [('frame', 1, self.raw.oldest_frame())] + [(tier.name, tier.bucket_frames, tier.ring.oldest_frame()) for tier in self.tiers]
+
+    #Points of metric overlapping frames [start, stop), at the given resolution ('frame', 'second' or 'minute').
+    #By default, picks the finest resolution still holding start, and coarser ones if that'd be over max_points points.
+    #The last second and minute points are partial until those are over.
+    def query(self, metric, start = None, stop = None, resolution = None, max_points = None):
+        column = self.columns[metric]
+
+        if resolution is None and self.last_frame is not None:
+            first = start if start is not None else self.first_frame
+            span = (stop if stop is not None else self.last_frame + 1) - first
+            held = [(name, bucket_frames, oldest) for name, bucket_frames, oldest in self.resolutions if oldest is not None]
+            resolution = next((name for name, bucket_frames, oldest in held if oldest <= first // bucket_frames * bucket_frames and (not max_points or span <= max_points * bucket_frames)), held[-1][0])
+
+        if resolution in [None, 'frame']:
+            frames, values = self.raw.ordered()
+            values = np.repeat(values[:, 0, column, None], 3, axis=1)
+            bucket_frames = 1
+        else:
+            tier = next((tier for tier in self.tiers if tier.name == resolution), None)
+            if tier is None:
+                raise ValueError(f"Unknown resolution '{resolution}' (expected 'frame', 'second' or 'minute').")
+            frames, values = tier.ring.ordered()
+            if tier.counts.any():
+                frames = np.append(frames, tier.bucket * tier.bucket_frames)
+                values = np.concatenate((values, tier.pending()[None]))
+            values = values[:, :, column]
+            bucket_frames = tier.bucket_frames
+
+        keep = np.ones(len(frames), dtype=bool)
+        if start is not None:
+            keep &= frames + bucket_frames > start #(points overlapping the window)
+        if stop is not None:
+            keep &= frames < stop
+
+        series = np.empty(np.count_nonzero(keep), dtype=series_dtype)
+        series['frame'] = frames[keep]
+        series['min'], series['max'], series['mean'] = values[keep].T
+        return series
+
+    @property
+    def nbytes(self):
+        return sum(ring.frames.nbytes + ring.values.nbytes for ring in [self.raw] + [tier.ring for tier in self.tiers])
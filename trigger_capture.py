@@ -0,0 +1,111 @@
+from capture import CaptureWriter
+from collections import deque
+import dataclasses
+import json
+import os
+
+#Oscilloscope-style captures: the last pre_frames states are kept in a ring buffer and, whenever a trigger fires,
+#saved to a capture file along with the post_frames states that follow. Triggers firing while an event is still
+#being captured extend it instead of starting a new one. Memory use is bounded by pre_frames however long the run.
+#
+#Each event is saved as event_000000_<trigger>.cap and listed in events.jsonl:
+#  {"event": 0, "file": "event_000000_life_lost.cap", "triggers": [["life_lost", 5210]], "first_frame": 5030, "last_frame": 5330}
+#with the seq_frame_id each trigger fired at.
+
+events_file = 'events.jsonl'
+
+#Built-in triggers: predicate(previous state, state)
+def life_lost(prev_state, state):
+    return state.lives < prev_state.lives
+
+def bomb_used(prev_state, state):
+    return state.bomb_state != 0 and prev_state.bomb_state == 0
+
+def deathbomb(prev_state, state):
+    return state.player_deathbomb_f > 0 and prev_state.player_deathbomb_f == 0
+
+def spell_changed(prev_state, state):
+    return (state.spellcard.spell_id if state.spellcard else None) != (prev_state.spellcard.spell_id if prev_state.spellcard else None)
+
+builtin_triggers = {
+    'life_lost': life_lost,
+    'bomb_used': bomb_used,
+    'deathbomb': deathbomb,
+    'spell_changed': spell_changed,
+}
+
+class TriggerCapture:
+    #triggers: names of built-in triggers and/or a {name: predicate(prev_state, state)} dict
+    def __init__(self, directory, triggers = ('life_lost', 'bomb_used'), pre_frames = 180, post_frames = 120, metadata = None, **capture_args):
+        if not isinstance(triggers, dict):
+            unknown = [name for name in triggers if name not in builtin_triggers]
+            if unknown:
+                raise ValueError(f"Unknown triggers {unknown} (built-in triggers: {list(builtin_triggers)}).")
+            triggers = {name: builtin_triggers[name] for name in triggers}
+
+        self.directory = directory
+        self.triggers = triggers
+        self.pre_frames = pre_frames
+        self.post_frames = post_frames
+        self.metadata = metadata or {}
+        self.capture_args = capture_args #passed on to every event's CaptureWriter
+        self.buffer = deque(maxlen = pre_frames)
+        self.prev_state = None
+        self.writer = None
+        self.event = None
+        self.post_remaining = 0
+        self.event_count = 0
+
+        os.makedirs(directory, exist_ok = True)
+        path = os.path.join(directory, events_file)
+        if os.path.exists(path): #appending to earlier events; numbering picks up where it left off
+            with open(path) as file:
+                self.event_count = sum(1 for line in file if line.strip())
+        self.file = open(path, 'a')
+
+    def add(self, state):
+        if state.screen is not None: #screens aren't saved to captures; don't hold on to them either
+            state = dataclasses.replace(state, screen = None)
+
+        fired = [name for name, trigger in self.triggers.items() if trigger(self.prev_state, state)] if self.prev_state is not None else []
+        self.prev_state = state
+
+        if fired:
+            if self.writer is None:
+                self._start_event(fired[0])
+            self.event['triggers'] += [[name, state.seq_frame_id] for name in fired]
+            self.post_remaining = self.post_frames
+
+        if self.writer is None:
+            self.buffer.append(state)
+            return
+
+        self.writer.add(state)
+        self.event['last_frame'] = state.seq_frame_id
+        if not fired:
+            self.post_remaining -= 1
+        if self.post_remaining <= 0:
+            self._end_event()
+
+    def _start_event(self, trigger_name):
+        file_name = f'event_{self.event_count:06d}_{trigger_name}.cap'
+        self.event = {'event': self.event_count, 'file': file_name, 'triggers': [], 'first_frame': None, 'last_frame': None}
+        self.writer = CaptureWriter(os.path.join(self.directory, file_name), metadata = {**self.metadata, 'event': self.event_count}, **self.capture_args)
+
+        for buffered_state in self.buffer:
+            self.writer.add(buffered_state)
+        self.event['first_frame'] = self.buffer[0].seq_frame_id if self.buffer else self.prev_state.seq_frame_id
+        self.buffer.clear()
+
+    def _end_event(self):
+        self.writer.close()
+        self.writer = None
+        self.file.write(json.dumps(self.event) + '\n')
+        self.file.flush()
+        self.event = None
+        self.event_count += 1
+
+    def close(self):
+        if self.writer: #(cut short)
+            self._end_event()
+        self.file.close()